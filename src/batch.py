@@ -0,0 +1,209 @@
+from main import StockPricePrediction
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from itertools import product
+from common import Instrument, Log, ResourcePlanner
+from data import PriceIngestion, StockData
+from reporting import ComparisonReport
+from time import time
+import pathlib
+import json
+import os
+
+
+def run_job(stock_symbol: str, model_name: str, data_years: int, param_samples: int, n_jobs: int) -> dict:
+    """Fetch, train and predict a single symbol & model pair.
+
+    The pair's predictions of every row are returned in the summary's payload, for
+    the symbol's comparison report.
+
+    :param stock_symbol: symbol to predict price for.
+    :type stock_symbol: str
+    :param model_name: model name to use for prediction.
+    :type model_name: str
+    :param data_years: years of historical data to train model on
+    :type data_years: int
+    :param param_samples: number of samples from parameter space
+    :type param_samples: int
+    :param n_jobs: number of cores available to this pair
+    :type n_jobs: int
+    :return: job summary of stage timings, scores & payload
+    :rtype: dict
+    """
+    summary = {"stock_symbol": stock_symbol, "model_name": model_name, "n_jobs": n_jobs, "timings": {}}
+    Instrument.reset()
+    stock_prediction = StockPricePrediction(stock_symbol, model_name, data_years)
+    try:
+        start = time()
+        stock_data = stock_prediction.fetch_data()
+        summary["timings"]["fetch_data"] = time() - start
+
+        start = time()
+        summary["best_score"] = float(stock_prediction.train_model(stock_data, param_samples, n_jobs))
+        summary["timings"]["train_model"] = time() - start
+
+        start = time()
+        predictions = stock_prediction.predict(stock_data)
+        summary["timings"]["predict"] = time() - start
+        summary["payload"] = {
+            "index": stock_data.index,
+            "y": stock_data.stock_y.to_numpy(),
+            "split": stock_data.split,
+            "predictions": predictions,
+        }
+        summary["status"] = "complete"
+    except Exception as e:
+        stock_prediction.logger.exception(f"{model_name} failed")
+        summary["status"] = "failed"
+        summary["error"] = repr(e)
+    summary["instrument"] = Instrument.summary()
+    return summary
+
+
+def report_symbol(stock_symbol: str, payloads: dict) -> float:
+    """Write a symbol's comparison report of every model's predictions.
+
+    :param stock_symbol: symbol the models were trained on.
+    :type stock_symbol: str
+    :param payloads: job payloads (date index, closing price, split & predictions) by model name
+    :type payloads: dict
+    :return: seconds taken
+    :rtype: float
+    """
+    start = time()
+    payload = next(iter(payloads.values()))
+    data = StockData.from_matrix(
+        stock_symbol, payload["index"], ["Close"], payload["y"].reshape(-1, 1), split=payload["split"]
+    )
+    ComparisonReport(data, {model: job["predictions"] for model, job in payloads.items()}).create_report()
+    return time() - start
+
+
+class BatchPrediction:
+
+    """Run stock price prediction over many symbols & models in a process pool."""
+
+    def __init__(
+        self,
+        stock_symbols: list,
+        model_names: list,
+        data_years: int = 10,
+        param_samples: int = 100,
+        max_workers: int = None,
+    ) -> None:
+        """Initialise batch stock price prediction.
+
+        :param stock_symbols: symbols to predict price for.
+        :type stock_symbols: list
+        :param model_names: model names to use for prediction.
+        :type model_names: list
+        :param data_years: years of historical data to train model on, defaults to 10
+        :type data_years: int, optional
+        :param param_samples: number of samples from parameter space, defaults to 100
+        :type param_samples: int, optional
+        :param max_workers: number of concurrent symbol & model pairs, defaults to
+            one per available core
+        :type max_workers: int, optional
+        """
+        self.logger = Log.set_logger("stock prediction: batch")
+        self.jobs = list(product(stock_symbols, model_names))
+        self.data_years = data_years
+        self.param_samples = param_samples
+        self.cores = ResourcePlanner.available_cores()
+        self.max_workers = max(1, min(max_workers or self.cores, len(self.jobs)))
+
+    def _job_cores(self) -> int:
+        """Split available cores between concurrent searches."""
+        return max(1, self.cores // self.max_workers)
+
+    def ingest(self, max_workers: int = 8) -> list:
+        """Fetch every symbol's prices into the local price store, so workers read them offline.
+
+        :param max_workers: symbols fetched concurrently, defaults to 8
+        :type max_workers: int, optional
+        :return: per symbol ingestion summaries
+        :rtype: list
+        """
+        symbols = sorted({symbol for symbol, _ in self.jobs})
+        summaries = PriceIngestion(max_workers=max_workers).run(symbols, self.data_years)
+        for summary in summaries:
+            if summary["status"] != "complete":
+                self.logger.warning(f"{summary['symbol']} ingestion {summary['status']}: {summary.get('error', '')}")
+        return summaries
+
+    def run(self) -> list:
+        """Run all symbol & model pairs, then report every symbol.
+
+        :return: job summaries
+        :rtype: list
+        """
+        n_jobs = self._job_cores()
+        self.logger.info(f"running {len(self.jobs)} jobs on {self.max_workers} workers x {n_jobs} cores")
+        summaries = []
+        with ProcessPoolExecutor(max_workers=self.max_workers) as executor:
+            futures = [
+                executor.submit(run_job, symbol, model, self.data_years, self.param_samples, n_jobs)
+                for symbol, model in self.jobs
+            ]
+            for future in as_completed(futures):
+                summary = future.result()
+                self.logger.info(f"{summary['stock_symbol']} {summary['model_name']}: {summary['status']}")
+                summaries.append(summary)
+        self.report(summaries)
+        return summaries
+
+    def report(self, summaries: list) -> None:
+        """Write every symbol's comparison report, in parallel across symbols, from the jobs' payloads.
+
+        :param summaries: job summaries, their payloads being removed
+        :type summaries: list
+        """
+        payloads = {}
+        for summary in summaries:
+            if "payload" in summary:
+                payloads.setdefault(summary["stock_symbol"], {})[summary["model_name"]] = summary.pop("payload")
+        if not payloads:
+            return
+        with ProcessPoolExecutor(max_workers=min(self.max_workers, len(payloads))) as executor:
+            futures = {executor.submit(report_symbol, symbol, models): symbol for symbol, models in payloads.items()}
+            for future in as_completed(futures):
+                symbol = futures[future]
+                try:
+                    seconds = future.result()
+                except Exception:
+                    self.logger.exception(f"{symbol} report failed")
+                    continue
+                for summary in summaries:
+                    if summary["stock_symbol"] == symbol and summary["model_name"] in payloads[symbol]:
+                        summary["timings"]["comparison_report"] = seconds
+
+    @staticmethod
+    def write_manifest(summaries: list, file_name: str = "reports/batch_manifest.json") -> None:
+        """Write batch summary manifest.
+
+        :param summaries: job summaries
+        :type summaries: list
+        :param file_name: manifest file to write, defaults to reports/batch_manifest.json
+        :type file_name: str, optional
+        """
+        pathlib.Path(file_name).parent.mkdir(parents=True, exist_ok=True)
+        with open(file_name, "w") as f:
+            json.dump(sorted(summaries, key=lambda s: (s["stock_symbol"], s["model_name"])), f, indent=2)
+
+
+if __name__ == "__main__":
+
+    StockPricePrediction.load_env_vars()
+
+    batch_prediction = BatchPrediction(
+        stock_symbols=os.getenv("STOCK_SYMBOLS").split(","),
+        model_names=os.getenv("MODEL_NAMES").split(","),
+        data_years=int(os.getenv("DATA_YEARS")),
+        param_samples=int(os.getenv("PARAM_SAMPLES")),
+        max_workers=int(os.getenv("BATCH_WORKERS", 0)) or None,
+    )
+
+    start = time()
+    batch_prediction.ingest(int(os.getenv("INGEST_WORKERS", 8)))
+    summaries = batch_prediction.run()
+    batch_prediction.write_manifest(summaries)
+    batch_prediction.logger.info(f"batch complete: {time() - start:.1f}s")
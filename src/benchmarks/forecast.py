@@ -0,0 +1,90 @@
+from data import FeatureStore, PanelData, PriceStore
+from benchmarks.synthetic import SyntheticFetcher
+from pipeline.forecast import ModelForecast
+from sklearn.pipeline import Pipeline
+from xgboost import XGBRegressor
+from time import perf_counter
+import argparse
+import tempfile
+import json
+
+
+class ForecastBenchmark:
+
+    """Time to forecast many symbols many days ahead with one panel model & with a model per symbol."""
+
+    def __init__(self, n_symbols: int = 500, years: int = 2, horizon: int = 30) -> None:
+        """Forecast benchmark initialiser.
+
+        :param n_symbols: synthetic symbols in the panel, defaults to 500
+        :type n_symbols: int, optional
+        :param years: years of synthetic price data per symbol, defaults to 2
+        :type years: int, optional
+        :param horizon: trading days to forecast, defaults to 30
+        :type horizon: int, optional
+        """
+        self.n_symbols = n_symbols
+        self.years = years
+        self.horizon = horizon
+
+    def run(self) -> dict:
+        """Build the panel, fit a small booster on it and time forecasting every symbol.
+
+        :return: seconds of each stage & forecasts made
+        :rtype: dict
+        """
+        stages = {}
+        with tempfile.TemporaryDirectory() as directory:
+            start = perf_counter()
+            data = PanelData(
+                [f"SYN{i}" for i in range(self.n_symbols)],
+                self.years,
+                "BENCH",
+                price_store=PriceStore(f"{directory}/prices", SyntheticFetcher()),
+                feature_store=FeatureStore(f"{directory}/features"),
+            )
+            stages["panel_data"] = perf_counter() - start
+
+        start = perf_counter()
+        model = XGBRegressor(verbosity=0, tree_method="hist", n_estimators=100)
+        estimator = Pipeline([("preprocessing", None), ("model", model)]).fit(data.stock_x, data.stock_y)
+        stages["fit"] = perf_counter() - start
+
+        start = perf_counter()
+        members = [data.member(symbol) for symbol in data.stock_symbols]
+        stages["members"] = perf_counter() - start
+
+        start = perf_counter()
+        forecasts = ModelForecast.forecast_members(estimator, members, self.horizon)
+        stages["forecast"] = perf_counter() - start
+
+        start = perf_counter()
+        models = []
+        for member in members:
+            model = XGBRegressor(verbosity=0, tree_method="hist", n_estimators=100, n_jobs=1)
+            estimator = Pipeline([("preprocessing", None), ("model", model)]).fit(member.stock_x, member.stock_y)
+            models.append((estimator, None, [member]))
+        stages["symbol_fits"] = perf_counter() - start
+
+        start = perf_counter()
+        ModelForecast.forecast_models(models, self.horizon)
+        stages["symbol_forecast"] = perf_counter() - start
+        return {"symbols": self.n_symbols, "horizon": self.horizon, "forecasts": len(forecasts), "stages": stages}
+
+
+if __name__ == "__main__":
+
+    parser = argparse.ArgumentParser(description="Panel forecast benchmark")
+    parser.add_argument("--symbols", type=int, default=500, help="synthetic symbols in the panel")
+    parser.add_argument("--years", type=int, default=2, help="years of synthetic price data per symbol")
+    parser.add_argument("--horizon", type=int, default=30, help="trading days to forecast")
+    parser.add_argument("--output", default=None, help="json file to write results to")
+    args = parser.parse_args()
+
+    result = ForecastBenchmark(args.symbols, args.years, args.horizon).run()
+    print(f"{result['symbols']} symbols x {result['horizon']} days: {result['forecasts']} forecasts")
+    for stage, seconds in result["stages"].items():
+        print(f"    {stage:<12} {seconds:8.3f}s")
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(result, f, indent=2)
@@ -0,0 +1,93 @@
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import get_context
+from time import perf_counter
+import argparse
+import importlib
+import resource
+import json
+import sys
+
+
+class ImportBenchmark:
+
+    """Cold start import time & memory of entry points and model classes.
+
+    Every target is imported in a fresh process, as a per symbol job would on
+    start up, recording seconds to import, peak RSS and which ML frameworks the
+    import pulled in.
+    """
+
+    frameworks = ["tensorflow", "keras", "xgboost", "plotly"]
+    targets = {
+        "main": [("main", None)],
+        "main+xgboost": [("main", None), ("models", "xgboost")],
+        "main+lstm": [("main", None), ("models", "lstm")],
+        "serve": [("serve", None)],
+        "batch": [("batch", None)],
+    }
+
+    def __init__(self, targets: list = None, repeats: int = 3) -> None:
+        """Import benchmark initialiser.
+
+        :param targets: names of targets to import, defaults to every target
+        :type targets: list, optional
+        :param repeats: fresh processes per target, the fastest being kept, defaults to 3
+        :type repeats: int, optional
+        """
+        self.target_names = targets or list(self.targets)
+        self.repeats = repeats
+
+    @staticmethod
+    def run_target(target: str) -> dict:
+        """Import a target's modules & resolve its model class in the current process.
+
+        :param target: target name
+        :type target: str
+        :return: import seconds, peak RSS & frameworks imported
+        :rtype: dict
+        """
+        start = perf_counter()
+        for module_name, model_name in ImportBenchmark.targets[target]:
+            module = importlib.import_module(module_name)
+            if model_name:
+                module.ModelRegistry().get_model_class(model_name)
+        seconds = perf_counter() - start
+        # ru_maxrss is in kilobytes on linux & bytes on mac
+        peak_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / (1024 if sys.platform != "darwin" else 1024**2)
+        frameworks = [name for name in ImportBenchmark.frameworks if name in sys.modules]
+        return {"target": target, "seconds": seconds, "peak_rss_mb": peak_rss, "frameworks": frameworks}
+
+    def run(self) -> list:
+        """Import every target in fresh processes.
+
+        :return: fastest result per target
+        :rtype: list
+        """
+        results = []
+        for target in self.target_names:
+            runs = []
+            for _ in range(self.repeats):
+                with ProcessPoolExecutor(max_workers=1, mp_context=get_context("spawn")) as executor:
+                    runs.append(executor.submit(self.run_target, target).result())
+            results.append(min(runs, key=lambda run: run["seconds"]))
+        return results
+
+
+if __name__ == "__main__":
+
+    parser = argparse.ArgumentParser(description="Cold start import benchmark")
+    parser.add_argument("--targets", default=",".join(ImportBenchmark.targets), help="comma separated targets")
+    parser.add_argument("--repeats", type=int, default=3, help="fresh processes per target")
+    parser.add_argument("--output", default=None, help="json file to write results to")
+    args = parser.parse_args()
+
+    results = ImportBenchmark(args.targets.split(","), args.repeats).run()
+    for result in results:
+        frameworks = ", ".join(result["frameworks"]) or "none"
+        print(
+            f"{result['target']:<14} {result['seconds']:7.3f}s {result['peak_rss_mb']:7.0f} MB peak RSS"
+            f"  frameworks: {frameworks}"
+        )
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
@@ -0,0 +1,94 @@
+from data import FeatureStore, PriceStore, StockData
+from benchmarks.synthetic import SyntheticFetcher
+from common import ResourcePlanner
+from joblib import Parallel, delayed
+from xgboost import XGBRegressor
+from time import time
+import argparse
+import tempfile
+import json
+
+
+class ParallelismBenchmark:
+
+    """Throughput of parallel XGBoost fits across splits of the core budget."""
+
+    def __init__(self, years: int = 10, n_fits: int = 25, cores: int = -1) -> None:
+        """Parallelism benchmark initialiser.
+
+        :param years: years of synthetic price data to fit on, defaults to 10
+        :type years: int, optional
+        :param n_fits: fits per split, e.g. one search step of 5 points x 5 folds, defaults to 25
+        :type n_fits: int, optional
+        :param cores: core budget to split, defaults to -1 (all available cores)
+        :type cores: int, optional
+        """
+        self.n_fits = n_fits
+        self.cores = ResourcePlanner.plan(cores).cores
+        with tempfile.TemporaryDirectory() as directory:
+            data = StockData(
+                "BENCH",
+                years,
+                price_store=PriceStore(f"{directory}/prices", SyntheticFetcher()),
+                feature_store=FeatureStore(f"{directory}/features"),
+            )
+        self.x, self.y = data.stock_x_train.to_numpy(), data.stock_y_train.to_numpy()
+
+    @staticmethod
+    def _fit(x, y, threads: int) -> None:
+        """Fit one booster with a fixed number of threads."""
+        XGBRegressor(verbosity=0, tree_method="hist", n_estimators=200, n_jobs=threads).fit(x, y)
+
+    def run_split(self, search_jobs: int, threads: int) -> dict:
+        """Time n_fits boosters over search_jobs workers of threads each.
+
+        :param search_jobs: parallel fits
+        :type search_jobs: int
+        :param threads: threads per booster
+        :type threads: int
+        :return: split, seconds & fits per second
+        :rtype: dict
+        """
+        start = time()
+        Parallel(n_jobs=search_jobs)(delayed(self._fit)(self.x, self.y, threads) for _ in range(self.n_fits))
+        seconds = time() - start
+        return {
+            "search_jobs": search_jobs,
+            "threads": threads,
+            "seconds": seconds,
+            "fits_per_second": self.n_fits / seconds,
+        }
+
+    def run(self) -> list:
+        """Time every split of the cores into jobs x threads, plus an oversubscribed split.
+
+        :return: results per split, the planned split flagged
+        :rtype: list
+        """
+        plan = ResourcePlanner.plan(self.cores, n_points=5, n_splits=self.n_fits // 5 or 1)
+        splits = [(jobs, self.cores // jobs) for jobs in range(1, self.cores + 1) if self.cores % jobs == 0]
+        splits.append((self.cores, 4))
+        results = []
+        for search_jobs, threads in splits:
+            result = self.run_split(search_jobs, threads)
+            result["planned"] = (search_jobs, threads) == (plan.search_jobs, plan.estimator_threads)
+            results.append(result)
+        return results
+
+
+if __name__ == "__main__":
+
+    parser = argparse.ArgumentParser(description="Parallel search throughput benchmark")
+    parser.add_argument("--years", type=int, default=10, help="years of synthetic price data")
+    parser.add_argument("--fits", type=int, default=25, help="fits timed per split")
+    parser.add_argument("--cores", type=int, default=-1, help="core budget to split")
+    parser.add_argument("--output", default=None, help="json file to write results to")
+    args = parser.parse_args()
+
+    results = ParallelismBenchmark(args.years, args.fits, args.cores).run()
+    for result in results:
+        split = f"{result['search_jobs']:>3} jobs x {result['threads']:>3} threads"
+        print(f"{split}: {result['fits_per_second']:.2f} fits/s{' (planned)' if result['planned'] else ''}")
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
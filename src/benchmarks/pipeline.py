@@ -0,0 +1,204 @@
+from data import FeatureEngineering, FeatureStore, PriceStore, StockData
+from benchmarks.synthetic import SyntheticFetcher
+from pipeline import ModelArtifact, ModelTrain
+from reporting import StockChart
+from sklearn.model_selection import TimeSeriesSplit
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import get_context
+from contextlib import contextmanager
+from types import SimpleNamespace
+from time import perf_counter
+import argparse
+import resource
+import tempfile
+import json
+import sys
+import os
+
+
+class PipelineBenchmark:
+
+    """Offline timings of each pipeline stage over synthetic price series.
+
+    Every series length & symbol count runs in a fresh process, inside a temporary
+    working directory, so peak RSS is per configuration and no real stores,
+    artifacts or reports are touched.
+    """
+
+    def __init__(self, years: list = None, symbol_counts: list = None, model_names: list = None) -> None:
+        """Pipeline benchmark initialiser.
+
+        :param years: years of synthetic price data per series, defaults to [1, 5, 10, 30]
+        :type years: list, optional
+        :param symbol_counts: symbols to run per series length, defaults to [1]
+        :type symbol_counts: list, optional
+        :param model_names: models to benchmark, defaults to ["xgboost", "lstm"]
+        :type model_names: list, optional
+        """
+        self.years = years or [1, 5, 10, 30]
+        self.symbol_counts = symbol_counts or [1]
+        self.model_names = model_names or ["xgboost", "lstm"]
+
+    @staticmethod
+    @contextmanager
+    def _timer(stages: dict, stage: str):
+        """Add a block's duration to a stage's total."""
+        start = perf_counter()
+        yield
+        stages[stage] = stages.get(stage, 0.0) + perf_counter() - start
+
+    @staticmethod
+    def _stock_data(symbol: str, years: int) -> StockData:
+        """Build stock data from the synthetic fetcher & working directory stores."""
+        return StockData(
+            symbol,
+            years,
+            price_store=PriceStore("cache/prices", SyntheticFetcher()),
+            feature_store=FeatureStore("cache/features"),
+        )
+
+    @staticmethod
+    def _benchmark_model(symbol: str, years: int, model_name: str, stages: dict) -> None:
+        """Time one model's preprocessing, cross validation fit, save, load, inference & report."""
+        data = PipelineBenchmark._stock_data(symbol, years)
+        trainer = ModelTrain(model_name, data, n_jobs=-1, resume=False)
+        x, y = data.stock_x_train, data.stock_y_train
+
+        preprocess = trainer.model.preprocess()
+        if preprocess is not None:
+            with PipelineBenchmark._timer(stages, f"{model_name}.preprocess"):
+                preprocess.fit(x, y).transform(data.stock_x_test)
+
+        # one fold fit with the first value of every parameter & the smallest training budget
+        params = {name: values[0] for name, values in trainer.model.params().items()}
+        budget = trainer.model.budget()
+        if budget["resource"] != "n_samples":
+            params[budget["resource"]] = budget["min_resources"]
+        train, _ = list(TimeSeriesSplit(n_splits=trainer.n_splits).split(x))[-1]
+        estimator = trainer._estimator().set_params(**params)
+        with PipelineBenchmark._timer(stages, f"{model_name}.cv_fit"):
+            estimator.fit(x.iloc[train], y.iloc[train], **trainer.model.fit_params())
+
+        trainer.pipeline = SimpleNamespace(best_params_=params, best_score_=0.0, best_estimator_=estimator)
+        with PipelineBenchmark._timer(stages, f"{model_name}.write_model"):
+            trainer._write_model(trainer.pipeline)
+        with PipelineBenchmark._timer(stages, f"{model_name}.load"):
+            loaded = ModelArtifact(symbol, model_name).load()
+        with PipelineBenchmark._timer(stages, f"{model_name}.inference"):
+            loaded.predict(data.stock_x_test)
+        with PipelineBenchmark._timer(stages, f"{model_name}.report"):
+            StockChart(model_name, data, show=False, estimator=loaded).create_report()
+
+    @staticmethod
+    def run_config(years: int, n_symbols: int, model_names: list) -> dict:
+        """Time every stage for n_symbols synthetic series of years length.
+
+        :param years: years of synthetic price data per series
+        :type years: int
+        :param n_symbols: synthetic symbols to run
+        :type n_symbols: int
+        :param model_names: models to benchmark
+        :type model_names: list
+        :return: stage seconds summed over symbols & peak RSS
+        :rtype: dict
+        """
+        stages = {}
+        with tempfile.TemporaryDirectory() as directory:
+            os.chdir(directory)
+            for i in range(n_symbols):
+                symbol = f"SYN{i}"
+                with PipelineBenchmark._timer(stages, "stock_data"):
+                    data = PipelineBenchmark._stock_data(symbol, years)
+                prices = data.price_store.load(symbol, *data.price_store.window(years))
+                with PipelineBenchmark._timer(stages, "build_features"):
+                    FeatureEngineering.build_features(prices[["Close"]].dropna(), data.feature_spec)
+                for model_name in model_names:
+                    PipelineBenchmark._benchmark_model(symbol, years, model_name, stages)
+        # ru_maxrss is in kilobytes on linux & bytes on mac
+        peak_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / (1024 if sys.platform != "darwin" else 1024**2)
+        return {"years": years, "symbols": n_symbols, "stages": stages, "peak_rss_mb": peak_rss}
+
+    def run(self) -> list:
+        """Run every series length & symbol count in its own process.
+
+        :return: results per configuration
+        :rtype: list
+        """
+        results = []
+        for years in self.years:
+            for n_symbols in self.symbol_counts:
+                with ProcessPoolExecutor(max_workers=1, mp_context=get_context("spawn")) as executor:
+                    results.append(executor.submit(self.run_config, years, n_symbols, self.model_names).result())
+        return results
+
+    @staticmethod
+    def compare(results: list, baseline: list, threshold: float = 0.2, min_seconds: float = 0.05) -> list:
+        """Find stages slower than a baseline run.
+
+        :param results: results of this run
+        :type results: list
+        :param baseline: results of the baseline run
+        :type baseline: list
+        :param threshold: allowed fractional slow down, defaults to 0.2
+        :type threshold: float, optional
+        :param min_seconds: ignore slow downs smaller than this, defaults to 0.05
+        :type min_seconds: float, optional
+        :return: regressed stages & peak RSS
+        :rtype: list
+        """
+        baselines = {(result["years"], result["symbols"]): result for result in baseline}
+        regressions = []
+        for result in results:
+            base = baselines.get((result["years"], result["symbols"]))
+            if base is None:
+                continue
+            metrics = [(stage, seconds, base["stages"].get(stage)) for stage, seconds in result["stages"].items()]
+            metrics.append(("peak_rss_mb", result["peak_rss_mb"], base["peak_rss_mb"]))
+            for metric, value, base_value in metrics:
+                if base_value is None or value - base_value < (min_seconds if metric != "peak_rss_mb" else 0):
+                    continue
+                if value > base_value * (1 + threshold):
+                    regressions.append(
+                        {
+                            "years": result["years"],
+                            "symbols": result["symbols"],
+                            "metric": metric,
+                            "baseline": base_value,
+                            "value": value,
+                            "change": value / base_value - 1,
+                        }
+                    )
+        return regressions
+
+
+if __name__ == "__main__":
+
+    parser = argparse.ArgumentParser(description="End to end pipeline benchmark")
+    parser.add_argument("--years", default="1,5,10,30", help="comma separated years of synthetic price data")
+    parser.add_argument("--symbols", default="1", help="comma separated symbol counts")
+    parser.add_argument("--models", default="xgboost,lstm", help="comma separated models to benchmark")
+    parser.add_argument("--output", default=None, help="json file to write results to")
+    parser.add_argument("--baseline", default=None, help="json results to compare against")
+    parser.add_argument("--threshold", type=float, default=0.2, help="allowed fractional slow down")
+    args = parser.parse_args()
+
+    benchmark = PipelineBenchmark(
+        years=[int(years) for years in args.years.split(",")],
+        symbol_counts=[int(count) for count in args.symbols.split(",")],
+        model_names=args.models.split(","),
+    )
+    results = benchmark.run()
+    for result in results:
+        print(f"{result['years']:>3} years x {result['symbols']:>3} symbols: {result['peak_rss_mb']:.0f} MB peak RSS")
+        for stage, seconds in result["stages"].items():
+            print(f"    {stage:<24} {seconds:8.3f}s")
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
+    if args.baseline:
+        with open(args.baseline) as f:
+            regressions = benchmark.compare(results, json.load(f), args.threshold)
+        for regression in regressions:
+            config = f"{regression['years']} years x {regression['symbols']} symbols"
+            print(f"regression {config} {regression['metric']}: {regression['change']:+.0%}")
+        sys.exit(1 if regressions else 0)
@@ -0,0 +1,55 @@
+from datetime import date
+from pandas import DataFrame
+import pandas as pd
+import numpy as np
+import zlib
+
+
+class SyntheticFetcher:
+
+    """Offline price fetcher generating a deterministic random walk per symbol."""
+
+    def __init__(self, seed: int = 123) -> None:
+        """Synthetic fetcher initialiser.
+
+        :param seed: base random seed, combined with each symbol, defaults to 123
+        :type seed: int, optional
+        """
+        self.seed = seed
+
+    def __call__(self, symbol: str, start: date, end: date) -> DataFrame:
+        """Generate daily OHLC bars in yahoo finance's layout.
+
+        :param symbol: Stock symbol to generate data for.
+        :type symbol: str
+        :param start: first date to generate (inclusive)
+        :type start: date
+        :param end: last date to generate (exclusive)
+        :type end: date
+        :return: price dataframe indexed by business date
+        :rtype: DataFrame
+        """
+        index = pd.bdate_range(start, end, name="Date")
+        index = index[index < pd.Timestamp(end)]
+        # draw every series from a fixed origin so overlapping windows return identical bars
+        days = np.asarray((index - pd.Timestamp("1970-01-01")).days)
+        n_days = days.max() + 1 if len(days) else 0
+        rngs = [np.random.default_rng([self.seed, zlib.crc32(symbol.encode()), i]) for i in range(3)]
+        close = 10 * np.exp(np.cumsum(rngs[0].normal(0.0003, 0.02, size=n_days)))[days]
+        spread = np.abs(rngs[1].normal(0, 0.01, size=n_days))[days]
+        volume = rngs[2].integers(1e6, 1e7, size=n_days)[days]
+        return DataFrame(
+            {
+                "Open": close * (1 - spread / 2),
+                "High": close * (1 + spread),
+                "Low": close * (1 - spread),
+                "Close": close,
+                "Adj Close": close,
+                "Volume": volume,
+            },
+            index=index,
+        )
+
+
+if __name__ == "__main__":
+    pass
@@ -1,2 +1,4 @@
 from common.log import Log
 from common.tarzip import TarZip
+from common.resources import ResourcePlan, ResourcePlanner
+from common.instrument import Instrument
@@ -0,0 +1,183 @@
+from contextlib import contextmanager
+from collections import defaultdict
+from threading import Lock, local
+from time import perf_counter, time
+import tracemalloc
+import cProfile
+import pathlib
+import json
+import os
+
+
+class Instrument:
+
+    """Process wide stage timings, counters & optional profiling.
+
+    Spans time named stages & counters count events, both aggregated in process
+    and, if INSTRUMENT_EVENTS names a file, appended to it as json lines. PROFILE
+    switches on cProfile and/or tracemalloc capture of profiled stages, written to
+    PROFILE_DIR. Aggregates are exported as json or Prometheus text.
+    """
+
+    spans = defaultdict(lambda: {"count": 0, "seconds": 0.0, "max_seconds": 0.0})
+    counters = defaultdict(float)
+    lock = Lock()
+    stack = local()
+
+    @staticmethod
+    def _emit(event: dict) -> None:
+        """Append an event to the INSTRUMENT_EVENTS json lines file, if set."""
+        file_name = os.getenv("INSTRUMENT_EVENTS")
+        if not file_name:
+            return
+        pathlib.Path(file_name).parent.mkdir(parents=True, exist_ok=True)
+        with open(file_name, "a") as f:
+            f.write(json.dumps({"time": time(), "pid": os.getpid(), **event}) + "\n")
+
+    @staticmethod
+    def record(name: str, seconds: float, count: int = 1, **labels) -> None:
+        """Record time spent in a stage measured elsewhere.
+
+        :param name: stage name
+        :type name: str
+        :param seconds: seconds spent in each of count occurrences
+        :type seconds: float
+        :param count: occurrences of the stage, defaults to 1
+        :type count: int, optional
+        """
+        with Instrument.lock:
+            span = Instrument.spans[name]
+            span["count"] += count
+            span["seconds"] += seconds * count
+            span["max_seconds"] = max(span["max_seconds"], seconds)
+        Instrument._emit({"type": "span", "name": name, "seconds": seconds, "count": count, **labels})
+
+    @staticmethod
+    @contextmanager
+    def span(name: str, **labels):
+        """Time a stage, nested spans being named after their parents, e.g. train/search.
+
+        :param name: stage name
+        :type name: str
+        """
+        parents = getattr(Instrument.stack, "names", [])
+        Instrument.stack.names = parents + [name]
+        start = perf_counter()
+        try:
+            yield
+        finally:
+            Instrument.stack.names = parents
+            Instrument.record("/".join(parents + [name]), perf_counter() - start, **labels)
+
+    @staticmethod
+    def count(name: str, value: float = 1, **labels) -> None:
+        """Increment a counter.
+
+        :param name: counter name, e.g. trials, folds or epochs
+        :type name: str
+        :param value: amount to increment by, defaults to 1
+        :type value: float, optional
+        """
+        with Instrument.lock:
+            Instrument.counters[name] += value
+        Instrument._emit({"type": "counter", "name": name, "value": value, **labels})
+
+    @staticmethod
+    @contextmanager
+    def profile(name: str):
+        """Time a stage, capturing cProfile and/or tracemalloc profiles as set by PROFILE.
+
+        :param name: stage name, also naming the profile files
+        :type name: str
+        """
+        profilers = [p.strip() for p in os.getenv("PROFILE", "").lower().split(",") if p.strip()]
+        directory = pathlib.Path(os.getenv("PROFILE_DIR", "reports/profiles"))
+        file_name = f"{name.replace('/', '_')}-{os.getpid()}"
+        profiler = cProfile.Profile() if "cprofile" in profilers else None
+        tracing = "tracemalloc" in profilers and not tracemalloc.is_tracing()
+        if tracing:
+            tracemalloc.start()
+        if profiler:
+            profiler.enable()
+        try:
+            with Instrument.span(name):
+                yield
+        finally:
+            if profilers:
+                directory.mkdir(parents=True, exist_ok=True)
+            if profiler:
+                profiler.disable()
+                profiler.dump_stats(directory / f"{file_name}.prof")
+            if tracing:
+                snapshot = tracemalloc.take_snapshot()
+                _, peak = tracemalloc.get_traced_memory()
+                tracemalloc.stop()
+                Instrument.count(f"{name}_peak_traced_bytes", peak)
+                with open(directory / f"{file_name}.tracemalloc.txt", "w") as f:
+                    f.write(f"peak traced memory: {peak / 1024**2:.1f} MB\n")
+                    f.writelines(f"{stat}\n" for stat in snapshot.statistics("lineno")[:25])
+
+    @staticmethod
+    def summary() -> dict:
+        """Return aggregated spans & counters.
+
+        :return: spans (count, seconds & max seconds) & counters
+        :rtype: dict
+        """
+        with Instrument.lock:
+            return {
+                "spans": {name: dict(span) for name, span in Instrument.spans.items()},
+                "counters": dict(Instrument.counters),
+            }
+
+    @staticmethod
+    def reset() -> None:
+        """Clear aggregated spans & counters."""
+        with Instrument.lock:
+            Instrument.spans.clear()
+            Instrument.counters.clear()
+
+    @staticmethod
+    def prometheus(prefix: str = "stock_prediction") -> str:
+        """Return aggregated spans & counters in Prometheus text format.
+
+        :param prefix: metric name prefix, defaults to "stock_prediction"
+        :type prefix: str, optional
+        :return: Prometheus exposition text
+        :rtype: str
+        """
+        summary = Instrument.summary()
+        lines = [
+            f"# TYPE {prefix}_span_seconds_total counter",
+            f"# TYPE {prefix}_span_count_total counter",
+            f"# TYPE {prefix}_span_max_seconds gauge",
+        ]
+        for name, span in summary["spans"].items():
+            lines.append(f'{prefix}_span_seconds_total{{span="{name}"}} {span["seconds"]}')
+            lines.append(f'{prefix}_span_count_total{{span="{name}"}} {span["count"]}')
+            lines.append(f'{prefix}_span_max_seconds{{span="{name}"}} {span["max_seconds"]}')
+        for name, value in summary["counters"].items():
+            metric = f"{prefix}_{name.replace('/', '_')}_total"
+            lines += [f"# TYPE {metric} counter", f"{metric} {value}"]
+        return "\n".join(lines) + "\n"
+
+    @staticmethod
+    def export(file_name: str = None) -> None:
+        """Write aggregated spans & counters, as Prometheus text for .prom files & json otherwise.
+
+        :param file_name: file to write, defaults to INSTRUMENT_METRICS (nothing is written if unset)
+        :type file_name: str, optional
+        """
+        file_name = file_name or os.getenv("INSTRUMENT_METRICS")
+        if not file_name:
+            return
+        pathlib.Path(file_name).parent.mkdir(parents=True, exist_ok=True)
+        with open(file_name, "w") as f:
+            if file_name.endswith(".prom"):
+                f.write(Instrument.prometheus())
+            else:
+                json.dump(Instrument.summary(), f, indent=2)
+
+
+if __name__ == "__main__":
+    pass
@@ -8,16 +8,17 @@ class Log(object):
 
     @staticmethod
     def set_logger(logger_name: str):
-        """create logging object.
+        """create logging object, adding its stdout handler only once per logger.
 
         :param logger_name: Name of logger (present in logging).
         """
-        formatter = logging.Formatter("%(asctime)s - %(name)s - %(levelname)s - %(message)s")
-        c_handler = logging.StreamHandler(sys.stdout)
-        c_handler.setFormatter(formatter)
         logger = logging.getLogger(logger_name)
         logger.setLevel(logging.INFO)
-        logger.addHandler(c_handler)
+        if not logger.handlers:
+            formatter = logging.Formatter("%(asctime)s - %(name)s - %(levelname)s - %(message)s")
+            c_handler = logging.StreamHandler(sys.stdout)
+            c_handler.setFormatter(formatter)
+            logger.addHandler(c_handler)
         return logger
 
 
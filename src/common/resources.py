@@ -0,0 +1,97 @@
+from dataclasses import dataclass
+import math
+import os
+
+
+@dataclass
+class ResourcePlan:
+
+    """Split of a core budget between parallel search fits and estimator threads."""
+
+    cores: int
+    search_jobs: int
+    estimator_threads: int
+
+    def apply(self) -> None:
+        """Cap native thread pools of child processes, e.g. search workers, to the estimator threads.
+
+        The variables are read as a library starts its thread pool, so in this process
+        they only reach libraries not yet imported, e.g. TensorFlow, not numpy's BLAS.
+        Estimators' own threads (XGBoost n_jobs, TensorFlow intra op threads) are set
+        on the estimators.
+        """
+        for variable in [
+            "OMP_NUM_THREADS",
+            "MKL_NUM_THREADS",
+            "OPENBLAS_NUM_THREADS",
+            "TF_NUM_INTRAOP_THREADS",
+        ]:
+            os.environ[variable] = str(self.estimator_threads)
+        os.environ["TF_NUM_INTEROP_THREADS"] = "1"
+
+
+class ResourcePlanner:
+
+    """Plan parallelism from the cores & cgroup CPU quota available to the process."""
+
+    @staticmethod
+    def _cgroup_quota() -> float:
+        """Return cgroup CPU quota in cores, or None if unlimited."""
+        try:
+            with open("/sys/fs/cgroup/cpu.max") as f:
+                quota, period = f.read().split()
+            if quota != "max":
+                return int(quota) / int(period)
+            return None
+        except (OSError, ValueError):
+            pass
+        try:
+            with open("/sys/fs/cgroup/cpu/cpu.cfs_quota_us") as f:
+                quota = int(f.read())
+            with open("/sys/fs/cgroup/cpu/cpu.cfs_period_us") as f:
+                period = int(f.read())
+            return quota / period if quota > 0 else None
+        except (OSError, ValueError):
+            return None
+
+    @staticmethod
+    def available_cores() -> int:
+        """Return cores available to this process, honouring affinity & cgroup quota.
+
+        :return: number of usable cores
+        :rtype: int
+        """
+        if hasattr(os, "sched_getaffinity"):
+            cores = len(os.sched_getaffinity(0))
+        else:
+            cores = os.cpu_count() or 1
+        quota = ResourcePlanner._cgroup_quota()
+        if quota is not None:
+            cores = min(cores, max(1, math.floor(quota)))
+        return cores
+
+    @staticmethod
+    def plan(cores: int = -1, n_points: int = 5, n_splits: int = 5) -> ResourcePlan:
+        """Split a core budget between parallel search fits and estimator threads.
+
+        Parallel fits are capped at the number of fits a search step can run at once
+        (n_points candidates x n_splits folds), with remaining cores given to each
+        estimator's own thread pool.
+
+        :param cores: core budget, defaults to -1 (all available cores)
+        :type cores: int, optional
+        :param n_points: candidates evaluated per search step, defaults to 5
+        :type n_points: int, optional
+        :param n_splits: cross validation folds, defaults to 5
+        :type n_splits: int, optional
+        :return: resource plan
+        :rtype: ResourcePlan
+        """
+        available = ResourcePlanner.available_cores()
+        cores = available if cores is None or cores < 1 else min(cores, available)
+        search_jobs = max(1, min(cores, n_points * n_splits))
+        return ResourcePlan(cores=cores, search_jobs=search_jobs, estimator_threads=max(1, cores // search_jobs))
+
+
+if __name__ == "__main__":
+    pass
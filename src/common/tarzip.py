@@ -1,23 +1,113 @@
+from contextlib import contextmanager
+from typing import BinaryIO, Iterator
+import tempfile
 import tarfile
+import pathlib
+import shutil
+import gzip
 import os
 
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+try:
+    import lz4.frame
+except ImportError:
+    lz4 = None
+
 
 class TarZip:
 
-    """Tarzip compress an h5 model file"""
+    """Stream files & directories in and out of compressed tar archives.
+
+    Archives are compressed with gzip, or zstd / lz4 when installed, and are always
+    written to a temporary file unique to the writer and renamed into place, so
+    readers never see a partly written archive. Extraction rejects members escaping
+    the target directory and can unpack into a private temporary directory.
+    """
+
+    extensions = {"gzip": "gz", "zstd": "zst", "lz4": "lz4"}
+    magic = {b"\x1f\x8b": "gzip", b"\x28\xb5\x2f\xfd": "zstd", b"\x04\x22\x4d\x18": "lz4"}
+
+    @staticmethod
+    def available(codec: str) -> bool:
+        """Return True if codec's library is installed."""
+        return {"gzip": True, "zstd": zstandard is not None, "lz4": lz4 is not None}.get(codec, False)
+
+    @staticmethod
+    def _writer(f: BinaryIO, codec: str, level: int = None) -> BinaryIO:
+        """Wrap a file in a compressing stream."""
+        if codec == "zstd":
+            return zstandard.ZstdCompressor(level=level or 3).stream_writer(f, closefd=False)
+        if codec == "lz4":
+            return lz4.frame.LZ4FrameFile(f, "wb", compression_level=level or 0)
+        return gzip.GzipFile(fileobj=f, mode="wb", compresslevel=level or 6)
+
+    @staticmethod
+    def _reader(f: BinaryIO) -> BinaryIO:
+        """Wrap a file in a decompressing stream, detecting its codec."""
+        header = f.read(4)
+        f.seek(0)
+        codec = next((codec for magic, codec in TarZip.magic.items() if header.startswith(magic)), None)
+        if codec == "zstd":
+            return zstandard.ZstdDecompressor().stream_reader(f, closefd=False)
+        if codec == "lz4":
+            return lz4.frame.LZ4FrameFile(f, "rb")
+        if codec == "gzip":
+            return gzip.GzipFile(fileobj=f, mode="rb")
+        return f
 
     @staticmethod
-    def compress(file_name: str) -> None:
-        """Tar compress a local file.
+    def compress(
+        file_name: str, codec: str = "gzip", level: int = None, remove: bool = True, arcname: str = None
+    ) -> str:
+        """Tar compress a local file or directory.
 
-        :param file_name: name of local file to compress
+        :param file_name: name of local file or directory to compress
         :type file_name: str
+        :param codec: "gzip", "zstd" or "lz4", falling back to gzip if not installed, defaults to "gzip"
+        :type codec: str, optional
+        :param level: compression level, defaults to the codec's default
+        :type level: int, optional
+        :param remove: remove file_name once compressed, defaults to True
+        :type remove: bool, optional
+        :param arcname: path of file_name within the archive, defaults to file_name
+        :type arcname: str, optional
+        :return: name of the archive written
+        :rtype: str
         """
-        tar_file_name = os.path.splitext(file_name)[0]
-        with tarfile.open(f"{tar_file_name}.tar.gz", "w:gz") as tar:
-            tar.add(file_name)
-        os.remove(file_name)
+        codec = codec if TarZip.available(codec) else "gzip"
+        tar_file_name = f"{os.path.splitext(file_name)[0]}.tar.{TarZip.extensions[codec]}"
+        directory, name = os.path.split(tar_file_name)
+        with tempfile.NamedTemporaryFile(dir=directory or ".", prefix=f".{name}.", suffix=".tmp", delete=False) as f:
+            try:
+                with TarZip._writer(f, codec, level) as stream:
+                    with tarfile.open(fileobj=stream, mode="w|") as tar:
+                        tar.add(file_name, arcname=arcname)
+            except BaseException:
+                os.unlink(f.name)
+                raise
+        os.replace(f.name, tar_file_name)
+        if remove and os.path.isdir(file_name):
+            shutil.rmtree(file_name)
+        elif remove:
+            os.remove(file_name)
+        return tar_file_name
 
+    @staticmethod
+    def _members(tar: tarfile.TarFile) -> Iterator[tarfile.TarInfo]:
+        """Yield archive members, rejecting links, devices & paths escaping the target."""
+        for member in tar:
+            path = pathlib.PurePosixPath(member.name)
+            if path.is_absolute() or ".." in path.parts:
+                raise ValueError(f"unsafe path in archive: {member.name}")
+            if not (member.isfile() or member.isdir()):
+                raise ValueError(f"unsupported member in archive: {member.name}")
+            yield member
+
+    @staticmethod
     def extract(file_name: str, directory: str) -> None:
         """Extract all files from tarfile
 
@@ -26,10 +116,24 @@ class TarZip:
         :param directory: name of directory to extract files into
         :type directory: str
         """
-        with tarfile.open(file_name) as tar:
-            for name in tar.getnames():
-                member = tar.getmember(name)
-                tar.extract(member, directory)
+        with open(file_name, "rb") as f:
+            with tarfile.open(fileobj=TarZip._reader(f), mode="r|") as tar:
+                for member in TarZip._members(tar):
+                    tar.extract(member, directory)
+
+    @staticmethod
+    @contextmanager
+    def extract_temp(file_name: str) -> Iterator[str]:
+        """Extract all files from tarfile into a private temporary directory, removed on exit
+
+        :param file_name: name of local file to extract from
+        :type file_name: str
+        :return: temporary directory the files were extracted into
+        :rtype: Iterator[str]
+        """
+        with tempfile.TemporaryDirectory(prefix="tarzip-") as directory:
+            TarZip.extract(file_name, directory)
+            yield directory
 
 
 if __name__ == "__main__":
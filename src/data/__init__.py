@@ -1 +1,6 @@
 from data.core import StockData
+from data.panel import PanelData
+from data.features import FeatureEngineering, FeatureSpec
+from data.store import FeatureStore, PriceStore, YahooFetcher
+from data.ingest import ChartFetcher, PriceIngestion, RateLimiter
+from data.state import FeatureState
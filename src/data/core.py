@@ -1,61 +1,196 @@
 from datetime import date, timedelta
 from dataclasses import dataclass
-from pandas import DataFrame
-from data.features import FeatureEngineering as fe
-import yfinance as yf
-import pandas as pd
+from pandas import DataFrame, DatetimeIndex, Index, Series
+from data.features import FeatureSpec
+from data.store import FeatureStore, PriceStore
+from common import Instrument
+import numpy as np
 
 
-@dataclass
+@dataclass(eq=False)
 class StockData:
 
+    """Stock data held as one float32 matrix of closing price & features over a date index.
+
+    Data frames of the whole data, X & y and their train & test splits are views of
+    the matrix, with the split at a precomputed row, so none of them copy data.
+    Day features are float32 columns of day codes until one hot encoded, when they
+    become float32 indicator columns of the matrix, 4 bytes a cell where uint8
+    dummies would take 1, as models read them as floats anyway. The smoothing
+    levels the smoothing columns were built with are kept by column name.
+    """
+
     stock_symbol: str
     stock_years: int
-    stock_df: DataFrame
-    stock_x: DataFrame
-    stock_y: DataFrame
-    stock_x_train: DataFrame
-    stock_y_train: DataFrame
-    stock_x_test: DataFrame
-    stock_y_test: DataFrame
-
-    def __init__(self, stock_symbol: str, stock_years: int) -> None:
+    stock_start: date
+    index: DatetimeIndex
+    columns: Index
+    matrix: np.ndarray
+    split: int
+    ses_alphas: dict
+
+    def __init__(
+        self,
+        stock_symbol: str,
+        stock_years: int,
+        price_store: PriceStore = None,
+        feature_store: FeatureStore = None,
+        feature_spec: FeatureSpec = None,
+        stock_start: date = None,
+    ) -> None:
         """Stock data class for containing stock data for modelling
 
         :param stock_symbol: Stock symbol to collect data for.
         :type stock_symbol: str
         :param stock_years: number of years to collect data for.
         :type stock_years: int
+        :param price_store: local price store to read prices from, defaults to PriceStore()
+        :type price_store: PriceStore, optional
+        :param feature_store: feature store to materialise features in, defaults to FeatureStore()
+        :type feature_store: FeatureStore, optional
+        :param feature_spec: engineered feature specification, defaults to FeatureSpec.from_env()
+        :type feature_spec: FeatureSpec, optional
+        :param stock_start: first date to collect data from, overriding stock_years, defaults to None
+        :type stock_start: date, optional
         """
         self.stock_symbol = stock_symbol
         self.stock_years = stock_years
-        self.stock_df = self._data_extract()
-        self.stock_df = self._clean_df()
-        self.stock_df = fe.build_features(self.stock_df)
-        self.stock_x, self.stock_y = self.x_y_split(self.stock_df)
-        self.stock_x_train, self.stock_x_test = self.train_test_split(self.stock_x, 90)
-        self.stock_y_train, self.stock_y_test = self.train_test_split(self.stock_y, 90)
+        self.stock_start = stock_start
+        self.price_store = price_store or PriceStore()
+        self.feature_store = feature_store or FeatureStore()
+        self.feature_spec = feature_spec or FeatureSpec.from_env()
+        with Instrument.span("prices"):
+            df = self._clean_df(self._data_extract())
+        with Instrument.span("features"):
+            prices, df = df, self.feature_store.build_features(self.stock_symbol, df, self.feature_spec)
+            self.ses_alphas = self.feature_store.ses_alphas(self.stock_symbol, prices)
+        self.index, self.columns = df.index, df.columns
+        self.matrix = np.ascontiguousarray(df.to_numpy(dtype=np.float32))
+        self.split = self.split_position(self.index, 90)
+        self.encoded = False
+
+    @classmethod
+    def from_matrix(
+        cls,
+        stock_symbol: str,
+        index: DatetimeIndex,
+        columns: Index,
+        matrix: np.ndarray,
+        split: int = None,
+        feature_spec: FeatureSpec = None,
+        stock_years: int = None,
+        stock_start: date = None,
+        encoded: bool = False,
+        ses_alphas: dict = None,
+    ) -> "StockData":
+        """Stock data over an existing matrix, e.g. one symbol's rows of a panel.
+
+        :param stock_symbol: Stock symbol of the data.
+        :type stock_symbol: str
+        :param index: date index of the matrix rows
+        :type index: DatetimeIndex
+        :param columns: matrix column names, closing price first
+        :type columns: Index
+        :param matrix: float32 matrix of closing price & features
+        :type matrix: np.ndarray
+        :param split: first test row, defaults to the first row of the last 90 days
+        :type split: int, optional
+        :param feature_spec: engineered feature specification, defaults to FeatureSpec.from_env()
+        :type feature_spec: FeatureSpec, optional
+        :param stock_years: number of years the data covers, defaults to None
+        :type stock_years: int, optional
+        :param stock_start: first date the data was collected from, defaults to the first index date
+        :type stock_start: date, optional
+        :param encoded: day features are already one hot encoded, defaults to False
+        :type encoded: bool, optional
+        :param ses_alphas: smoothing levels of the smoothing columns by column name, defaults to None
+        :type ses_alphas: dict, optional
+        :return: stock data
+        :rtype: StockData
+        """
+        data = cls.__new__(cls)
+        data.stock_symbol, data.stock_years = stock_symbol, stock_years
+        data.stock_start = stock_start or (index.min().date() if len(index) else None)
+        data.feature_spec = feature_spec or FeatureSpec.from_env()
+        data.index, data.columns, data.matrix = index, Index(columns), matrix
+        data.split = cls.split_position(index, 90) if split is None else split
+        data.encoded = encoded
+        data.ses_alphas = dict(ses_alphas or {})
+        return data
 
     def _data_extract(self) -> DataFrame:
-        """Extract stock data from yahoo finance
+        """Extract stock data from the local price store, fetching missing dates.
 
         :return: stock data dataframe
         :rtype: DataFrame
         """
-        today = date.today()
-        today_min = date.today() - timedelta(days=365 * self.stock_years)
-        return yf.download(self.stock_symbol, end=today, start=today_min, progress=False)
+        start, end = self.price_store.window(self.stock_years)
+        self.stock_start = self.stock_start or start
+        return self.price_store.load(self.stock_symbol, self.stock_start, end)
 
-    def _clean_df(self) -> DataFrame:
+    @staticmethod
+    def _clean_df(df: DataFrame) -> DataFrame:
         """Clean stock dataframe.
 
+        :param df: extracted stock data
+        :type df: DataFrame
         :return: cleaned dataframe
         :rtype: DataFrame
         """
-        df = self.stock_df.drop(["Open", "High", "Low", "Adj Close", "Volume"], axis=1)
+        df = df.drop(["Open", "High", "Low", "Adj Close", "Volume"], axis=1)
         df = df.dropna()
         return df
 
+    @staticmethod
+    def split_position(index: DatetimeIndex, test_days: int) -> int:
+        """Return the first row of the last n days.
+
+        :param index: sorted date index
+        :type index: DatetimeIndex
+        :param test_days: last n days to use for testing
+        :type test_days: int
+        :return: row position splitting train & test rows
+        :rtype: int
+        """
+        if not len(index):
+            return 0
+        return int(index.searchsorted(index.max() - timedelta(days=test_days)))
+
+    @property
+    def stock_df(self) -> DataFrame:
+        """Closing price & features."""
+        return DataFrame(self.matrix, index=self.index, columns=self.columns, copy=False)
+
+    @property
+    def stock_x(self) -> DataFrame:
+        """Features."""
+        return DataFrame(self.matrix[:, 1:], index=self.index, columns=self.columns[1:], copy=False)
+
+    @property
+    def stock_y(self) -> Series:
+        """Closing price."""
+        return Series(self.matrix[:, 0], index=self.index, name=self.columns[0], copy=False)
+
+    @property
+    def stock_x_train(self) -> DataFrame:
+        """Training features."""
+        return self.stock_x.iloc[: self.split]
+
+    @property
+    def stock_x_test(self) -> DataFrame:
+        """Testing features."""
+        return self.stock_x.iloc[self.split :]
+
+    @property
+    def stock_y_train(self) -> Series:
+        """Training closing price."""
+        return self.stock_y.iloc[: self.split]
+
+    @property
+    def stock_y_test(self) -> Series:
+        """Testing closing price."""
+        return self.stock_y.iloc[self.split :]
+
     @staticmethod
     def train_test_split(df: DataFrame, test_days: int) -> tuple[DataFrame, DataFrame]:
         """Create time based train test split.
@@ -92,16 +227,28 @@ class StockData:
         """
         return self.stock_x.columns
 
-    @staticmethod
-    def _onehotencode(df: DataFrame, cols_to_encode: list) -> DataFrame:
-        """One hot encoder"""
-        return pd.get_dummies(df, columns=cols_to_encode, prefix=cols_to_encode)
-
     def ohe_cat_cols(self) -> None:
-        """One hot encode categorical variables."""
-        ohe_cols = [col for col in self.stock_x if col.startswith("day")]
-        self.stock_x = self._onehotencode(self.stock_x, ohe_cols)
-        self.stock_x_train, self.stock_x_test = self.train_test_split(self.stock_x, 90)
+        """One hot encode categorical variables.
+
+        The matrix is rebuilt once with the day codes replaced by float32 indicator
+        columns of every observed day, named and ordered as pd.get_dummies would,
+        e.g. 402 columns & 4 MB for 10 years of rows.
+        """
+        if self.encoded:
+            return
+        day_cols = [i for i, col in enumerate(self.columns) if col.startswith("day")]
+        other_cols = [i for i in range(len(self.columns)) if i not in day_cols]
+        codes = self.matrix[:, day_cols].astype(np.int16)
+        categories = [np.unique(codes[:, j]) for j in range(len(day_cols))]
+
+        matrix = np.zeros((len(self.matrix), len(other_cols) + sum(map(len, categories))), dtype=np.float32)
+        matrix[:, : len(other_cols)] = self.matrix[:, other_cols]
+        columns, offset, rows = list(self.columns[other_cols]), len(other_cols), np.arange(len(matrix))
+        for j, (col, values) in enumerate(zip(self.columns[day_cols], categories)):
+            matrix[rows, offset + np.searchsorted(values, codes[:, j])] = 1
+            columns += [f"{col}_{value}" for value in values]
+            offset += len(values)
+        self.matrix, self.columns, self.encoded = matrix, Index(columns), True
 
 
 if __name__ == "__main__":
@@ -1,6 +1,83 @@
-from pandas import DataFrame
-from statsmodels.tsa.holtwinters import SimpleExpSmoothing
-import warnings
+from dataclasses import dataclass, asdict
+from pandas import DataFrame, DatetimeIndex
+from scipy.optimize import minimize_scalar
+from scipy.signal import lfilter
+from numpy.lib.stride_tricks import as_strided
+import pandas as pd
+import numpy as np
+import hashlib
+import json
+import os
+
+
+@dataclass(frozen=True)
+class FeatureSpec:
+
+    """Declarative specification of the engineered price features."""
+
+    lags: tuple = tuple(range(1, 30))
+    sma_windows: tuple = (5, 10, 30, 60, 90)
+    ses_alphas: tuple = (0.2, 0.4, 0.6, 0.8, None)
+
+    @staticmethod
+    def _parse(value: str, cast: type) -> tuple:
+        """Parse a comma separated list, expanding a-b integer ranges."""
+        items = []
+        for item in value.split(","):
+            item = item.strip()
+            if item == "None":
+                items.append(None)
+            elif cast is int and "-" in item:
+                first, last = item.split("-")
+                items.extend(range(int(first), int(last) + 1))
+            else:
+                items.append(cast(item))
+        return tuple(items)
+
+    @classmethod
+    def from_env(cls) -> "FeatureSpec":
+        """Build spec from FEATURE_LAGS, FEATURE_SMA_WINDOWS & FEATURE_SES_ALPHAS.
+
+        Unset variables keep their defaults, e.g. FEATURE_LAGS="1-29",
+        FEATURE_SMA_WINDOWS="5,10,30,60,90", FEATURE_SES_ALPHAS="0.2,0.4,0.6,0.8,None".
+
+        :return: feature specification
+        :rtype: FeatureSpec
+        """
+        spec = {}
+        for name, variable, cast in [
+            ("lags", "FEATURE_LAGS", int),
+            ("sma_windows", "FEATURE_SMA_WINDOWS", int),
+            ("ses_alphas", "FEATURE_SES_ALPHAS", float),
+        ]:
+            if os.getenv(variable):
+                spec[name] = cls._parse(os.getenv(variable), cast)
+        return cls(**spec)
+
+    def columns(self) -> list:
+        """Return price feature column names in build order."""
+        return (
+            [f"close_lag_{lag}" for lag in self.lags]
+            + [f"close_sma_{window}" for window in self.sma_windows]
+            + [f"close_ses_{alpha}" for alpha in self.ses_alphas]
+        )
+
+    def subset(self, columns: list) -> "FeatureSpec":
+        """Return spec restricted to the given price feature columns."""
+        columns = set(columns)
+        return FeatureSpec(
+            lags=tuple(lag for lag in self.lags if f"close_lag_{lag}" in columns),
+            sma_windows=tuple(window for window in self.sma_windows if f"close_sma_{window}" in columns),
+            ses_alphas=tuple(alpha for alpha in self.ses_alphas if f"close_ses_{alpha}" in columns),
+        )
+
+    def warm_up(self) -> int:
+        """Return number of leading rows without a full feature history."""
+        return max([0, *self.lags, *[window - 1 for window in self.sma_windows]])
+
+    def hash(self) -> str:
+        """Return content hash of the spec."""
+        return hashlib.sha1(json.dumps(asdict(self)).encode()).hexdigest()[:16]
 
 
 class FeatureEngineering:
@@ -8,45 +85,169 @@ class FeatureEngineering:
     """Create features from stock data."""
 
     @staticmethod
-    def _time_features(df: DataFrame) -> DataFrame:
-        """Create time features from dataframe."""
-        df["day_of_year"] = df.index.dayofyear
-        df["day_of_month"] = df.index.day
-        df["day_of_week"] = df.index.dayofweek
-        return df
-
-    @staticmethod
-    def _closing_lags(df: DataFrame) -> DataFrame:
-        """Create closing price lags."""
-        for lags in range(1, 30):
-            df[f"close_lag_{lags}"] = df["Close"].shift(lags)
-        return df
-
-    @staticmethod
-    def _closing_sma(df: DataFrame) -> DataFrame:
-        """Create closing simple moving average."""
-        for window in [5, 10, 30, 60, 90]:
-            df[f"close_sma_{window}"] = df["Close"].rolling(window).mean()
-        return df
-
-    @staticmethod
-    def _closing_ses(df: DataFrame) -> DataFrame:
-        """Create closing simple exponential smoothing features."""
-        warnings.filterwarnings("ignore")
-        for alpha in [0.2, 0.4, 0.6, 0.8, None]:
-            se = SimpleExpSmoothing(df["Close"])
-            se_fitted = se.fit(smoothing_level=alpha)
-            df[f"close_ses_{alpha}"] = se_fitted.predict(0)
-        return df
-
-    def build_features(df: DataFrame) -> DataFrame:
-        """Build engineered features."""
-        df = FeatureEngineering._time_features(df)
-        df = FeatureEngineering._closing_lags(df)
-        df = FeatureEngineering._closing_sma(df)
-        df = FeatureEngineering._closing_ses(df)
-        df = df.dropna()
-        return df
+    def _time_features(index: DatetimeIndex) -> DataFrame:
+        """Create time features from date index."""
+        return DataFrame(
+            {
+                "day_of_year": index.dayofyear,
+                "day_of_month": index.day,
+                "day_of_week": index.dayofweek,
+            },
+            index=index,
+        )
+
+    @staticmethod
+    def _closing_lags(close: np.ndarray, lags: tuple, out: np.ndarray) -> None:
+        """Write closing price lags into out.
+
+        Reads every lag from a single sliding window view over the NaN padded
+        closing prices, row t of the view holding close[t - max_lag : t + 1].
+        """
+        max_lag = max(lags)
+        padded = np.concatenate([np.full(max_lag, np.nan), close])
+        step = padded.strides[0]
+        windows = as_strided(padded, shape=(len(close), max_lag + 1), strides=(step, step), writeable=False)
+        out[:] = windows[:, [max_lag - lag for lag in lags]]
+
+    @staticmethod
+    def _closing_sma(close: np.ndarray, windows: tuple, out: np.ndarray) -> None:
+        """Write closing simple moving averages into out."""
+        cumsum = np.concatenate([[0.0], np.cumsum(close)])
+        for i, window in enumerate(windows):
+            out[: window - 1, i] = np.nan
+            out[window - 1 :, i] = (cumsum[window:] - cumsum[:-window]) / window
+
+    @staticmethod
+    def _ewma(close: np.ndarray, alpha: float) -> np.ndarray:
+        """One step ahead simple exponential smoothing, seeded with the first close.
+
+        Runs the recursion level[t] = alpha * close[t] + (1 - alpha) * level[t - 1]
+        as a first order linear filter and returns the level known before each close.
+        """
+        level, _ = lfilter([alpha], [1.0, alpha - 1.0], close, zi=[(1.0 - alpha) * close[0]])
+        return np.concatenate([close[:1], level[:-1]])
+
+    @staticmethod
+    def _ses_alpha(close: np.ndarray) -> float:
+        """Return the smoothing level minimising one step ahead squared error."""
+        result = minimize_scalar(
+            lambda alpha: np.sum((close - FeatureEngineering._ewma(close, alpha)) ** 2),
+            bounds=(0.0, 1.0),
+            method="bounded",
+            options={"xatol": 1e-5},
+        )
+        return result.x
+
+    @staticmethod
+    def _closing_ses(close: np.ndarray, alphas: tuple, out: np.ndarray) -> None:
+        """Write closing simple exponential smoothing for resolved levels into out."""
+        for i, alpha in enumerate(alphas):
+            out[:, i] = FeatureEngineering._ewma(close, alpha)
+
+    @staticmethod
+    def ses_alphas(close: np.ndarray, spec: FeatureSpec) -> tuple:
+        """Resolve spec smoothing levels, optimising any None level on close.
+
+        :param close: closing prices
+        :type close: np.ndarray
+        :param spec: feature specification
+        :type spec: FeatureSpec
+        :return: smoothing level for each spec ses column
+        :rtype: tuple
+        """
+        close = np.asarray(close, dtype=np.float64)
+        return tuple(FeatureEngineering._ses_alpha(close) if alpha is None else alpha for alpha in spec.ses_alphas)
+
+    @staticmethod
+    def price_features(close: np.ndarray, spec: FeatureSpec, alphas: tuple = None) -> np.ndarray:
+        """Build all price features of a spec into one preallocated float32 block.
+
+        :param close: closing prices
+        :type close: np.ndarray
+        :param spec: feature specification
+        :type spec: FeatureSpec
+        :param alphas: resolved smoothing levels from ses_alphas, defaults to resolving on close
+        :type alphas: tuple, optional
+        :return: (rows, spec columns) block, NaN where a feature lacks history
+        :rtype: np.ndarray
+        """
+        close = np.asarray(close, dtype=np.float64)
+        n_lags, n_sma = len(spec.lags), len(spec.sma_windows)
+        block = np.empty((len(close), len(spec.columns())), dtype=np.float32)
+        if len(close):
+            if n_lags:
+                FeatureEngineering._closing_lags(close, spec.lags, block[:, :n_lags])
+            FeatureEngineering._closing_sma(close, spec.sma_windows, block[:, n_lags : n_lags + n_sma])
+            alphas = alphas or FeatureEngineering.ses_alphas(close, spec)
+            FeatureEngineering._closing_ses(close, alphas, block[:, n_lags + n_sma :])
+        return block
+
+    @staticmethod
+    def extend_price_features(close: np.ndarray, block: np.ndarray, spec: FeatureSpec, alphas: tuple) -> np.ndarray:
+        """Extend a price feature block with rows for newly appended closes.
+
+        Lags & moving averages are computed over the trailing warm up window only
+        and smoothing continues the recursion from the last stored level, so the
+        cost scales with the appended rows rather than the full history.
+
+        :param close: closing prices, of which block covers the leading rows
+        :type close: np.ndarray
+        :param block: price feature block for the leading rows of close
+        :type block: np.ndarray
+        :param spec: feature specification of block
+        :type spec: FeatureSpec
+        :param alphas: resolved smoothing levels block was built with
+        :type alphas: tuple
+        :return: (rows, spec columns) block for all of close
+        :rtype: np.ndarray
+        """
+        close = np.asarray(close, dtype=np.float64)
+        rows = len(block)
+        window_spec = FeatureSpec(lags=spec.lags, sma_windows=spec.sma_windows, ses_alphas=())
+        n_window = len(window_spec.columns())
+        head = max(0, rows - spec.warm_up())
+
+        extended = np.empty((len(close), block.shape[1]), dtype=np.float32)
+        extended[:rows] = block
+        extended[rows:, :n_window] = FeatureEngineering.price_features(close[head:], window_spec)[rows - head :]
+        for i, alpha in enumerate(alphas):
+            last_level = block[rows - 1, n_window + i]
+            level, _ = lfilter([alpha], [1.0, alpha - 1.0], close[rows - 1 : -1], zi=[(1.0 - alpha) * last_level])
+            extended[rows:, n_window + i] = level
+        return extended
+
+    @staticmethod
+    def assemble(df: DataFrame, block: np.ndarray, spec: FeatureSpec) -> DataFrame:
+        """Join prices, time features & a price feature block, dropping warm up rows.
+
+        :param df: cleaned price dataframe
+        :type df: DataFrame
+        :param block: price feature block from price_features
+        :type block: np.ndarray
+        :param spec: feature specification of block
+        :type spec: FeatureSpec
+        :return: feature dataframe
+        :rtype: DataFrame
+        """
+        start = min(spec.warm_up(), len(df))
+        index = df.index[start:]
+        features = DataFrame(block[start:], index=index, columns=spec.columns(), copy=False)
+        time_features = FeatureEngineering._time_features(index)
+        return pd.concat([df.iloc[start:], time_features, features], axis=1, copy=False)
+
+    def build_features(df: DataFrame, spec: FeatureSpec = None) -> DataFrame:
+        """Build engineered features.
+
+        :param df: cleaned price dataframe
+        :type df: DataFrame
+        :param spec: feature specification, defaults to FeatureSpec()
+        :type spec: FeatureSpec, optional
+        :return: feature dataframe
+        :rtype: DataFrame
+        """
+        spec = spec or FeatureSpec()
+        block = FeatureEngineering.price_features(df["Close"].to_numpy(), spec)
+        return FeatureEngineering.assemble(df, block, spec)
 
 
 if __name__ == "__main__":
@@ -0,0 +1,200 @@
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date, datetime, timezone
+from requests.adapters import HTTPAdapter
+from pandas import DataFrame
+from data.store import PriceStore
+from threading import Lock
+from time import monotonic, sleep, time
+import pandas as pd
+import numpy as np
+import requests
+import random
+import os
+
+
+class RateLimiter:
+
+    """Thread safe limit on the rate of requests."""
+
+    def __init__(self, rate: float) -> None:
+        """Rate limiter initialiser.
+
+        :param rate: most requests per second, 0 for no limit
+        :type rate: float
+        """
+        self.interval = 1 / rate if rate else 0
+        self.next_time = monotonic()
+        self.lock = Lock()
+
+    def acquire(self) -> None:
+        """Block until the next request is allowed."""
+        with self.lock:
+            now = monotonic()
+            wait = self.next_time - now
+            self.next_time = max(now, self.next_time) + self.interval
+        if wait > 0:
+            sleep(wait)
+
+
+class ChartFetcher:
+
+    """Fetch daily price bars from a yahoo finance style chart API over one pooled session.
+
+    Requests are rate limited across threads & retried with exponential backoff on
+    connection errors, rate limiting & server errors.
+    """
+
+    retry_statuses = {429, 500, 502, 503, 504}
+
+    def __init__(
+        self,
+        base_url: str = None,
+        rate_limit: float = 5.0,
+        retries: int = 4,
+        backoff: float = 0.5,
+        timeout: float = 10.0,
+        pool_size: int = 16,
+    ) -> None:
+        """Chart fetcher initialiser.
+
+        :param base_url: chart API root, defaults to PRICE_API_URL or https://query1.finance.yahoo.com
+        :type base_url: str, optional
+        :param rate_limit: most requests per second across threads, defaults to 5.0
+        :type rate_limit: float, optional
+        :param retries: retries after a failed request, defaults to 4
+        :type retries: int, optional
+        :param backoff: seconds to wait before the first retry, doubling after each, defaults to 0.5
+        :type backoff: float, optional
+        :param timeout: request timeout in seconds, defaults to 10.0
+        :type timeout: float, optional
+        :param pool_size: connections kept open for reuse, defaults to 16
+        :type pool_size: int, optional
+        """
+        self.base_url = (base_url or os.getenv("PRICE_API_URL", "https://query1.finance.yahoo.com")).rstrip("/")
+        self.limiter = RateLimiter(rate_limit)
+        self.retries = retries
+        self.backoff = backoff
+        self.timeout = timeout
+        self.session = requests.Session()
+        self.session.headers["User-Agent"] = "Mozilla/5.0"
+        adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+
+    def _get(self, url: str, params: dict) -> dict:
+        """GET json, retrying transient failures."""
+        for attempt in range(self.retries + 1):
+            self.limiter.acquire()
+            try:
+                response = self.session.get(url, params=params, timeout=self.timeout)
+            except (requests.ConnectionError, requests.Timeout):
+                if attempt == self.retries:
+                    raise
+                response = None
+            if response is not None and response.status_code not in self.retry_statuses:
+                response.raise_for_status()
+                return response.json()
+            if response is not None and attempt == self.retries:
+                response.raise_for_status()
+            retry_after = response.headers.get("Retry-After") if response is not None else None
+            delay = float(retry_after) if retry_after and retry_after.isdigit() else self.backoff * 2**attempt
+            sleep(delay * random.uniform(1, 1.25))
+
+    @staticmethod
+    def _timestamp(day: date) -> int:
+        """Return unix time of midnight UTC of a date."""
+        return int(datetime(day.year, day.month, day.day, tzinfo=timezone.utc).timestamp())
+
+    @staticmethod
+    def _parse(chart: dict) -> DataFrame:
+        """Convert a chart API response into yahoo finance's price layout."""
+        result = (chart.get("chart", {}).get("result") or [None])[0]
+        columns = ["Open", "High", "Low", "Close", "Adj Close", "Volume"]
+        if not result or not result.get("timestamp"):
+            return DataFrame(columns=columns, index=pd.DatetimeIndex([], name="Date"), dtype=np.float64)
+        offset = result.get("meta", {}).get("gmtoffset", 0)
+        index = pd.to_datetime(np.asarray(result["timestamp"]) + offset, unit="s").normalize().rename("Date")
+        quote = result["indicators"]["quote"][0]
+        adjclose = (result["indicators"].get("adjclose") or [{"adjclose": quote["close"]}])[0]["adjclose"]
+        df = DataFrame(
+            {
+                "Open": quote["open"],
+                "High": quote["high"],
+                "Low": quote["low"],
+                "Close": quote["close"],
+                "Adj Close": adjclose,
+                "Volume": quote["volume"],
+            },
+            index=index,
+            dtype=np.float64,
+        )
+        return df[~df.index.duplicated(keep="last")]
+
+    def __call__(self, symbol: str, start: date, end: date) -> DataFrame:
+        """Download daily price bars.
+
+        :param symbol: Stock symbol to collect data for.
+        :type symbol: str
+        :param start: first date to collect (inclusive)
+        :type start: date
+        :param end: last date to collect (exclusive)
+        :type end: date
+        :return: price dataframe indexed by date
+        :rtype: DataFrame
+        """
+        params = {
+            "period1": self._timestamp(start),
+            "period2": self._timestamp(end),
+            "interval": "1d",
+            "events": "div,splits",
+            "includeAdjustedClose": "true",
+        }
+        df = self._parse(self._get(f"{self.base_url}/v8/finance/chart/{symbol}", params))
+        return df[(df.index >= pd.Timestamp(start)) & (df.index < pd.Timestamp(end))]
+
+
+class PriceIngestion:
+
+    """Fill the local price store for many symbols concurrently, ahead of training."""
+
+    def __init__(self, price_store: PriceStore = None, max_workers: int = 8) -> None:
+        """Price ingestion initialiser.
+
+        :param price_store: price store to fill, defaults to PriceStore(fetcher=ChartFetcher())
+        :type price_store: PriceStore, optional
+        :param max_workers: symbols fetched concurrently, defaults to 8
+        :type max_workers: int, optional
+        """
+        self.price_store = price_store or PriceStore(fetcher=ChartFetcher(pool_size=max_workers))
+        self.max_workers = max_workers
+
+    def _ingest(self, symbol: str, start: date, end: date) -> dict:
+        """Fill one symbol's prices, isolating its failure from other symbols."""
+        started = time()
+        try:
+            rows = len(self.price_store.load(symbol, start, end))
+            status = "complete" if rows else "empty"
+            return {"symbol": symbol, "status": status, "rows": rows, "seconds": time() - started}
+        except Exception as e:
+            return {"symbol": symbol, "status": "failed", "error": repr(e), "seconds": time() - started}
+
+    def run(self, stock_symbols: list, stock_years: int, stock_start: date = None) -> list:
+        """Fetch every symbol's missing price bars into the price store.
+
+        :param stock_symbols: Stock symbols to collect data for.
+        :type stock_symbols: list
+        :param stock_years: number of years to collect data for.
+        :type stock_years: int
+        :param stock_start: first date to collect data from, overriding stock_years, defaults to None
+        :type stock_start: date, optional
+        :return: per symbol status, rows stored & seconds taken
+        :rtype: list
+        """
+        start, end = self.price_store.window(stock_years)
+        start = stock_start or start
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            return list(executor.map(lambda symbol: self._ingest(symbol, start, end), stock_symbols))
+
+
+if __name__ == "__main__":
+    pass
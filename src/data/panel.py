@@ -0,0 +1,103 @@
+from datetime import date, timedelta
+from pandas import DatetimeIndex, Index
+from data.core import StockData
+from data.features import FeatureSpec
+from data.store import FeatureStore, PriceStore
+import numpy as np
+
+
+class PanelData(StockData):
+
+    """Stock data of many symbols stacked into one matrix for a single global model.
+
+    Each symbol's rows carry a symbol_id feature, its position in stock_symbols, and
+    rows are ordered by date so time series cross validation folds & the train
+    test split cut every symbol at the same dates. Smoothing levels are kept per
+    symbol, estimated levels differing between symbols.
+    """
+
+    def __init__(
+        self,
+        stock_symbols: list,
+        stock_years: int,
+        panel_name: str = "PANEL",
+        price_store: PriceStore = None,
+        feature_store: FeatureStore = None,
+        feature_spec: FeatureSpec = None,
+        stock_start: date = None,
+    ) -> None:
+        """Panel data class for containing many symbols' stock data for modelling
+
+        :param stock_symbols: Stock symbols to collect data for.
+        :type stock_symbols: list
+        :param stock_years: number of years to collect data for.
+        :type stock_years: int
+        :param panel_name: name the panel's models & reports are saved under, defaults to "PANEL"
+        :type panel_name: str, optional
+        :param price_store: local price store to read prices from, defaults to PriceStore()
+        :type price_store: PriceStore, optional
+        :param feature_store: feature store to materialise features in, defaults to FeatureStore()
+        :type feature_store: FeatureStore, optional
+        :param feature_spec: engineered feature specification, defaults to FeatureSpec.from_env()
+        :type feature_spec: FeatureSpec, optional
+        :param stock_start: first date to collect data from, overriding stock_years, defaults to None
+        :type stock_start: date, optional
+        """
+        self.stock_symbol = panel_name
+        self.stock_symbols = list(stock_symbols)
+        self.stock_years = stock_years
+        self.price_store = price_store or PriceStore()
+        self.feature_store = feature_store or FeatureStore()
+        self.feature_spec = feature_spec or FeatureSpec.from_env()
+
+        matrices, dates, self.symbol_alphas = [], [], {}
+        for symbol_id, symbol in enumerate(self.stock_symbols):
+            data = StockData(symbol, stock_years, self.price_store, self.feature_store, self.feature_spec, stock_start)
+            matrix = np.empty((len(data.matrix), data.matrix.shape[1] + 1), dtype=np.float32)
+            matrix[:, :-1], matrix[:, -1] = data.matrix, symbol_id
+            matrices.append(matrix)
+            dates.append(data.index.to_numpy())
+            self.symbol_alphas[symbol] = data.ses_alphas
+            self.stock_start = data.stock_start if symbol_id == 0 else min(self.stock_start, data.stock_start)
+            columns = data.columns
+        dates = np.concatenate(dates)
+        order = np.argsort(dates, kind="stable")
+
+        self.index = DatetimeIndex(dates[order], name=columns.name)
+        self.columns = columns.append(Index(["symbol_id"]))
+        self.matrix = np.concatenate(matrices)[order]
+        self.split = self.split_position(self.index, 90)
+        self.encoded = False
+        self.ses_alphas = {}
+
+    @property
+    def symbol_ids(self) -> np.ndarray:
+        """Position in stock_symbols of every row's symbol."""
+        return self.matrix[:, self.columns.get_loc("symbol_id")].astype(int)
+
+    def member(self, symbol: str) -> StockData:
+        """Return one symbol's rows as stock data, split at the panel's test dates.
+
+        :param symbol: Stock symbol of the panel
+        :type symbol: str
+        :return: symbol's stock data, with the panel's columns
+        :rtype: StockData
+        """
+        rows = np.flatnonzero(self.symbol_ids == self.stock_symbols.index(symbol))
+        index = self.index[rows]
+        cutoff = self.index.max() - timedelta(days=90)
+        return StockData.from_matrix(
+            symbol,
+            index,
+            self.columns,
+            self.matrix[rows],
+            split=int(index.searchsorted(cutoff)),
+            feature_spec=self.feature_spec,
+            stock_years=self.stock_years,
+            encoded=self.encoded,
+            ses_alphas=self.symbol_alphas[symbol],
+        )
+
+
+if __name__ == "__main__":
+    pass
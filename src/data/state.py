@@ -0,0 +1,207 @@
+from pandas import DatetimeIndex
+from data.core import StockData
+import numpy as np
+import re
+
+
+class FeatureState:
+
+    """Price features of many series, advanced one day at a time.
+
+    Each series keeps a ring buffer of its trailing closes, running sums of its
+    moving average windows and its smoothing levels, so building the next day's
+    feature rows & appending a close cost O(1) per series & feature, vectorised over
+    series, instead of rebuilding a feature frame.
+
+    Moving average features include the day's own close, which is not known when
+    forecasting it, so the latest known close stands in for it.
+    """
+
+    day_columns = ["day_of_year", "day_of_month", "day_of_week"]
+
+    def __init__(
+        self,
+        columns: list,
+        closes: np.ndarray,
+        levels: np.ndarray,
+        alphas: np.ndarray,
+        dates: np.ndarray,
+        statics: np.ndarray,
+    ) -> None:
+        """Feature state initialiser.
+
+        :param columns: feature columns, as the model was trained on
+        :type columns: list
+        :param closes: (series, history) trailing closes, oldest first, history covering every lag & window
+        :type closes: np.ndarray
+        :param levels: (series, smoothing columns) smoothing levels after the last close
+        :type levels: np.ndarray
+        :param alphas: (series, smoothing columns) smoothing levels' alphas
+        :type alphas: np.ndarray
+        :param dates: (series,) dates of the last closes
+        :type dates: np.ndarray
+        :param statics: (series, other columns) values of the remaining columns, e.g. symbol_id, held constant
+        :type statics: np.ndarray
+        """
+        self.columns = list(columns)
+        self._plan()
+        self.ring = np.array(closes, dtype=np.float64)
+        self.pos = 0
+        self.sums = np.zeros((len(self.ring), len(self.windows)))
+        for j, window in enumerate(self.windows):
+            self.sums[:, j] = self.ring[:, self.history - window + 1 :].sum(axis=1)
+        self.levels = np.array(levels, dtype=np.float64)
+        self.alphas = np.array(alphas, dtype=np.float64)
+        self.dates = np.asarray(dates, dtype="datetime64[D]")
+        self.statics = np.asarray(statics, dtype=np.float32)
+
+    def _plan(self) -> None:
+        """Sort columns into lags, moving averages, smoothing, day & static columns."""
+        self.lag_cols, self.sma_cols, self.ses_cols, self.static_cols = [], [], [], []
+        self.day_cols, lags, windows = [], [], []
+        for i, column in enumerate(self.columns):
+            if re.fullmatch(r"close_lag_\d+", column):
+                self.lag_cols.append(i)
+                lags.append(int(column.rsplit("_", 1)[1]))
+            elif re.fullmatch(r"close_sma_\d+", column):
+                self.sma_cols.append(i)
+                windows.append(int(column.rsplit("_", 1)[1]))
+            elif column.startswith("close_ses_"):
+                self.ses_cols.append(i)
+            elif column in self.day_columns:
+                self.day_cols.append((i, self.day_columns.index(column), None))
+            elif column.rsplit("_", 1)[0] in self.day_columns:
+                prefix, value = column.rsplit("_", 1)
+                self.day_cols.append((i, self.day_columns.index(prefix), int(value)))
+            else:
+                self.static_cols.append(i)
+        self.lags, self.windows = np.array(lags, dtype=np.int64), np.array(windows, dtype=np.int64)
+        self.history = max([1, *lags, *(window - 1 for window in windows)])
+
+    @property
+    def n_series(self) -> int:
+        """Number of series."""
+        return len(self.ring)
+
+    @staticmethod
+    def _alpha(close: np.ndarray, level: np.ndarray) -> float:
+        """Least squares estimate of the alpha of level[t + 1] = alpha * close[t] + (1 - alpha) * level[t]."""
+        gap, step = close[:-1] - level[:-1], level[1:] - level[:-1]
+        scale = np.dot(gap, gap)
+        return float(np.dot(step, gap) / scale) if scale else 1.0
+
+    @classmethod
+    def _alphas(cls, data: StockData, columns: list, close: np.ndarray, levels: np.ndarray) -> np.ndarray:
+        """Smoothing levels of smoothing columns, from their names or those the data was built with.
+
+        Columns of neither, e.g. of data built before levels were kept, are estimated
+        on the closes & levels given, which must end at the earliest series' last close.
+        """
+        alphas = []
+        for j, column in enumerate(columns):
+            if column in data.ses_alphas:
+                alphas.append(float(data.ses_alphas[column]))
+            elif column != f"close_ses_{None}":
+                alphas.append(float(column.rsplit("_", 1)[1]))
+            else:
+                alphas.append(cls._alpha(close, levels[:, j]))
+        return np.array(alphas, dtype=np.float64)
+
+    @classmethod
+    def from_data(cls, data: StockData, rows: np.ndarray) -> "FeatureState":
+        """Feature state of one symbol's stock data as of the close of each of rows.
+
+        Nothing after a row's close is read, smoothing levels coming from the column
+        names or the data's resolved levels rather than being fitted on the series.
+
+        :param data: stock data of a single symbol
+        :type data: StockData
+        :param rows: rows whose close is the last one known, one series per row
+        :type rows: np.ndarray
+        :return: feature state with one series per row
+        :rtype: FeatureState
+        """
+        rows = np.asarray(rows, dtype=np.int64)
+        columns = list(data.columns[1:])
+        close, x = data.matrix[:, 0].astype(np.float64), data.matrix[:, 1:]
+        state = cls.__new__(cls)
+        state.columns = columns
+        state._plan()
+
+        # closes before the first row are taken to equal it
+        positions = np.clip(rows[:, None] - np.arange(state.history - 1, -1, -1), 0, None)
+        levels = x[:, state.ses_cols].astype(np.float64)
+        known = rows.min() + 1 if len(rows) else 0
+        alphas = cls._alphas(data, [columns[i] for i in state.ses_cols], close[:known], levels[:known])
+        return cls(
+            columns,
+            close[positions],
+            alphas * close[rows, None] + (1 - alphas) * levels[rows],
+            np.broadcast_to(alphas, (len(rows), len(alphas))),
+            data.index[rows].values,
+            x[np.ix_(rows, state.static_cols)],
+        )
+
+    @classmethod
+    def concat(cls, states: list) -> "FeatureState":
+        """Stack the series of feature states of the same columns into one state.
+
+        :param states: feature states to stack
+        :type states: list
+        :return: feature state with every state's series, in order
+        :rtype: FeatureState
+        """
+        state = cls.__new__(cls)
+        state.columns = states[0].columns
+        state._plan()
+        # align every ring buffer to start at its oldest close
+        state.ring = np.concatenate([np.roll(other.ring, -other.pos, axis=1) for other in states])
+        state.pos = 0
+        state.sums = np.concatenate([other.sums for other in states])
+        state.levels = np.concatenate([other.levels for other in states])
+        state.alphas = np.concatenate([other.alphas for other in states])
+        state.dates = np.concatenate([other.dates for other in states])
+        state.statics = np.concatenate([other.statics for other in states])
+        return state
+
+    def next_dates(self) -> np.ndarray:
+        """Return the weekday after every series' last date."""
+        return np.busday_offset(self.dates, 1, roll="forward")
+
+    def rows(self) -> np.ndarray:
+        """Build the next day's feature rows.
+
+        :return: (series, columns) float32 feature rows
+        :rtype: np.ndarray
+        """
+        out = np.empty((self.n_series, len(self.columns)), dtype=np.float32)
+        last = self.ring[:, (self.pos - 1) % self.history]
+        out[:, self.lag_cols] = self.ring[:, (self.pos - self.lags) % self.history]
+        out[:, self.sma_cols] = (self.sums + last[:, None]) / self.windows
+        out[:, self.ses_cols] = self.levels
+        out[:, self.static_cols] = self.statics
+        if self.day_cols:
+            dates = DatetimeIndex(self.next_dates())
+            codes = [dates.dayofyear.to_numpy(), dates.day.to_numpy(), dates.dayofweek.to_numpy()]
+            for i, code, value in self.day_cols:
+                out[:, i] = codes[code] if value is None else codes[code] == value
+        return out
+
+    def push(self, closes: np.ndarray) -> None:
+        """Append every series' next close, e.g. a predicted one.
+
+        :param closes: (series,) closes of the next day
+        :type closes: np.ndarray
+        """
+        closes = np.asarray(closes, dtype=np.float64).reshape(-1)
+        # the close leaving each window of the last window - 1 closes
+        leaving = self.ring[:, (self.pos - (self.windows - 1)) % self.history]
+        self.sums += np.where(self.windows > 1, closes[:, None] - leaving, 0.0)
+        self.ring[:, self.pos] = closes
+        self.pos = (self.pos + 1) % self.history
+        self.levels = self.alphas * closes[:, None] + (1 - self.alphas) * self.levels
+        self.dates = self.next_dates()
+
+
+if __name__ == "__main__":
+    pass
@@ -0,0 +1,362 @@
+from datetime import date, timedelta
+from typing import IO, Callable, Iterator, Optional
+from contextlib import contextmanager
+from pandas import DataFrame
+from data.features import FeatureEngineering as fe, FeatureSpec
+import yfinance as yf
+import pandas as pd
+import numpy as np
+import tempfile
+import pathlib
+import hashlib
+import shutil
+import fcntl
+import json
+import os
+
+
+Fetcher = Callable[[str, date, date], DataFrame]
+
+
+@contextmanager
+def _locked(lock_file: pathlib.Path, shared: bool = False, blocking: bool = True) -> Iterator[bool]:
+    """Hold an advisory lock on a lock file, yielding whether it was acquired.
+
+    A lock file unlinked by its previous holder is opened again, so holders of the
+    unlinked file & of its replacement never overlap.
+    """
+    lock_file.parent.mkdir(parents=True, exist_ok=True)
+    flags = (fcntl.LOCK_SH if shared else fcntl.LOCK_EX) | (0 if blocking else fcntl.LOCK_NB)
+    while True:
+        fd = os.open(lock_file, os.O_RDWR | os.O_CREAT)
+        try:
+            fcntl.flock(fd, flags)
+        except BlockingIOError:
+            os.close(fd)
+            fd = None
+            break
+        if lock_file.exists() and os.stat(lock_file).st_ino == os.fstat(fd).st_ino:
+            break
+        os.close(fd)
+    try:
+        yield fd is not None
+    finally:
+        if fd is not None:
+            os.close(fd)
+
+
+def _atomic_write(file_name: pathlib.Path, write: Callable[[IO], None], mode: str = "wb") -> None:
+    """Write a file through a temporary file unique to this writer, renamed into place."""
+    file_name = pathlib.Path(file_name)
+    with tempfile.NamedTemporaryFile(
+        mode, dir=file_name.parent, prefix=f".{file_name.name}.", suffix=".tmp", delete=False
+    ) as f:
+        try:
+            write(f)
+        except BaseException:
+            os.unlink(f.name)
+            raise
+    os.replace(f.name, file_name)
+
+
+class YahooFetcher:
+
+    """Fetch daily price bars from yahoo finance."""
+
+    def __call__(self, symbol: str, start: date, end: date) -> DataFrame:
+        """Download daily price bars.
+
+        :param symbol: Stock symbol to collect data for.
+        :type symbol: str
+        :param start: first date to collect (inclusive)
+        :type start: date
+        :param end: last date to collect (exclusive)
+        :type end: date
+        :return: price dataframe indexed by date
+        :rtype: DataFrame
+        """
+        return yf.download(symbol, end=end, start=start, progress=False)
+
+
+class PriceStore:
+
+    """Local columnar price store, refreshed incrementally from a fetcher."""
+
+    def __init__(self, directory: str = None, fetcher: Optional[Fetcher] = None) -> None:
+        """Price store initialiser.
+
+        :param directory: directory holding one parquet file per symbol,
+            defaults to PRICE_CACHE_DIR or cache/prices
+        :type directory: str, optional
+        :param fetcher: callable returning price bars for (symbol, start, end),
+            defaults to YahooFetcher
+        :type fetcher: Fetcher, optional
+        """
+        self.directory = pathlib.Path(directory or os.getenv("PRICE_CACHE_DIR", "cache/prices"))
+        self.fetcher = fetcher or YahooFetcher()
+
+    def _paths(self, symbol: str) -> tuple[pathlib.Path, pathlib.Path]:
+        """Return price & coverage file paths for a symbol."""
+        return self.directory / f"{symbol}.parquet", self.directory / f"{symbol}.json"
+
+    def _read(self, symbol: str) -> tuple[Optional[DataFrame], Optional[dict]]:
+        """Read cached prices and fetched date coverage for a symbol."""
+        price_path, coverage_path = self._paths(symbol)
+        if not price_path.exists() or not coverage_path.exists():
+            return None, None
+        with open(coverage_path) as f:
+            coverage = json.load(f)
+        return pd.read_parquet(price_path), coverage
+
+    def _write(self, symbol: str, df: DataFrame, coverage: dict) -> None:
+        """Atomically write prices & coverage for a symbol."""
+        self.directory.mkdir(parents=True, exist_ok=True)
+        price_path, coverage_path = self._paths(symbol)
+        _atomic_write(price_path, df.to_parquet)
+        _atomic_write(coverage_path, lambda f: json.dump(coverage, f), "w")
+
+    @staticmethod
+    def _merge(frames: list) -> DataFrame:
+        """Concatenate price frames, keeping the latest bar for each date."""
+        df = pd.concat([frame for frame in frames if frame is not None])
+        df = df[~df.index.duplicated(keep="last")]
+        return df.sort_index()
+
+    def load(self, symbol: str, start: date, end: date) -> DataFrame:
+        """Return prices for a date range, fetching only dates not already stored.
+
+        Loads of a symbol hold its lock file from reading to writing, so concurrent
+        writers never merge over each other's prices & coverage.
+
+        :param symbol: Stock symbol to collect data for.
+        :type symbol: str
+        :param start: first date to return (inclusive)
+        :type start: date
+        :param end: last date to return (exclusive)
+        :type end: date
+        :return: price dataframe indexed by date
+        :rtype: DataFrame
+        """
+        with _locked(self.directory / f"{symbol}.lock"):
+            df = self._load(symbol, start, end)
+        return df[(df.index >= pd.Timestamp(start)) & (df.index < pd.Timestamp(end))]
+
+    def _load(self, symbol: str, start: date, end: date) -> DataFrame:
+        """Return stored prices of a symbol, first fetching & writing any dates missing from a range."""
+        df, coverage = self._read(symbol)
+        if df is None:
+            df = self.fetcher(symbol, start, end)
+            coverage = {"start": start.isoformat(), "end": end.isoformat()}
+        else:
+            stored_start = date.fromisoformat(coverage["start"])
+            stored_end = date.fromisoformat(coverage["end"])
+            head = self.fetcher(symbol, start, stored_start) if start < stored_start else None
+            tail = self.fetcher(symbol, stored_end, end) if stored_end < end else None
+            if head is None and tail is None:
+                return df
+            df = self._merge([head, df, tail])
+            coverage = {"start": min(start, stored_start).isoformat(), "end": max(end, stored_end).isoformat()}
+        self._write(symbol, df, coverage)
+        return df
+
+    @staticmethod
+    def window(years: int, today: date = None) -> tuple[date, date]:
+        """Return (start, end) dates covering the last n years.
+
+        :param years: number of years to cover
+        :type years: int
+        :param today: end date (exclusive), defaults to today
+        :type today: date, optional
+        :return: start & end dates
+        :rtype: tuple[date, date]
+        """
+        today = today or date.today()
+        return today - timedelta(days=365 * years), today
+
+
+class FeatureStore:
+
+    """On-disk store of engineered price features, keyed by content hash."""
+
+    def __init__(self, directory: str = None) -> None:
+        """Feature store initialiser.
+
+        :param directory: directory holding features per symbol,
+            defaults to FEATURE_CACHE_DIR or cache/features
+        :type directory: str, optional
+        """
+        self.directory = pathlib.Path(directory or os.getenv("FEATURE_CACHE_DIR", "cache/features"))
+
+    @staticmethod
+    def data_key(symbol: str, df: DataFrame) -> str:
+        """Return content hash of a symbol's cleaned price history.
+
+        :param symbol: Stock symbol of prices.
+        :type symbol: str
+        :param df: cleaned price dataframe
+        :type df: DataFrame
+        :return: hash of symbol, date range & closing prices
+        :rtype: str
+        """
+        digest = hashlib.sha1(symbol.encode())
+        if len(df):
+            digest.update(f"{df.index.min()}:{df.index.max()}:{len(df)}".encode())
+            digest.update(np.ascontiguousarray(df["Close"].to_numpy(dtype=np.float64)).tobytes())
+        return digest.hexdigest()[:16]
+
+    def key(self, symbol: str, df: DataFrame, spec: FeatureSpec) -> str:
+        """Return content hash of a symbol's feature matrix.
+
+        :param symbol: Stock symbol of prices.
+        :type symbol: str
+        :param df: cleaned price dataframe
+        :type df: DataFrame
+        :param spec: feature specification
+        :type spec: FeatureSpec
+        :return: hash of symbol, date range, closing prices & spec
+        :rtype: str
+        """
+        return hashlib.sha1(f"{self.data_key(symbol, df)}:{spec.hash()}".encode()).hexdigest()[:16]
+
+    @staticmethod
+    def _save(file_name: pathlib.Path, array: np.ndarray) -> None:
+        """Atomically save a numpy array."""
+        _atomic_write(file_name, lambda f: np.save(f, array))
+
+    @staticmethod
+    def _lock_file(directory: pathlib.Path) -> pathlib.Path:
+        """Return the lock file held by readers & writers of a price history's features."""
+        return directory.with_name(f"{directory.name}.lock")
+
+    def _prune(self, symbol: str, data_key: str) -> None:
+        """Remove features of a symbol's previous price histories, skipping those in use."""
+        for directory in (self.directory / symbol).iterdir():
+            if not directory.is_dir() or directory.name == data_key:
+                continue
+            with _locked(self._lock_file(directory), blocking=False) as unused:
+                if unused:
+                    shutil.rmtree(directory, ignore_errors=True)
+                    self._lock_file(directory).unlink(missing_ok=True)
+
+    @staticmethod
+    def _read_meta(directory: pathlib.Path) -> dict:
+        """Read stored row count & resolved smoothing levels of a feature directory."""
+        meta_file = directory / "meta.json"
+        if not meta_file.exists():
+            return {"rows": 0, "ses_alphas": {}}
+        with open(meta_file) as f:
+            return json.load(f)
+
+    @staticmethod
+    def _write_meta(directory: pathlib.Path, meta: dict) -> None:
+        """Atomically write row count & resolved smoothing levels of a feature directory."""
+        _atomic_write(directory / "meta.json", lambda f: json.dump(meta, f), "w")
+
+    def _price_features(self, directory: pathlib.Path, df: DataFrame, spec: FeatureSpec) -> np.ndarray:
+        """Load stored price feature columns, computing & storing only missing ones."""
+        column_directory = directory / "columns"
+        column_directory.mkdir(parents=True, exist_ok=True)
+        meta = self._read_meta(directory)
+        columns = spec.columns()
+        missing = [column for column in columns if not (column_directory / f"{column}.npy").exists()]
+        computed = {}
+        if missing:
+            missing_spec = spec.subset(missing)
+            alphas = fe.ses_alphas(df["Close"].to_numpy(), missing_spec)
+            block = fe.price_features(df["Close"].to_numpy(), missing_spec, alphas)
+            for i, column in enumerate(missing_spec.columns()):
+                computed[column] = block[:, i]
+                self._save(column_directory / f"{column}.npy", block[:, i])
+            ses_columns = missing_spec.columns()[len(missing_spec.columns()) - len(alphas) :]
+            meta = {"rows": len(df), "ses_alphas": {**meta["ses_alphas"], **dict(zip(ses_columns, alphas))}}
+            self._write_meta(directory, meta)
+
+        block = np.empty((len(df), len(columns)), dtype=np.float32)
+        for i, column in enumerate(columns):
+            block[:, i] = computed[column] if column in computed else np.load(column_directory / f"{column}.npy")
+        return block
+
+    def _extend(self, symbol: str, directory: pathlib.Path, df: DataFrame, spec: FeatureSpec) -> bool:
+        """Extend stored features of a shorter price history that df appends to.
+
+        Smoothing columns of levels estimated on the prices are not extended, the
+        level of a longer history differing, and are left for _price_features to
+        re-estimate on all of df as a fresh build would.
+
+        :return: whether a stored history was found & extended into directory
+        :rtype: bool
+        """
+        spec = FeatureSpec(spec.lags, spec.sma_windows, tuple(alpha for alpha in spec.ses_alphas if alpha is not None))
+        symbol_directory = self.directory / symbol
+        previous_directories = symbol_directory.iterdir() if symbol_directory.exists() else []
+        for previous in [directory for directory in previous_directories if directory.is_dir()]:
+            # held so the history is not pruned while its columns are read
+            with _locked(self._lock_file(previous), shared=True):
+                meta = self._read_meta(previous)
+                rows = meta["rows"]
+                if not 0 < rows < len(df) or previous.name != self.data_key(symbol, df.iloc[:rows]):
+                    continue
+                column_directory = previous / "columns"
+                columns = spec.columns()
+                if not all((column_directory / f"{column}.npy").exists() for column in columns):
+                    continue
+                block = np.stack([np.load(column_directory / f"{column}.npy") for column in columns], axis=1)
+            ses_columns = columns[len(columns) - len(spec.ses_alphas) :]
+            block = fe.extend_price_features(df["Close"].to_numpy(), block, spec, spec.ses_alphas)
+
+            (directory / "columns").mkdir(parents=True, exist_ok=True)
+            for i, column in enumerate(columns):
+                self._save(directory / "columns" / f"{column}.npy", block[:, i])
+            self._write_meta(directory, {"rows": len(df), "ses_alphas": dict(zip(ses_columns, spec.ses_alphas))})
+            return True
+        return False
+
+    def ses_alphas(self, symbol: str, df: DataFrame) -> dict:
+        """Return the resolved smoothing levels of a symbol's stored smoothing columns.
+
+        :param symbol: Stock symbol of prices.
+        :type symbol: str
+        :param df: cleaned price dataframe features were built from
+        :type df: DataFrame
+        :return: smoothing level by column name, e.g. of close_ses_None
+        :rtype: dict
+        """
+        directory = self.directory / symbol / self.data_key(symbol, df)
+        with _locked(self._lock_file(directory), shared=True):
+            return self._read_meta(directory)["ses_alphas"]
+
+    def build_features(self, symbol: str, df: DataFrame, spec: FeatureSpec) -> DataFrame:
+        """Return engineered features, materialising them in the store if needed.
+
+        Runs on the same prices & spec share one stored matrix, a spec change
+        only computes the price feature columns not already stored, and newly
+        appended prices only compute the trailing rows of stored features, bar
+        smoothing of estimated levels, re-estimated over the whole history.
+
+        :param symbol: Stock symbol of prices.
+        :type symbol: str
+        :param df: cleaned price dataframe
+        :type df: DataFrame
+        :param spec: feature specification
+        :type spec: FeatureSpec
+        :return: feature dataframe
+        :rtype: DataFrame
+        """
+        data_key = self.data_key(symbol, df)
+        directory = self.directory / symbol / data_key
+        matrix_file = directory / f"{self.key(symbol, df, spec)}.npy"
+        # shared with other builds of these prices, keeping their directory from being pruned
+        with _locked(self._lock_file(directory), shared=True):
+            if matrix_file.exists():
+                block = np.load(matrix_file, mmap_mode="r")
+            else:
+                if not directory.exists():
+                    self._extend(symbol, directory, df, spec)
+                block = self._price_features(directory, df, spec)
+                self._save(matrix_file, block)
+                self._prune(symbol, data_key)
+        return fe.assemble(df, block, spec)
+
+
+if __name__ == "__main__":
+    pass
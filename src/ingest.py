@@ -0,0 +1,29 @@
+from main import StockPricePrediction
+from data import ChartFetcher, PriceIngestion, PriceStore
+from common import Log
+from time import time
+import pathlib
+import json
+import os
+
+
+if __name__ == "__main__":
+
+    StockPricePrediction.load_env_vars()
+    logger = Log.set_logger("stock prediction: ingest")
+
+    max_workers = int(os.getenv("INGEST_WORKERS", 8))
+    fetcher = ChartFetcher(rate_limit=float(os.getenv("INGEST_RATE_LIMIT", 5)), pool_size=max_workers)
+    ingestion = PriceIngestion(PriceStore(fetcher=fetcher), max_workers)
+    stock_symbols = os.getenv("STOCK_SYMBOLS").split(",")
+
+    start = time()
+    summaries = ingestion.run(stock_symbols, int(os.getenv("DATA_YEARS")))
+    for summary in summaries:
+        if summary["status"] != "complete":
+            logger.warning(f"{summary['symbol']}: {summary['status']} {summary.get('error', '')}")
+    pathlib.Path("reports").mkdir(exist_ok=True)
+    with open("reports/ingest_manifest.json", "w") as f:
+        json.dump(summaries, f, indent=2)
+    complete = sum(summary["status"] == "complete" for summary in summaries)
+    logger.info(f"ingested {complete} of {len(summaries)} symbols: {time() - start:.1f}s")
@@ -1,10 +1,14 @@
-from data import StockData
-from pipeline import ModelTrain
-from reporting import StockChart
-from common import Log
-from datetime import timedelta
+from data import PanelData, StockData
+from pipeline import ModelArtifact, ModelForecast, ModelTrain, ModelUpdate, WalkForwardBacktest
+from reporting import PanelReport, StockChart
+from pandas import DataFrame
+from common import Instrument, Log
+from datetime import date, timedelta
 from time import time
 from dotenv import load_dotenv
+import numpy as np
+import argparse
+import pathlib
 import os
 
 
@@ -12,20 +16,25 @@ class StockPricePrediction:
 
     """Stock Price Prediction runner class."""
 
-    def __init__(self, stock_symbol: str, model_name: str, data_years: int = 10) -> None:
+    def __init__(self, stock_symbol: str, model_name: str, data_years: int = 10, stock_symbols: list = None) -> None:
         """Initialise stock price prediction.
 
-        :param stock_symbol: symbol to predict price for.
+        :param stock_symbol: symbol to predict price for, or the panel's name if stock_symbols are given.
         :type stock_symbol: str
         :param model_name: model name to use for prediction.
         :type model_name: str
         :param data_years: years of historical data to train model on, defaults to 10
         :type data_years: int, optional
+        :param stock_symbols: symbols to train one panel model on, defaults to None
+        :type stock_symbols: list, optional
         """
         self.logger = Log.set_logger(f"stock prediction: {stock_symbol}")
         self.stock_symbol = stock_symbol
         self.model_name = model_name
         self.data_years = data_years
+        self.stock_symbols = stock_symbols
+        self.estimator = None
+        self.intervals = None
 
     @staticmethod
     def load_env_vars() -> None:
@@ -34,48 +43,224 @@ class StockPricePrediction:
         if ".env" in files:
             load_dotenv()
 
-    def fetch_data(self) -> StockData:
+    def fetch_data(self, update: bool = False) -> StockData:
         """Return Stock data for training.
 
+        :param update: extend the data window the saved model was trained on, or the last DATA_YEARS
+            if it was saved without one, defaults to False
+        :type update: bool, optional
         :return: StockData for modelling
         :rtype: StockData
         """
         self.logger.info(f"fechting price data")
-        return StockData(self.stock_symbol, self.data_years)
+        stock_start = None
+        if update:
+            metadata = ModelArtifact(self.stock_symbol, self.model_name).metadata()
+            stock_start = date.fromisoformat(metadata["data_start"]) if "data_start" in metadata else None
+        with Instrument.span("fetch"):
+            if self.stock_symbols:
+                return PanelData(self.stock_symbols, self.data_years, self.stock_symbol, stock_start=stock_start)
+            return StockData(self.stock_symbol, self.data_years, stock_start=stock_start)
 
-    def train_model(self, data: StockData, param_samples: int = 100) -> None:
+    def train_model(
+        self,
+        data: StockData,
+        param_samples: int = 100,
+        n_jobs: int = -1,
+        resume: bool = True,
+        transfer_symbols: list = None,
+        search_backend: str = "bayes",
+    ) -> float:
         """Train model for prediction.
 
         :param data: StockData instance for trianing.
         :type data: StockData
+        :param n_jobs: cores available to training, defaults to -1 (all available cores)
+        :type n_jobs: int, optional
+        :param resume: seed the search with earlier searches of this symbol & model, defaults to True
+        :type resume: bool, optional
+        :param transfer_symbols: symbols whose best earlier configurations seed the search, defaults to None
+        :type transfer_symbols: list, optional
+        :param search_backend: "bayes" search or successive "halving" search, defaults to "bayes"
+        :type search_backend: str, optional
+        :return: best cross validation score
+        :rtype: float
         """
         start = time()
         self.logger.info(f"training {self.model_name}")
-        model = ModelTrain(self.model_name, data)
-        model.train(param_samples)
+        with Instrument.profile("train"):
+            model = ModelTrain(self.model_name, data, n_jobs, resume, transfer_symbols, search_backend)
+            model.train(param_samples)
+        self.estimator, self.intervals = model.pipeline.best_estimator_, model.intervals
         self.logger.info(f"training complete: {timedelta(seconds = time() - start)}")
+        if search_backend == "halving":
+            budget = model.search_budget()
+            saved = f"{budget['used']} of {budget['full']} resources ({budget['saved']:.0%} saved)"
+            self.logger.info(f"halving used {saved}")
+        return model.pipeline.best_score_
+
+    def update_model(self, data: StockData, mode: str = "predict", steps: int = 10) -> None:
+        """Predict new rows with the saved model, optionally warm starting it.
+
+        :param data: StockData instance extending the saved model's data.
+        :type data: StockData
+        :param mode: "predict" with the saved model or "warm_start" it too, defaults to "predict"
+        :type mode: str, optional
+        :param steps: boosting rounds or epochs to warm start for, defaults to 10
+        :type steps: int, optional
+        """
+        start = time()
+        self.logger.info(f"updating {self.model_name}")
+        with Instrument.profile("update"):
+            update = ModelUpdate(self.model_name, data)
+            predictions = update.predict()
+            if mode == "warm_start":
+                update.warm_start(steps)
+            update.save(predictions)
+        self.logger.info(f"update complete ({len(predictions)} new rows): {timedelta(seconds = time() - start)}")
+
+    def backtest(
+        self,
+        data: StockData,
+        horizons: tuple = (1, 5, 20),
+        step: int = 20,
+        window: str = "expanding",
+        window_rows: int = 500,
+        mode: str = "refit",
+        max_workers: int = None,
+    ) -> DataFrame:
+        """Walk-forward backtest the model with the saved model's parameters.
+
+        :param data: StockData instance to backtest over.
+        :type data: StockData
+        :param horizons: days ahead to score forecasts at, defaults to (1, 5, 20)
+        :type horizons: tuple, optional
+        :param step: rows between refits, defaults to 20
+        :type step: int, optional
+        :param window: "expanding" or "sliding" training window, defaults to "expanding"
+        :type window: str, optional
+        :param window_rows: rows of a sliding & the first training window, defaults to 500
+        :type window_rows: int, optional
+        :param mode: "refit" the model at every step or "warm_start" it, defaults to "refit"
+        :type mode: str, optional
+        :param max_workers: refits run concurrently, defaults to one per available core
+        :type max_workers: int, optional
+        :return: errors by horizon
+        :rtype: DataFrame
+        """
+        start = time()
+        self.logger.info(f"backtesting {self.model_name}")
+        with Instrument.span("backtest"):
+            backtest = WalkForwardBacktest(
+                self.model_name,
+                data,
+                horizons,
+                step,
+                window,
+                window_rows,
+                min_train_rows=window_rows,
+                mode=mode,
+                max_workers=max_workers,
+            )
+            forecasts = backtest.run()
+            scores = backtest.scores(forecasts)
+            backtest.save(forecasts, scores)
+        self.logger.info(f"backtest complete ({len(forecasts)} forecasts): {timedelta(seconds = time() - start)}")
+        return scores
+
+    def forecast(self, horizon: int = 30) -> DataFrame:
+        """Forecast the next trading days' closing prices with the saved model.
+
+        With a panel model every symbol of the panel is forecast together.
+
+        :param horizon: trading days to forecast, defaults to 30
+        :type horizon: int, optional
+        :return: symbol, step, date & forecast closing price of every day forecast
+        :rtype: DataFrame
+        """
+        start = time()
+        self.logger.info(f"forecasting {horizon} days with {self.model_name}")
+        with Instrument.span("forecast"):
+            if self.stock_symbols:
+                model_forecast = ModelForecast(self.model_name, self.data_years, panel_name=self.stock_symbol)
+                forecasts = model_forecast.forecast(self.stock_symbols, horizon)
+            else:
+                forecasts = ModelForecast(self.model_name, self.data_years).forecast([self.stock_symbol], horizon)
+        pathlib.Path(f"reports/{self.stock_symbol}/").mkdir(parents=True, exist_ok=True)
+        forecasts.to_csv(f"reports/{self.stock_symbol}/{self.model_name}_forecast.csv", index=False)
+        self.logger.info(f"forecast complete ({len(forecasts)} forecasts): {timedelta(seconds = time() - start)}")
+        return forecasts
+
+    def predict(self, data: StockData) -> np.ndarray:
+        """Predict every row of the data in one pass, with the model just trained or the saved model.
+
+        :param data: StockData instance for trianing.
+        :type data: StockData
+        :return: predictions, training rows first
+        :rtype: np.ndarray
+        """
+        self.estimator = self.estimator or ModelArtifact(self.stock_symbol, self.model_name).load()
+        return StockChart.predict(self.estimator, data)
 
     def model_report(self, data: StockData) -> None:
-        """Create model report.
+        """Create model report, with the model just trained if there is one.
 
         :param data: StockData instance for trianing.
         :type data: StockData
         """
-        chart = StockChart(self.model_name, data)
+        if isinstance(data, PanelData):
+            chart = PanelReport(self.model_name, data, estimator=self.estimator, intervals=self.intervals)
+        else:
+            chart = StockChart(self.model_name, data, estimator=self.estimator, intervals=self.intervals)
         self.logger.info(f"creating {self.model_name} report")
-        chart.create_report()
+        with Instrument.span("report"):
+            chart.create_report()
 
 
 if __name__ == "__main__":
 
+    parser = argparse.ArgumentParser(description="Stock price prediction")
+    parser.add_argument("--update", action="store_true", help="refresh a saved model with new price data")
+    parser.add_argument("--backtest", action="store_true", help="walk-forward backtest the saved model's parameters")
+    parser.add_argument("--forecast", action="store_true", help="forecast the next days with the saved model")
+    parser.add_argument("--panel", action="store_true", help="train one model over all of STOCK_SYMBOLS")
+    args = parser.parse_args()
+
     StockPricePrediction.load_env_vars()
 
     stock_prediction = StockPricePrediction(
-        stock_symbol=os.getenv("STOCK_SYMBOL"),
+        stock_symbol=os.getenv("PANEL_NAME", "PANEL") if args.panel else os.getenv("STOCK_SYMBOL"),
         model_name=os.getenv("MODEL_NAME"),
         data_years=int(os.getenv("DATA_YEARS")),
+        stock_symbols=os.getenv("STOCK_SYMBOLS").split(",") if args.panel else None,
     )
 
-    stock_data = stock_prediction.fetch_data()
-    stock_prediction.train_model(stock_data, int(os.getenv("PARAM_SAMPLES")))
-    stock_prediction.model_report(stock_data)
+    if args.update:
+        stock_data = stock_prediction.fetch_data(update=True)
+        update_mode, update_steps = os.getenv("UPDATE_MODE", "predict"), int(os.getenv("UPDATE_STEPS", 10))
+        stock_prediction.update_model(stock_data, update_mode, update_steps)
+    elif args.forecast:
+        stock_prediction.forecast(int(os.getenv("FORECAST_HORIZON", 30)))
+    elif args.backtest:
+        stock_data = stock_prediction.fetch_data()
+        stock_prediction.backtest(
+            stock_data,
+            horizons=[int(horizon) for horizon in os.getenv("BACKTEST_HORIZONS", "1,5,20").split(",")],
+            step=int(os.getenv("BACKTEST_STEP", 20)),
+            window=os.getenv("BACKTEST_WINDOW", "expanding"),
+            window_rows=int(os.getenv("BACKTEST_WINDOW_ROWS", 500)),
+            mode=os.getenv("BACKTEST_MODE", "refit"),
+            max_workers=int(os.getenv("BACKTEST_WORKERS", 0)) or None,
+        )
+    else:
+        stock_data = stock_prediction.fetch_data()
+        stock_prediction.train_model(
+            stock_data,
+            int(os.getenv("PARAM_SAMPLES")),
+            resume=os.getenv("SEARCH_RESUME", "true").lower() == "true",
+            transfer_symbols=[symbol for symbol in os.getenv("SEARCH_TRANSFER_SYMBOLS", "").split(",") if symbol],
+            search_backend=os.getenv("SEARCH_BACKEND", "bayes"),
+        )
+        stock_prediction.model_report(stock_data)
+
+    Instrument.export()
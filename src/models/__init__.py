@@ -1 +1,2 @@
 from models.registry import ModelRegistry
+from models.intervals import ConformalIntervals
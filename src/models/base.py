@@ -50,6 +50,26 @@ class ModelBase(ABC):
         """Construct model fit parameters"""
         pass
 
+    @abstractmethod
+    def warm_start():
+        """Continue training a fitted model on new data"""
+        pass
+
+    @abstractmethod
+    def save_estimator():
+        """Write a fitted model in its framework's own format"""
+        pass
+
+    @abstractmethod
+    def load_estimator():
+        """Load a fitted model written by save_estimator"""
+        pass
+
+    @staticmethod
+    def budget() -> dict:
+        """Construct successive halving budget, defaults to training samples"""
+        return {"resource": "n_samples", "min_resources": "smallest", "max_resources": "auto"}
+
 
 if __name__ == "__main__":
     pass
@@ -0,0 +1,166 @@
+from sklearn.pipeline import Pipeline
+import numpy as np
+import os
+
+
+class ConformalIntervals:
+
+    """Prediction intervals calibrated on the cross validation folds' test rows.
+
+    Each coverage's interval is a point prediction plus the lower & upper quantiles
+    of the folds' residuals (split conformal prediction), so any point model gains
+    intervals from one extra pass over the folds rather than a model per quantile.
+    Models that also predict quantiles, e.g. LSTMRegressor's quantile heads, are
+    calibrated by conformalised quantile regression instead, their predicted
+    quantiles being widened, or narrowed, by the quantile of the folds' scores.
+    """
+
+    def __init__(self, coverages: list = None) -> None:
+        """Conformal intervals initialiser.
+
+        :param coverages: nominal coverages of the intervals, defaults to INTERVAL_COVERAGES or 0.8,0.95
+        :type coverages: list, optional
+        """
+        coverages = coverages or [float(value) for value in os.getenv("INTERVAL_COVERAGES", "0.8,0.95").split(",")]
+        self.coverages = sorted(coverages)
+
+    @staticmethod
+    def _levels(coverage: float) -> tuple:
+        """Lower & upper quantile levels of a coverage."""
+        return round((1 - coverage) / 2, 6), round((1 + coverage) / 2, 6)
+
+    def quantiles(self) -> list:
+        """Return the lower & upper quantile levels of every coverage, ascending.
+
+        :return: quantile levels, e.g. for quantile heads
+        :rtype: list
+        """
+        return sorted({level for coverage in self.coverages for level in self._levels(coverage)})
+
+    @staticmethod
+    def _quantile(scores: np.ndarray, level: float) -> float:
+        """Finite sample conformal quantile, the ceil((n + 1) * level)-th smallest score."""
+        rank = int(np.ceil((len(scores) + 1) * level)) - 1
+        return float(np.sort(scores)[min(max(rank, 0), len(scores) - 1)])
+
+    def _heads(self, coverage: float, quantiles: list) -> list:
+        """Columns of a coverage's lower & upper quantile predictions, or None."""
+        if not quantiles:
+            return None
+        levels = np.round(quantiles, 6)
+        columns = [np.flatnonzero(levels == level) for level in self._levels(coverage)]
+        return [int(column[0]) for column in columns] if all(len(column) for column in columns) else None
+
+    def fit(
+        self, y: np.ndarray, pred: np.ndarray, bounds: np.ndarray = None, quantiles: list = None
+    ) -> "ConformalIntervals":
+        """Calibrate every coverage on out of fold predictions.
+
+        :param y: actual values of the folds' test rows
+        :type y: np.ndarray
+        :param pred: point predictions of the folds' test rows
+        :type pred: np.ndarray
+        :param bounds: (rows, quantiles) quantile predictions of the folds' test rows, defaults to None
+        :type bounds: np.ndarray, optional
+        :param quantiles: quantile levels of the bounds' columns, defaults to None
+        :type quantiles: list, optional
+        :return: calibrated intervals
+        :rtype: ConformalIntervals
+        """
+        y, pred = np.asarray(y, dtype=np.float64).reshape(-1), np.asarray(pred, dtype=np.float64).reshape(-1)
+        self.offsets_, self.heads_ = {}, {}
+        for coverage in self.coverages:
+            heads = self._heads(coverage, quantiles) if bounds is not None else None
+            if heads is None:
+                residuals = y - pred
+                upper_level = self._levels(coverage)[1]
+                offsets = [-self._quantile(-residuals, upper_level), self._quantile(residuals, upper_level)]
+            else:
+                lower, upper = bounds[:, heads[0]], bounds[:, heads[1]]
+                margin = self._quantile(np.maximum(lower - y, y - upper), coverage)
+                offsets = [-margin, margin]
+            self.offsets_[coverage], self.heads_[coverage] = offsets, heads
+        return self
+
+    def predict(self, pred: np.ndarray, bounds: np.ndarray = None) -> dict:
+        """Return every coverage's interval.
+
+        :param pred: point predictions
+        :type pred: np.ndarray
+        :param bounds: (rows, quantiles) quantile predictions, needed by intervals calibrated on them,
+            defaults to None
+        :type bounds: np.ndarray, optional
+        :return: (lower, upper) bounds by coverage
+        :rtype: dict
+        """
+        pred = np.asarray(pred, dtype=np.float64).reshape(-1)
+        intervals = {}
+        for coverage, (lower, upper) in self.offsets_.items():
+            heads = self.heads_[coverage]
+            if heads is None:
+                intervals[coverage] = (pred + lower, pred + upper)
+            else:
+                intervals[coverage] = (bounds[:, heads[0]] + lower, bounds[:, heads[1]] + upper)
+        return intervals
+
+    @staticmethod
+    def predict_bounds(estimator: Pipeline, x) -> tuple:
+        """Predict with a fitted pipeline, with the quantile predictions of models that make them.
+
+        :param estimator: fitted preprocessing & model pipeline
+        :type estimator: Pipeline
+        :param x: features
+        :type x: DataFrame
+        :return: point predictions & (rows, quantiles) quantile predictions, or None
+        :rtype: tuple
+        """
+        if getattr(estimator[-1], "quantiles", None):
+            return estimator.predict(x, quantiles=True)
+        return np.asarray(estimator.predict(x)).reshape(-1), None
+
+    @staticmethod
+    def scores(y: np.ndarray, intervals: dict) -> dict:
+        """Empirical coverage & mean width of every interval.
+
+        :param y: actual values
+        :type y: np.ndarray
+        :param intervals: (lower, upper) bounds by coverage
+        :type intervals: dict
+        :return: coverage & width of every interval, keyed by its nominal coverage
+        :rtype: dict
+        """
+        scores = {}
+        for coverage, (lower, upper) in intervals.items():
+            scores[f"coverage_{coverage:g}"] = float(np.mean((y >= lower) & (y <= upper))) if len(y) else np.nan
+            scores[f"width_{coverage:g}"] = float(np.mean(upper - lower)) if len(y) else np.nan
+        return scores
+
+    def to_dict(self) -> dict:
+        """Return calibration as json serialisable metadata, empty if not calibrated."""
+        if not hasattr(self, "offsets_"):
+            return {}
+        return {
+            "coverages": self.coverages,
+            "offsets": {str(coverage): offsets for coverage, offsets in self.offsets_.items()},
+            "heads": {str(coverage): heads for coverage, heads in self.heads_.items()},
+        }
+
+    @classmethod
+    def from_dict(cls, state: dict) -> "ConformalIntervals":
+        """Restore calibration written by to_dict.
+
+        :param state: calibration metadata
+        :type state: dict
+        :return: calibrated intervals, or None if there was no calibration
+        :rtype: ConformalIntervals
+        """
+        if not state:
+            return None
+        intervals = cls(state["coverages"])
+        intervals.offsets_ = {float(coverage): offsets for coverage, offsets in state["offsets"].items()}
+        intervals.heads_ = {float(coverage): heads for coverage, heads in state["heads"].items()}
+        return intervals
+
+
+if __name__ == "__main__":
+    pass
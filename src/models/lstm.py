@@ -1,25 +1,43 @@
 from models.base import ModelBase
-from models.transformers import ArrayTransformer, StandardScalerNumericColsOnly
+from models.intervals import ConformalIntervals
+from models.regressors import LSTMRegressor
+from models.transformers import StandardScalerNumericColsOnly
 from data import StockData
+from common import Instrument, TarZip
+from pandas import DataFrame, Series
 from sklearn.pipeline import Pipeline
-from keras.models import Sequential
-from keras.layers import Dense, LSTM, Dropout
-from keras.wrappers.scikit_learn import KerasRegressor
-from keras.callbacks import EarlyStopping
-from keras.optimizer_v2.adam import Adam
+from keras.models import load_model
 import tensorflow as tf
 import numpy as np
+import pathlib
+import json
 import os
 
 
+def _count_epoch(epoch: int, logs: dict) -> None:
+    """Count a trained epoch."""
+    Instrument.count("epochs")
+
+
 class LSTMNetwork(ModelBase):
 
     """LSTM Neural Network Model."""
 
-    def __init__(self, data: StockData) -> None:
-        """LSTM Network."""
+    def __init__(self, data: StockData, threads: int = 1) -> None:
+        """LSTM Network.
+
+        :param data: stock data to model
+        :type data: StockData
+        :param threads: tensorflow intra op threads per network, defaults to 1
+        :type threads: int, optional
+        """
         self._quiet_mode(True)
-        self.features = len(data.get_x_cols())
+        x_cols = list(data.get_x_cols())
+        # panel rows of many symbols are interleaved by date, so windows are built per symbol
+        self.group_column = x_cols.index("symbol_id") if "symbol_id" in x_cols else None
+        self.threads = threads
+        # quantile heads of every interval, calibrated on the cross validation folds
+        self.quantiles = ConformalIntervals().quantiles()
 
     @staticmethod
     def _quiet_mode(toggle: bool = False) -> None:
@@ -30,8 +48,8 @@ class LSTMNetwork(ModelBase):
             tf.autograph.set_verbosity(3)
             tf.get_logger().setLevel("ERROR")
 
-    def build(self) -> KerasRegressor:
-        return KerasRegressor(build_fn=self.compile, epochs=100000, verbose=0)
+    def build(self) -> LSTMRegressor:
+        return LSTMRegressor(group_column=self.group_column, quantiles=self.quantiles, threads=self.threads)
 
     @staticmethod
     def preprocess() -> Pipeline:
@@ -40,50 +58,80 @@ class LSTMNetwork(ModelBase):
         :return: Pipeline for pre-procesing
         :rtype: Pipeline
         """
-        return Pipeline(
-            [
-                ("scaler", StandardScalerNumericColsOnly()),
-                ("array", ArrayTransformer()),
-            ]
-        )
-
-    def compile(self, layers: int, learning_rate: float, drop_out_rate: float) -> Sequential:
-        """Compile network for KerasRegressor
-
-        :param layers: number of layers to build
-        :type layers: int
-        :param learning_rate: learning rate of network
-        :type learning_rate: float
-        :param drop_out_rate: drop out regularisation rate
-        :type drop_out_rate: float
-
-        :return: nueral network model
-        :rtype: Sequential
-        """
-        model = Sequential()
-        model.add(LSTM(self.features, activation="relu", input_shape=(1, self.features), return_sequences=True))
-        for _ in range(layers - 1):
-            model.add(LSTM(self.features, activation="relu", return_sequences=True))
-            model.add(Dropout(drop_out_rate))
-        model.add(Dense(1))
-        adam = Adam(learning_rate=learning_rate)
-        model.compile(loss="mean_squared_error", optimizer=adam)
-        return model
+        return Pipeline([("scaler", StandardScalerNumericColsOnly())])
 
     @staticmethod
     def params() -> dict:
         """LSTM hyperparameters"""
         return {
-            "model__layers": np.arange(1, 10, 1),
-            "model__batch_size": [7, 30, 60, 90, 180, 365],
-            "model__learning_rate": [0.001, 0.0001, 0.00001],
+            "model__layers": np.arange(1, 4, 1),
+            "model__units": [16, 32, 64, 128],
+            "model__lookback": [1, 5, 10, 20, 30],
+            "model__batch_size": [32, 64, 128, 256],
+            "model__learning_rate": [0.01, 0.001, 0.0001],
             "model__drop_out_rate": np.arange(0, 0.5, 0.05),
         }
 
+    @staticmethod
+    def budget() -> dict:
+        """LSTM successive halving budget of epochs"""
+        return {"resource": "model__max_epochs", "min_resources": 10, "max_resources": 200}
+
     def fit_params(self) -> dict:
         """LSTM fit parameters"""
-        stopping = EarlyStopping(monitor="loss", patience=10)
-        return {"model__callbacks": [stopping]}
+        return {"model__callbacks": [_count_epoch]}
+
+    @staticmethod
+    def warm_start(estimator: Pipeline, x: DataFrame, y: Series, steps: int) -> None:
+        """Run further epochs on a fitted pipeline's network.
+
+        :param estimator: fitted preprocessing & model pipeline
+        :type estimator: Pipeline
+        :param x: features to continue training on
+        :type x: DataFrame
+        :param y: target to continue training on
+        :type y: Series
+        :param steps: number of epochs to run
+        :type steps: int
+        """
+        model = estimator.named_steps["model"]
+        model.partial_fit(estimator[:-1].transform(x), y, epochs=steps, callbacks=[_count_epoch])
+
+    @staticmethod
+    def save_estimator(model: LSTMRegressor, directory: str) -> None:
+        """Write fitted network as a compressed tensorflow SavedModel.
+
+        :param model: fitted model
+        :type model: LSTMRegressor
+        :param directory: directory to write the network archive to
+        :type directory: str
+        """
+        with open(f"{directory}/estimator.json", "w") as f:
+            json.dump(model.get_params(), f, default=lambda value: value.item())  # numpy scalars
+        model.model_.save(f"{directory}/network", save_format="tf", include_optimizer=False)
+        TarZip.compress(f"{directory}/network", codec=os.getenv("ARTIFACT_CODEC", "zstd"), arcname="network")
+
+    @staticmethod
+    def load_estimator(directory: str, params: dict) -> LSTMRegressor:
+        """Load fitted network written by save_estimator.
+
+        :param directory: directory containing the network
+        :type directory: str
+        :param params: tuned pipeline parameters
+        :type params: dict
+        :return: fitted model
+        :rtype: LSTMRegressor
+        """
+        estimator_params = pathlib.Path(directory) / "estimator.json"
+        if estimator_params.exists():
+            model = LSTMRegressor(**json.loads(estimator_params.read_text()))
+        else:
+            model = LSTMRegressor(**{key[7:]: value for key, value in params.items() if key.startswith("model__")})
+        archive = next(pathlib.Path(directory).glob("network.tar.*"))
+        with TarZip.extract_temp(archive) as network_directory:
+            model.model_ = load_model(f"{network_directory}/network", compile=False)
+        model.n_features_in_ = model.model_.input_shape[-1]
+        return model
 
 
 if __name__ == "__main__":
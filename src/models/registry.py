@@ -1,12 +1,21 @@
 from data import StockData
 from models.base import ModelBase
-from models.xgboost import XGB
-from models.lstm import LSTMNetwork
+from typing import Union
+import importlib
 
 
 class ModelRegistry(object):
 
-    """Model Registry (factory pattern) class for registering and building models."""
+    """Model Registry (factory pattern) class for registering and building models.
+
+    Models are registered as "module:Class" references and only imported when first
+    asked for, so e.g. an XGBoost run never imports TensorFlow.
+    """
+
+    models = {
+        "lstm": "models.lstm:LSTMNetwork",
+        "xgboost": "models.xgboost:XGB",
+    }
 
     def __init__(self) -> None:
         """Model registry"""
@@ -14,30 +23,45 @@ class ModelRegistry(object):
         self.model_registry = {}
         self.compile_models()
 
-    def register_model(self, model_name: str, model: ModelBase) -> None:
+    def register_model(self, model_name: str, model: Union[ModelBase, str]) -> None:
         """Register model within registry
 
         :param model_name: name of model
         :type model_name: str
-        :param model: model class
-        :type model: ModelBase
-        :param model_category: regressor or timeseries
-        :type model_category: str
+        :param model: model class, or "module:Class" reference to import it from when first used
+        :type model: Union[ModelBase, str]
         """
         self.model_registry[model_name] = model
 
     def compile_models(self) -> None:
         """Compile models into class"""
-        self.register_model("lstm", LSTMNetwork)
-        self.register_model("xgboost", XGB)
+        for model_name, reference in self.models.items():
+            self.register_model(model_name, reference)
 
-    def get_model(self, model_name: str, data: StockData) -> ModelBase:
+    @staticmethod
+    def _resolve(reference: str) -> type:
+        """Import a model class from its "module:Class" reference."""
+        module_name, class_name = reference.split(":")
+        return getattr(importlib.import_module(module_name), class_name)
+
+    def get_model(self, model_name: str, data: StockData, threads: int = 1) -> ModelBase:
         """Return model from registry.
 
         :param model_name: Name of model to to return from registry.
         :param data: Stock data instantiate model with.
+        :param threads: Threads each fitted model may use.
+        """
+        return self.get_model_class(model_name)(data, threads)
+
+    def get_model_class(self, model_name: str) -> type:
+        """Return model class from registry, e.g. to load a saved model without data.
+
+        :param model_name: Name of model to to return from registry.
         """
-        return self.model_registry[model_name](data)
+        model = self.model_registry[model_name]
+        if isinstance(model, str):
+            model = self.model_registry[model_name] = self._resolve(model)
+        return model
 
 
 if __name__ == "__main__":
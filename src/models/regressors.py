@@ -0,0 +1,302 @@
+from sklearn.base import BaseEstimator, RegressorMixin
+from numpy.lib.stride_tricks import as_strided
+from typing import Callable, Iterator
+from keras.models import Sequential
+from keras.layers import Dense, Dropout, InputLayer, LSTM
+from keras.optimizer_v2.adam import Adam
+import tensorflow as tf
+import numpy as np
+
+
+class LSTMRegressor(RegressorMixin, BaseEstimator):
+
+    """LSTM network regressor over lookback windows of rows.
+
+    Each row is predicted from a window of the lookback rows ending at it, read
+    through a strided view rather than copied, and batches are fed through a
+    prefetching tf.data pipeline to a compiled training step. Training stops once
+    the loss of the most recent validation_fraction of rows stops improving, and
+    the best weights are restored. Quantile heads, if any, share the network with
+    the point prediction, trained on the sum of its squared error & their pinball
+    losses.
+    """
+
+    def __init__(
+        self,
+        layers: int = 1,
+        units: int = 32,
+        lookback: int = 10,
+        learning_rate: float = 0.001,
+        drop_out_rate: float = 0.0,
+        batch_size: int = 64,
+        max_epochs: int = 200,
+        patience: int = 10,
+        validation_fraction: float = 0.1,
+        group_column: int = None,
+        quantiles: list = None,
+        fit_context: bool = False,
+        jit_compile: bool = True,
+        threads: int = 1,
+        random_state: int = 123,
+    ) -> None:
+        """LSTM regressor initialiser.
+
+        :param layers: stacked LSTM layers, defaults to 1
+        :type layers: int, optional
+        :param units: units per LSTM layer, defaults to 32
+        :type units: int, optional
+        :param lookback: rows in each input window, defaults to 10
+        :type lookback: int, optional
+        :param learning_rate: adam learning rate, defaults to 0.001
+        :type learning_rate: float, optional
+        :param drop_out_rate: drop out regularisation rate after each LSTM layer, defaults to 0.0
+        :type drop_out_rate: float, optional
+        :param batch_size: windows per training step, defaults to 64
+        :type batch_size: int, optional
+        :param max_epochs: most epochs to train for, defaults to 200
+        :type max_epochs: int, optional
+        :param patience: epochs without validation improvement before stopping, defaults to 10
+        :type patience: int, optional
+        :param validation_fraction: most recent fraction of rows to validate on, defaults to 0.1
+        :type validation_fraction: float, optional
+        :param group_column: column of series ids, e.g. symbols of a panel, windows only spanning rows
+            of one series, defaults to None
+        :type group_column: int, optional
+        :param quantiles: quantile levels to predict alongside the point prediction, defaults to None
+        :type quantiles: list, optional
+        :param fit_context: windows of the first rows predicted reach back into the last rows fitted on,
+            for rows directly following them, e.g. cross validation test folds, defaults to False
+        :type fit_context: bool, optional
+        :param jit_compile: XLA compile the training step, defaults to True
+        :type jit_compile: bool, optional
+        :param threads: tensorflow intra op threads, defaults to 1
+        :type threads: int, optional
+        :param random_state: seed of weights & batch order, defaults to 123
+        :type random_state: int, optional
+        """
+        self.layers = layers
+        self.units = units
+        self.lookback = lookback
+        self.learning_rate = learning_rate
+        self.drop_out_rate = drop_out_rate
+        self.batch_size = batch_size
+        self.max_epochs = max_epochs
+        self.patience = patience
+        self.validation_fraction = validation_fraction
+        self.group_column = group_column
+        self.quantiles = quantiles
+        self.fit_context = fit_context
+        self.jit_compile = jit_compile
+        self.threads = threads
+        self.random_state = random_state
+
+    def _set_threads(self) -> None:
+        """Set tensorflow thread pools, if the runtime has not already started"""
+        try:
+            tf.config.threading.set_intra_op_parallelism_threads(self.threads)
+            tf.config.threading.set_inter_op_parallelism_threads(1)
+        except RuntimeError:
+            pass
+
+    def _series(self, X: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+        """Return the order grouping rows into series by group_column, keeping their order, & series bounds."""
+        if self.group_column is None:
+            return np.arange(len(X)), np.array([0, len(X)])
+        groups = X[:, self.group_column]
+        order = np.argsort(groups, kind="stable")
+        return order, np.append(np.flatnonzero(np.diff(groups[order], prepend=np.nan) != 0), len(X))
+
+    def _tail(self, X: np.ndarray) -> np.ndarray:
+        """Return the last lookback - 1 rows of every series, the context of rows following them."""
+        if X.ndim == 3:
+            return None
+        order, bounds = self._series(X)
+        rows = [order[max(a, b - self.lookback + 1) : b] for a, b in zip(bounds, bounds[1:])]
+        return X[np.concatenate(rows)] if rows else X[:0]
+
+    def _windows(self, X: np.ndarray, context: np.ndarray = None) -> tuple[np.ndarray, np.ndarray]:
+        """Return a read only strided view of lookback windows & the window of each row.
+
+        Rows are grouped into series by group_column, keeping their order, and each
+        series is preceded by its rows of context, the rows before X's, padded to
+        lookback - 1 rows with copies of its first row, so every row's window ends
+        at it and only spans earlier rows of its own series. Windows already built,
+        shaped (rows, lookback, features), are used as they are.
+        """
+        X = np.asarray(X, dtype=np.float32)
+        if X.ndim == 3:
+            return X, np.arange(len(X))
+        context = X[:0] if context is None else np.asarray(context, dtype=np.float32)
+        order, bounds = self._series(X)
+        pad = self.lookback - 1
+        blocks = []
+        for a, b in zip(bounds, bounds[1:]):
+            rows = X[order[a:b]]
+            lead = context
+            if self.group_column is not None:
+                lead = context[context[:, self.group_column] == rows[0, self.group_column]]
+            lead = lead[max(len(lead) - pad, 0) :]
+            blocks += [np.repeat(lead[:1] if len(lead) else rows[:1], pad - len(lead), axis=0), lead, rows]
+        padded = np.concatenate(blocks)
+        positions = np.empty(len(X), dtype=np.int64)
+        positions[order] = np.arange(len(X)) + pad * np.repeat(np.arange(len(bounds) - 1), np.diff(bounds))
+        row_stride, col_stride = padded.strides
+        windows = as_strided(
+            padded,
+            shape=(len(padded) - pad, self.lookback, X.shape[1]),
+            strides=(row_stride, row_stride, col_stride),
+            writeable=False,
+        )
+        return windows, positions
+
+    def _dataset(
+        self, windows: np.ndarray, positions: np.ndarray, y: np.ndarray = None, shuffle: bool = False
+    ) -> tf.data.Dataset:
+        """Prefetching dataset of batches of windows, copying one batch at a time."""
+        rng = np.random.default_rng(self.random_state)
+
+        def batches() -> Iterator:
+            order = rng.permutation(len(positions)) if shuffle else np.arange(len(positions))
+            for start in range(0, len(positions), self.batch_size):
+                rows = order[start : start + self.batch_size]
+                yield (windows[positions[rows]], y[rows]) if y is not None else windows[positions[rows]]
+
+        x_spec = tf.TensorSpec((None, self.lookback, windows.shape[2]), tf.float32)
+        signature = (x_spec, tf.TensorSpec((None, 1), tf.float32)) if y is not None else x_spec
+        return tf.data.Dataset.from_generator(batches, output_signature=signature).prefetch(tf.data.AUTOTUNE)
+
+    def _build(self, features: int) -> Sequential:
+        """Construct the network."""
+        tf.random.set_seed(self.random_state)
+        model = Sequential([InputLayer(input_shape=(self.lookback, features))])
+        for layer in range(self.layers):
+            model.add(LSTM(self.units, return_sequences=layer < self.layers - 1))
+            model.add(Dropout(self.drop_out_rate))
+        model.add(Dense(1 + len(self.quantiles or [])))
+        return model
+
+    def _loss(self, pred: tf.Tensor, y: tf.Tensor) -> tf.Tensor:
+        """Squared error of the point prediction plus pinball losses of the quantile heads."""
+        loss = tf.reduce_mean(tf.square(pred[:, :1] - y))
+        if self.quantiles:
+            errors, levels = y - pred[:, 1:], tf.constant(self.quantiles, dtype=tf.float32)
+            loss += tf.reduce_mean(tf.maximum(levels * errors, (levels - 1) * errors))
+        return loss
+
+    def _steps(self, jit_compile: bool) -> tuple[Callable, Callable]:
+        """Return compiled training & validation loss steps."""
+        model, optimizer = self.model_, self.optimizer_
+
+        @tf.function(jit_compile=jit_compile)
+        def train_step(x, y):
+            with tf.GradientTape() as tape:
+                loss = self._loss(model(x, training=True), y)
+            optimizer.apply_gradients(zip(tape.gradient(loss, model.trainable_variables), model.trainable_variables))
+            return loss
+
+        @tf.function(jit_compile=jit_compile)
+        def loss_step(x, y):
+            return self._loss(model(x, training=False), y)
+
+        return train_step, loss_step
+
+    def _train(self, X: np.ndarray, y: np.ndarray, epochs: int, early_stopping: bool, callbacks: list) -> None:
+        """Train for up to epochs, stopping early on validation loss if asked to."""
+        (windows, positions), y = self._windows(X), np.asarray(y, dtype=np.float32).reshape(-1, 1)
+        n_val = int(len(positions) * self.validation_fraction) if early_stopping else 0
+        n_train = len(positions) - n_val
+        train = self._dataset(windows, positions[:n_train], y[:n_train], shuffle=True)
+        validation = self._dataset(windows, positions[n_train:], y[n_train:]) if n_val else None
+
+        train_step, loss_step = self._steps(self.jit_compile)
+        best_loss, best_weights, wait = np.inf, None, 0
+        for epoch in range(epochs):
+            total, batches = 0.0, 0
+            for x_batch, y_batch in train:
+                try:
+                    total += train_step(x_batch, y_batch)
+                except (tf.errors.InvalidArgumentError, tf.errors.UnimplementedError):
+                    # fall back to graph execution where an op cannot be compiled on this device
+                    train_step, loss_step = self._steps(False)
+                    total += train_step(x_batch, y_batch)
+                batches += 1
+            logs = {"loss": float(total) / max(batches, 1)}
+            if validation is not None:
+                val_total = sum(float(loss_step(x_batch, y_batch)) * len(x_batch) for x_batch, y_batch in validation)
+                logs["val_loss"] = val_total / n_val
+                if logs["val_loss"] < best_loss:
+                    best_loss, best_weights, wait = logs["val_loss"], self.model_.get_weights(), 0
+                else:
+                    wait += 1
+            for callback in callbacks or []:
+                callback(epoch, logs)
+            self.n_epochs_ += 1
+            if validation is not None and wait >= self.patience:
+                break
+        if best_weights is not None:
+            self.model_.set_weights(best_weights)
+        self.context_ = self._tail(X)
+
+    def fit(self, X: np.ndarray, y: np.ndarray, callbacks: list = None) -> "LSTMRegressor":
+        """Train a new network.
+
+        :param X: features, rows in time order
+        :type X: np.ndarray
+        :param y: target
+        :type y: np.ndarray
+        :param callbacks: callables called with (epoch, logs) after every epoch, defaults to None
+        :type callbacks: list, optional
+        :return: fitted regressor
+        :rtype: LSTMRegressor
+        """
+        self._set_threads()
+        X = np.asarray(X, dtype=np.float32)
+        self.n_features_in_ = X.shape[1]
+        self.model_ = self._build(self.n_features_in_)
+        self.optimizer_ = Adam(learning_rate=self.learning_rate)
+        self.n_epochs_ = 0
+        self._train(X, y, self.max_epochs, self.validation_fraction > 0, callbacks)
+        return self
+
+    def partial_fit(self, X: np.ndarray, y: np.ndarray, epochs: int = 1, callbacks: list = None) -> "LSTMRegressor":
+        """Continue training the fitted network for a fixed number of epochs.
+
+        :param X: features, rows in time order
+        :type X: np.ndarray
+        :param y: target
+        :type y: np.ndarray
+        :param epochs: epochs to train for, defaults to 1
+        :type epochs: int, optional
+        :param callbacks: callables called with (epoch, logs) after every epoch, defaults to None
+        :type callbacks: list, optional
+        :return: fitted regressor
+        :rtype: LSTMRegressor
+        """
+        if not hasattr(self, "optimizer_"):
+            self.optimizer_ = Adam(learning_rate=self.learning_rate)
+            self.n_epochs_ = 0
+        self._train(np.asarray(X, dtype=np.float32), y, epochs, False, callbacks)
+        return self
+
+    def predict(self, X: np.ndarray, quantiles: bool = False) -> np.ndarray:
+        """Predict each row from the window ending at it.
+
+        Windows of a series' first rows are padded with copies of its first row,
+        or with fit_context reach back into the last rows fitted on.
+
+        :param X: features, rows in time order, or (rows, lookback, features) windows
+        :type X: np.ndarray
+        :param quantiles: also return the quantile heads' predictions, defaults to False
+        :type quantiles: bool, optional
+        :return: predictions, and (rows, quantiles) quantile predictions, sorted so they don't cross, if asked for
+        :rtype: np.ndarray
+        """
+        context = getattr(self, "context_", None) if self.fit_context else None
+        pred = self.model_.predict(self._dataset(*self._windows(X, context)), verbose=0)
+        if quantiles:
+            return pred[:, 0], np.sort(pred[:, 1:], axis=1)
+        return pred[:, 0]
+
+
+if __name__ == "__main__":
+    pass
@@ -1,57 +1,67 @@
 from sklearn.base import BaseEstimator, TransformerMixin
-from sklearn.preprocessing import StandardScaler, MinMaxScaler
+from abc import ABC, abstractmethod
 from pandas import DataFrame
+import numpy as np
 
 
-class ArrayTransformer(TransformerMixin, BaseEstimator):
+class _NumericColsOnlyScaler(TransformerMixin, BaseEstimator, ABC):
 
-    """Create 3D array from dataframe required by LSTM nework."""
+    """Scale all but one hot encoded data with statistics learnt in fit."""
 
-    def __init__(self):
+    def __init__(self, copy: bool = True):
+        self.copy = copy
+
+    @staticmethod
+    @abstractmethod
+    def _statistics(X: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+        """Return (offset, scale) of each column."""
         pass
 
     def fit(self, X: DataFrame, y: DataFrame = None):
+        """Learn numeric column positions and their scaling statistics."""
+        columns = X.columns if isinstance(X, DataFrame) else range(np.shape(X)[1])
+        self.numeric_cols_ = np.array([i for i, col in enumerate(columns) if not str(col).startswith("day")], dtype=int)
+        offset, scale = self._statistics(np.asarray(X, dtype=np.float64)[:, self.numeric_cols_])
+        self.offset_ = offset.astype(np.float32)
+        self.scale_ = np.where(scale == 0, 1, scale).astype(np.float32)
         return self
 
-    def transform(self, X: DataFrame, y: DataFrame = None):
-        """Loop throuhg X DataFrame columns and apply filter"""
-        return X.to_numpy().reshape(X.shape[0], 1, X.shape[1])
+    def _columns(self):
+        """Return numeric columns as a slice when contiguous, so scaling works on a view."""
+        cols = self.numeric_cols_
+        if len(cols) and cols[-1] - cols[0] + 1 == len(cols):
+            return slice(cols[0], cols[-1] + 1)
+        return cols
+
+    def transform(self, X: DataFrame, y: DataFrame = None) -> np.ndarray:
+        """Scale data for all but one hot encoded data into a float32 array."""
+        X = np.array(X, dtype=np.float32, copy=self.copy, order="C")
+        columns = self._columns()
+        if isinstance(columns, slice):
+            X[:, columns] -= self.offset_
+            X[:, columns] /= self.scale_
+        else:
+            X[:, columns] = (X[:, columns] - self.offset_) / self.scale_
+        return X
 
 
-class StandardScalerNumericColsOnly(TransformerMixin, BaseEstimator):
+class StandardScalerNumericColsOnly(_NumericColsOnlyScaler):
 
     """Standard scale all but one hot encoded data."""
 
-    def __init__(self):
-        pass
-
-    def fit(self, X: DataFrame, y: DataFrame = None):
-        return self
-
-    def transform(self, X: DataFrame, y: DataFrame = None):
-        """Scale data for all but one hot encoded data."""
-        scaler = StandardScaler()
-        non_ohe_cols = [col for col in X if not col.startswith("day")]
-        X[non_ohe_cols] = scaler.fit_transform(X[non_ohe_cols])
-        return X
+    @staticmethod
+    def _statistics(X: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+        return X.mean(axis=0), X.std(axis=0)
 
 
-class MinMaxScalerNumericColsOnly(TransformerMixin, BaseEstimator):
+class MinMaxScalerNumericColsOnly(_NumericColsOnlyScaler):
 
     """Min max scale all but one hot encoded data."""
 
-    def __init__(self):
-        pass
-
-    def fit(self, X: DataFrame, y: DataFrame = None):
-        return self
-
-    def transform(self, X: DataFrame, y: DataFrame = None):
-        """Scale data for all but one hot encoded data."""
-        scaler = MinMaxScaler()
-        non_ohe_cols = [col for col in X if not col.startswith("day")]
-        X[non_ohe_cols] = scaler.fit_transform(X[non_ohe_cols])
-        return X
+    @staticmethod
+    def _statistics(X: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+        minimum = X.min(axis=0)
+        return minimum, X.max(axis=0) - minimum
 
 
 if __name__ == "__main__":
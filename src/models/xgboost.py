@@ -1,6 +1,7 @@
 from models.base import ModelBase
 from sklearn.pipeline import Pipeline
 from data import StockData
+from pandas import DataFrame, Series
 from xgboost import XGBRegressor
 import numpy as np
 
@@ -9,18 +10,23 @@ class XGB(ModelBase):
 
     """XGBoost Model."""
 
-    def __init__(self, data: StockData) -> None:
-        """XGBoost class initialiser"""
-        pass
+    def __init__(self, data: StockData, threads: int = 1) -> None:
+        """XGBoost class initialiser
 
-    @staticmethod
-    def build() -> XGBRegressor:
+        :param data: stock data to model
+        :type data: StockData
+        :param threads: threads per booster, defaults to 1
+        :type threads: int, optional
+        """
+        self.threads = threads
+
+    def build(self) -> XGBRegressor:
         """Return model instance
 
         :return: XGBoost Regressor instance
         :rtype: XGBRegressor
         """
-        return XGBRegressor(verbosity=0, seed=123, tree_method="hist")
+        return XGBRegressor(verbosity=0, seed=123, tree_method="hist", n_jobs=self.threads)
 
     @staticmethod
     def preprocess() -> Pipeline:
@@ -52,10 +58,18 @@ class XGB(ModelBase):
             "model__reg_lambda": [0],
             "model__gamma": [0],
             # fit parameters
-            "model__nthread": [4],
             "model__early_stopping_rounds": [25],
         }
 
+    @staticmethod
+    def budget() -> dict:
+        """Return successive halving budget of boosting rounds.
+
+        :return: halving resource parameter & its bounds
+        :rtype: dict
+        """
+        return {"resource": "model__n_estimators", "min_resources": 100, "max_resources": 10000}
+
     def fit_params(self) -> dict:
         """Return pipeline model fit paramters
 
@@ -64,6 +78,56 @@ class XGB(ModelBase):
         """
         return {}
 
+    @staticmethod
+    def warm_start(estimator: Pipeline, x: DataFrame, y: Series, steps: int) -> None:
+        """Add boosting rounds to a fitted pipeline's booster.
+
+        The model keeps its n_estimators, the rounds of a full fit, rather than the
+        rounds added.
+
+        :param estimator: fitted preprocessing & model pipeline
+        :type estimator: Pipeline
+        :param x: features to continue training on
+        :type x: DataFrame
+        :param y: target to continue training on
+        :type y: Series
+        :param steps: number of boosting rounds to add
+        :type steps: int
+        """
+        model = estimator.named_steps["model"]
+        booster, n_estimators = model.get_booster(), model.n_estimators
+        model.set_params(n_estimators=steps)
+        try:
+            model.fit(estimator[:-1].transform(x), y, xgb_model=booster)
+        finally:
+            model.set_params(n_estimators=n_estimators)
+
+    @staticmethod
+    def save_estimator(model: XGBRegressor, directory: str) -> None:
+        """Write fitted booster as json.
+
+        :param model: fitted model
+        :type model: XGBRegressor
+        :param directory: directory to write model.json to
+        :type directory: str
+        """
+        model.save_model(f"{directory}/model.json")
+
+    @staticmethod
+    def load_estimator(directory: str, params: dict) -> XGBRegressor:
+        """Load fitted booster written by save_estimator.
+
+        :param directory: directory containing model.json
+        :type directory: str
+        :param params: tuned pipeline parameters, restored from the booster itself
+        :type params: dict
+        :return: fitted model
+        :rtype: XGBRegressor
+        """
+        model = XGBRegressor()
+        model.load_model(f"{directory}/model.json")
+        return model
+
 
 if __name__ == "__main__":
     pass
@@ -1 +1,5 @@
 from pipeline.train import ModelTrain
+from pipeline.update import ModelUpdate
+from pipeline.artifacts import ModelArtifact
+from pipeline.forecast import ModelForecast, RecursiveForecaster
+from pipeline.backtest import WalkForwardBacktest
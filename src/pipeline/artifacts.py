@@ -0,0 +1,261 @@
+from typing import Iterator
+from contextlib import contextmanager
+from sklearn.pipeline import Pipeline
+from models import ModelRegistry
+from data.store import _atomic_write, _locked
+from common import TarZip
+import numpy as np
+import pathlib
+import shutil
+import joblib
+import uuid
+import json
+import os
+
+
+class ModelArtifact:
+
+    """Artifact library entry for a trained symbol & model pipeline.
+
+    A model is stored in a version directory of artifacts/<SYMBOL>/<model>/ as a json
+    manifest (parameters, scores, feature spec, data window & hash), the fitted
+    preprocessing state as numpy arrays and the estimator in its framework's own
+    format, the version being published by atomically replacing the directory's
+    current pointer file. Models saved in the earlier unversioned & pickled layouts
+    are still loaded.
+    """
+
+    format_version = 1
+    tf_models = ["lstm"]
+
+    def __init__(self, stock_symbol: str, model_name: str) -> None:
+        """Model artifact initialiser
+
+        :param stock_symbol: symbol the model was trained on
+        :type stock_symbol: str
+        :param model_name: name of trained model
+        :type model_name: str
+        """
+        self.stock_symbol = stock_symbol
+        self.model_name = model_name
+        self.directory = f"artifacts/{stock_symbol}/"
+        self.model_directory = self.directory + f"{model_name}/"
+
+    @staticmethod
+    def _json_default(value):
+        """Serialise numpy scalars & arrays."""
+        if isinstance(value, np.generic):
+            return value.item()
+        if isinstance(value, np.ndarray):
+            return value.tolist()
+        raise TypeError(f"{type(value)} is not json serialisable")
+
+    @staticmethod
+    def _write_json(data: dict, file_name: str) -> None:
+        """Atomically write json, through a temporary file unique to this writer."""
+        _atomic_write(file_name, lambda f: json.dump(data, f, indent=2, default=ModelArtifact._json_default), "w")
+
+    @staticmethod
+    def _save_preprocess(preprocess: Pipeline, directory: str) -> dict:
+        """Write fitted preprocessing arrays as .npy files, returning the remaining fitted state."""
+        state = {}
+        pathlib.Path(directory).mkdir(parents=True, exist_ok=True)
+        for name, step in preprocess.steps if preprocess is not None else []:
+            if step in (None, "passthrough"):
+                continue
+            state[name] = {}
+            for attr, value in vars(step).items():
+                if not attr.endswith("_"):
+                    continue
+                if isinstance(value, np.ndarray) and not value.dtype.hasobject:
+                    np.save(f"{directory}/{name}.{attr}.npy", value)
+                else:
+                    state[name][attr] = value
+        return state
+
+    @staticmethod
+    def _load_preprocess(preprocess: Pipeline, state: dict, directory: str) -> Pipeline:
+        """Restore fitted preprocessing state, memory mapping its arrays."""
+        for name, step in preprocess.steps:
+            for attr, value in state.get(name, {}).items():
+                setattr(step, attr, value)
+            for file in pathlib.Path(directory).glob(f"{name}.*.npy"):
+                setattr(step, file.name.split(".")[1], np.load(file, mmap_mode="r"))
+        return preprocess
+
+    def _current(self) -> str:
+        """Return directory of the published model version, or None if saved in the legacy pickled layout."""
+        pointer = self.model_directory + "current"
+        if os.path.exists(pointer):
+            with open(pointer) as f:
+                return self.model_directory + f.read().strip()
+        # saved before versions were published through the pointer
+        if os.path.exists(self.model_directory + "manifest.json"):
+            return self.model_directory.rstrip("/")
+        return None
+
+    @contextmanager
+    def _published(self) -> Iterator[str]:
+        """Hold the published version's directory, so it is not pruned while read.
+
+        :return: directory of the published version, or None if there is none
+        :rtype: Iterator[str]
+        """
+        while True:
+            directory = self._current()
+            if directory is None or directory == self.model_directory.rstrip("/"):
+                yield directory
+                return
+            with _locked(pathlib.Path(f"{directory}.lock"), shared=True):
+                # pruned, once replaced, between reading the pointer & locking it
+                if os.path.exists(f"{directory}/manifest.json"):
+                    yield directory
+                    return
+
+    def _prune(self) -> None:
+        """Remove model versions other than the published one, skipping those being read or written."""
+        versions = {name.split(".")[0] for name in os.listdir(self.model_directory) if name.startswith("version-")}
+        for version in versions:
+            directory = self.model_directory + version
+            with _locked(pathlib.Path(f"{directory}.lock"), blocking=False) as unused:
+                # a version is only published while its writer holds its lock, so the pointer is final here
+                if unused and self._current() != directory:
+                    shutil.rmtree(directory, ignore_errors=True)
+                    pathlib.Path(f"{directory}.lock").unlink(missing_ok=True)
+
+    def _remove_unversioned(self) -> None:
+        """Remove models saved before versions, in the unversioned & pickled layouts."""
+        for path in pathlib.Path(self.model_directory).iterdir():
+            if path.name.startswith(("version-", "current", ".")):
+                continue
+            if path.is_dir():
+                shutil.rmtree(path, ignore_errors=True)
+            else:
+                path.unlink(missing_ok=True)
+        for extension in [".sav", ".tar.gz", ".json"]:
+            pathlib.Path(self.directory + f"{self.model_name}{extension}").unlink(missing_ok=True)
+
+    def save(self, estimator: Pipeline, metadata: dict) -> None:
+        """Write fitted model & manifest to artifact library.
+
+        The model is written to a new version directory & published by replacing
+        the current pointer in one rename, so readers never see a partly written
+        model nor find none. Earlier versions not being read are removed.
+
+        :param estimator: fitted preprocessing & model pipeline to write
+        :type estimator: Pipeline
+        :param metadata: training metadata, e.g. data window, parameters & scores
+        :type metadata: dict
+        """
+        model_class = ModelRegistry().get_model_class(self.model_name)
+        version = f"version-{uuid.uuid4().hex}"
+        directory = self.model_directory + version
+        # held until published, so concurrent saves never prune this version while it is written
+        with _locked(pathlib.Path(f"{directory}.lock"), shared=True):
+            pathlib.Path(directory).mkdir(parents=True)
+            preprocess = estimator.named_steps.get("preprocessing")
+            manifest = {
+                **metadata,
+                "format_version": self.format_version,
+                "stock_symbol": self.stock_symbol,
+                "model_name": self.model_name,
+                "preprocess": self._save_preprocess(preprocess, f"{directory}/preprocess"),
+            }
+            model_class.save_estimator(estimator.named_steps["model"], directory)
+            self._write_json(manifest, f"{directory}/manifest.json")
+            _atomic_write(self.model_directory + "current", lambda f: f.write(version), "w")
+        self._prune()
+        self._remove_unversioned()
+
+    def save_metadata(self, metadata: dict) -> None:
+        """Write training metadata to the manifest of a saved model.
+
+        :param metadata: training metadata, e.g. data window
+        :type metadata: dict
+        """
+        with self._published() as directory:
+            manifest = {**self._manifest(directory), **metadata}
+            self._write_json(manifest, f"{directory}/manifest.json")
+
+    @staticmethod
+    def _manifest(directory: str) -> dict:
+        """Load the manifest of a model version, empty if there is none."""
+        if directory is None:
+            return {}
+        with open(f"{directory}/manifest.json") as f:
+            return json.load(f)
+
+    def legacy(self) -> bool:
+        """Return True if the model was saved in the legacy pickled layout."""
+        return self._current() is None
+
+    def load(self) -> Pipeline:
+        """Load fitted model from artifact library
+
+        :return: fitted preprocessing & model pipeline
+        :rtype: Pipeline
+        """
+        with self._published() as directory:
+            if directory is None:
+                return self._load_legacy()
+            manifest = self._manifest(directory)
+            model_class = ModelRegistry().get_model_class(self.model_name)
+            preprocess = model_class.preprocess()
+            if preprocess is not None:
+                preprocess = self._load_preprocess(preprocess, manifest["preprocess"], f"{directory}/preprocess")
+            model = model_class.load_estimator(directory, manifest.get("params", {}))
+        # same steps as the trained pipeline, so estimator[:-1] is always its preprocessing
+        return Pipeline([("preprocessing", preprocess), ("model", model)])
+
+    def _load_legacy(self) -> Pipeline:
+        """Load a model pickled with its whole search."""
+        pipeline = joblib.load(self.directory + f"{self.model_name}.sav")
+        if self.model_name in self.tf_models:
+            from keras.models import load_model
+
+            # the archive holds the .h5 under its artifact path, unpacked privately so concurrent loads never collide
+            with TarZip.extract_temp(self.directory + f"{self.model_name}.tar.gz") as directory:
+                keras_model = load_model(f"{directory}/{self.directory}{self.model_name}.h5")
+            pipeline.best_estimator_.named_steps["model"].model = keras_model
+        return pipeline.best_estimator_
+
+    def search_history(self) -> dict:
+        """Load hyperparameter search history from artifact library
+
+        :return: search dimensions, observations & progress, empty if no search was saved
+        :rtype: dict
+        """
+        file_name = self.directory + f"{self.model_name}_search.json"
+        if not os.path.exists(file_name):
+            return {}
+        with open(file_name) as f:
+            return json.load(f)
+
+    def save_search_history(self, history: dict) -> None:
+        """Atomically write hyperparameter search history to artifact library.
+
+        :param history: search dimensions, observations & progress
+        :type history: dict
+        """
+        pathlib.Path(self.directory).mkdir(parents=True, exist_ok=True)
+        file_name = self.directory + f"{self.model_name}_search.json"
+        _atomic_write(file_name, lambda f: json.dump(history, f), "w")
+
+    def metadata(self) -> dict:
+        """Load training metadata from artifact library
+
+        :return: training metadata, empty if model was saved without any
+        :rtype: dict
+        """
+        with self._published() as directory:
+            if directory is not None:
+                return self._manifest(directory)
+        file_name = self.directory + f"{self.model_name}.json"
+        if not os.path.exists(file_name):
+            return {}
+        with open(file_name) as f:
+            return json.load(f)
+
+
+if __name__ == "__main__":
+    pass
@@ -0,0 +1,265 @@
+from data import FeatureEngineering, FeatureSpec, FeatureState, PanelData, StockData
+from models import ModelRegistry
+from pandas import DataFrame, concat
+from sklearn.pipeline import Pipeline
+from concurrent.futures import ProcessPoolExecutor
+from pipeline.artifacts import ModelArtifact
+from pipeline.forecast import RecursiveForecaster
+from common import Log, ResourcePlanner
+import numpy as np
+import pathlib
+
+# backtest of the worker process, sent once to each worker rather than with every task
+_backtest = None
+
+
+def _init_worker(backtest: "WalkForwardBacktest") -> None:
+    """Hold the backtest, with its data, in a worker process."""
+    global _backtest
+    _backtest = backtest
+
+
+def _run_refits(refits: np.ndarray) -> DataFrame:
+    """Run refits of the worker's backtest."""
+    return _backtest.run_refits(refits)
+
+
+class WalkForwardBacktest:
+
+    """Walk-forward backtest of a model over a symbol's history.
+
+    The origin rolls forward a step of rows at a time. At each refit the model is
+    refitted, or warm started, on an expanding or sliding window of rows up to the
+    origin, then every origin until the next refit is forecast recursively over the
+    longest horizon, all origins' step-k rows being predicted in one call. Features
+    are built once, from the feature store, and each window is a slice of their rows,
+    bar smoothing of an estimated level, re-estimated at each refit on the closes up
+    to its origin so no forecast sees later prices. Refits run in parallel across a
+    process pool.
+    """
+
+    def __init__(
+        self,
+        model_name: str,
+        data: StockData,
+        horizons: tuple = (1, 5, 20),
+        step: int = 20,
+        window: str = "expanding",
+        window_rows: int = None,
+        min_train_rows: int = 500,
+        mode: str = "refit",
+        warm_steps: int = 10,
+        params: dict = None,
+        max_workers: int = None,
+    ) -> None:
+        """Walk-forward backtest initialiser.
+
+        :param model_name: Name of model to backtest
+        :type model_name: str
+        :param data: stock data of a single symbol to backtest over
+        :type data: StockData
+        :param horizons: days ahead to score forecasts at, defaults to (1, 5, 20)
+        :type horizons: tuple, optional
+        :param step: rows between refits, defaults to 20
+        :type step: int, optional
+        :param window: "expanding" window from the first row or "sliding" window of window_rows,
+            defaults to "expanding"
+        :type window: str, optional
+        :param window_rows: rows of a sliding window, defaults to min_train_rows
+        :type window_rows: int, optional
+        :param min_train_rows: rows before the first origin, defaults to 500
+        :type min_train_rows: int, optional
+        :param mode: "refit" a new model at every refit or "warm_start" the previous one, defaults to "refit"
+        :type mode: str, optional
+        :param warm_steps: boosting rounds or epochs to warm start for, defaults to 10
+        :type warm_steps: int, optional
+        :param params: pipeline parameters, defaults to those of the saved model
+        :type params: dict, optional
+        :param max_workers: refits run concurrently, defaults to one per available core
+        :type max_workers: int, optional
+        """
+        if isinstance(data, PanelData):
+            raise ValueError("backtest a panel's members one symbol at a time")
+        self.logger = Log.set_logger(f"backtest: {data.stock_symbol}")
+        self.model_name = model_name
+        self.data = data
+        self.horizons = sorted(horizons)
+        self.step = step
+        self.window = window
+        self.window_rows = window_rows or min_train_rows
+        self.min_train_rows = min_train_rows
+        self.mode = mode
+        self.warm_steps = warm_steps
+        if params is None:
+            params = ModelArtifact(data.stock_symbol, model_name).metadata().get("params", {})
+        self.params = params
+        self._one_hot_encode_data()
+        self.max_workers = max(1, min(max_workers or ResourcePlanner.available_cores(), len(self.refits())))
+        self.threads = max(1, ResourcePlanner.available_cores() // self.max_workers)
+        self.model = ModelRegistry().get_model(model_name, data, self.threads)
+
+    def _one_hot_encode_data(self) -> None:
+        """One hot encode data class."""
+        if self.model_name not in ["xgboost"]:
+            self.data.ohe_cat_cols()
+
+    def refits(self) -> np.ndarray:
+        """Return the last row known at every refit."""
+        return np.arange(self.min_train_rows - 1, len(self.data.index) - 1, self.step)
+
+    def _train_rows(self, origin: int) -> slice:
+        """Rows of the training window ending at an origin."""
+        start = max(0, origin + 1 - self.window_rows) if self.window == "sliding" else 0
+        return slice(start, origin + 1)
+
+    def _refit_data(self, origin: int) -> StockData:
+        """Stock data with the smoothing column of an estimated level re-estimated up to an origin.
+
+        The stored column's level is estimated on every close, so its rows would
+        carry later prices into the training window & forecasts.
+
+        :param origin: last row known at the refit
+        :type origin: int
+        :return: stock data whose features only depend on closes up to each row
+        :rtype: StockData
+        """
+        column = f"close_ses_{None}"
+        if column not in self.data.columns:
+            return self.data
+        close = self.data.matrix[:, 0].astype(np.float64)
+        spec = FeatureSpec(lags=(), sma_windows=(), ses_alphas=(None,))
+        alphas = FeatureEngineering.ses_alphas(close[: origin + 1], spec)
+        matrix = self.data.matrix.copy()
+        matrix[:, self.data.columns.get_loc(column)] = FeatureEngineering.price_features(close, spec, alphas)[:, 0]
+        return StockData.from_matrix(
+            self.data.stock_symbol,
+            self.data.index,
+            self.data.columns,
+            matrix,
+            split=self.data.split,
+            feature_spec=self.data.feature_spec,
+            stock_years=self.data.stock_years,
+            stock_start=self.data.stock_start,
+            encoded=self.data.encoded,
+            ses_alphas={**self.data.ses_alphas, column: alphas[0]},
+        )
+
+    def _estimator(self) -> Pipeline:
+        """Return unfitted pipeline estimator with the backtest's parameters."""
+        estimator = Pipeline([("preprocessing", self.model.preprocess()), ("model", self.model.build())])
+        return estimator.set_params(**self.params)
+
+    def _forecast(self, estimator: Pipeline, data: StockData, origins: np.ndarray) -> DataFrame:
+        """Forecast every horizon from each origin's close, dropping forecasts past the last row.
+
+        :param estimator: fitted pipeline estimator
+        :type estimator: Pipeline
+        :param data: stock data of the refit the estimator was fitted at
+        :type data: StockData
+        :param origins: last row known to each forecast
+        :type origins: np.ndarray
+        :return: origin & target dates, horizon, actual & forecast closing price
+        :rtype: DataFrame
+        """
+        forecaster = RecursiveForecaster(estimator, data.columns[1:])
+        history_rows = np.clip(origins[:, None] + np.arange(2 - forecaster.lookback, 1), 0, None)
+        history = data.matrix[history_rows, 1:]
+        forecasts = forecaster.forecast(FeatureState.from_data(data, origins), self.horizons[-1], history)
+
+        frames = []
+        for horizon in self.horizons:
+            known = origins + horizon < len(self.data.index)
+            targets = origins[known] + horizon
+            frame = {
+                "origin": self.data.index[origins[known]],
+                "horizon": horizon,
+                "date": self.data.index[targets],
+                "y": self.data.matrix[targets, 0],
+                "pred": forecasts[known, horizon - 1],
+            }
+            frames.append(DataFrame(frame))
+        return concat(frames, ignore_index=True)
+
+    def run_refits(self, refits: np.ndarray) -> DataFrame:
+        """Fit at each refit & forecast every origin until the next one.
+
+        In warm_start mode only the first refit is fitted, later ones warm starting
+        the model on their window.
+
+        :param refits: last row known at each refit, in order
+        :type refits: np.ndarray
+        :return: forecasts of every origin
+        :rtype: DataFrame
+        """
+        estimator, frames = None, []
+        for origin in refits:
+            data = self._refit_data(origin)
+            x, y = data.stock_x, data.stock_y
+            rows = self._train_rows(origin)
+            if estimator is None or self.mode != "warm_start":
+                estimator = self._estimator()
+                estimator.fit(x.iloc[rows], y.iloc[rows], **self.model.fit_params())
+            else:
+                self.model.warm_start(estimator, x.iloc[rows], y.iloc[rows], self.warm_steps)
+            origins = np.arange(origin, min(origin + self.step, len(self.data.index) - 1))
+            frames.append(self._forecast(estimator, data, origins))
+        return concat(frames, ignore_index=True)
+
+    def run(self) -> DataFrame:
+        """Run every refit, across a process pool if there are several workers.
+
+        Refits are run as one task each, or in warm_start mode as one contiguous
+        chunk per worker, each chunk fitting its first refit.
+
+        :return: forecasts of every origin & horizon
+        :rtype: DataFrame
+        """
+        refits = self.refits()
+        if self.mode == "warm_start":
+            tasks = [chunk for chunk in np.array_split(refits, self.max_workers) if len(chunk)]
+        else:
+            tasks = [refits[i : i + 1] for i in range(len(refits))]
+        self.logger.info(f"backtesting {self.model_name}: {len(refits)} refits on {self.max_workers} workers")
+        if self.max_workers == 1:
+            frames = [self.run_refits(task) for task in tasks]
+        else:
+            with ProcessPoolExecutor(self.max_workers, initializer=_init_worker, initargs=(self,)) as executor:
+                frames = list(executor.map(_run_refits, tasks))
+        return concat(frames, ignore_index=True).sort_values(["horizon", "origin"], ignore_index=True)
+
+    @staticmethod
+    def scores(forecasts: DataFrame) -> DataFrame:
+        """Score forecasts of every horizon.
+
+        :param forecasts: forecasts of every origin & horizon
+        :type forecasts: DataFrame
+        :return: rows, rmse, mae & mape by horizon
+        :rtype: DataFrame
+        """
+        errors = forecasts.assign(
+            squared=(forecasts["pred"] - forecasts["y"]) ** 2,
+            absolute=(forecasts["pred"] - forecasts["y"]).abs(),
+            percentage=((forecasts["pred"] - forecasts["y"]) / forecasts["y"]).abs(),
+        )
+        scores = errors.groupby("horizon").agg(
+            rows=("y", "size"), rmse=("squared", "mean"), mae=("absolute", "mean"), mape=("percentage", "mean")
+        )
+        scores["rmse"] = np.sqrt(scores["rmse"])
+        return scores
+
+    def save(self, forecasts: DataFrame, scores: DataFrame) -> None:
+        """Write forecasts & scores to reports.
+
+        :param forecasts: forecasts of every origin & horizon
+        :type forecasts: DataFrame
+        :param scores: scores by horizon
+        :type scores: DataFrame
+        """
+        directory = f"reports/{self.data.stock_symbol}"
+        pathlib.Path(directory).mkdir(parents=True, exist_ok=True)
+        forecasts.to_csv(f"{directory}/{self.model_name}_backtest.csv", index=False)
+        scores.to_csv(f"{directory}/{self.model_name}_backtest_scores.csv")
+
+
+if __name__ == "__main__":
+    pass
@@ -0,0 +1,68 @@
+from sklearn.base import clone
+from sklearn.pipeline import Pipeline
+from pandas import DataFrame, Series
+import numpy as np
+
+
+class FoldCache:
+
+    """Cross validation folds preprocessed once per search & shared by every candidate.
+
+    Each fold's preprocessing is fitted on the fold's training rows and both of the
+    fold's row sets are transformed once. The transformed folds are stacked into one
+    contiguous float32 array with splits indexing into it, so a search over the bare
+    model fits candidates without repeating any preprocessing, and joblib workers
+    receive the array as a shared memory map rather than a pickled copy.
+    """
+
+    def __init__(self, preprocess: Pipeline, cv) -> None:
+        """Fold cache initialiser.
+
+        :param preprocess: unfitted preprocessing pipeline, or None for no preprocessing
+        :type preprocess: Pipeline
+        :param cv: cross validation splitter, e.g. TimeSeriesSplit
+        :type cv: BaseCrossValidator
+        """
+        self.preprocess = preprocess
+        self.cv = cv
+
+    @staticmethod
+    def _array(x) -> np.ndarray:
+        """Return a contiguous float32 array of x."""
+        return np.ascontiguousarray(np.asarray(x, dtype=np.float32))
+
+    def fit(self, x: DataFrame, y: Series) -> "FoldCache":
+        """Preprocess every fold of x & y.
+
+        :param x: training features
+        :type x: DataFrame
+        :param y: training target
+        :type y: Series
+        :return: fitted fold cache
+        :rtype: FoldCache
+        """
+        splits = list(self.cv.split(x, y))
+        if self.preprocess is None:
+            self.x_, self.y_, self.splits_ = self._array(x), np.asarray(y), splits
+            return self
+
+        x_folds, y_folds, self.splits_ = [], [], []
+        offset = 0
+        for train, test in splits:
+            preprocess = clone(self.preprocess).fit(x.iloc[train], y.iloc[train])
+            for rows in [train, test]:
+                x_folds.append(preprocess.transform(x.iloc[rows]))
+                y_folds.append(np.asarray(y.iloc[rows]))
+            self.splits_.append(
+                (
+                    np.arange(offset, offset + len(train)),
+                    np.arange(offset + len(train), offset + len(train) + len(test)),
+                )
+            )
+            offset += len(train) + len(test)
+        self.x_, self.y_ = self._array(np.concatenate(x_folds)), np.concatenate(y_folds)
+        return self
+
+
+if __name__ == "__main__":
+    pass
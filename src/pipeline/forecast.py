@@ -0,0 +1,266 @@
+from data import FeatureState, FeatureStore, PanelData, PriceStore, StockData
+from pandas import DataFrame, Index, concat
+from sklearn.pipeline import Pipeline
+from concurrent.futures import ThreadPoolExecutor
+from pipeline.artifacts import ModelArtifact
+from datetime import date
+import numpy as np
+
+
+class RecursiveForecaster:
+
+    """Recursive multi-step forecasts of a fitted pipeline.
+
+    Each step predicts the next close of every series of a feature state in one
+    predict call, then feeds the predictions back into the state as the latest
+    closes for the following step. Models over lookback windows are given the
+    window of scaled rows ending at each step's rows.
+    """
+
+    def __init__(self, estimator: Pipeline, columns: list, x_columns: list = None) -> None:
+        """Recursive forecaster initialiser.
+
+        :param estimator: fitted preprocessing & model pipeline
+        :type estimator: Pipeline
+        :param columns: feature columns of the feature state's rows
+        :type columns: list
+        :param x_columns: feature columns the pipeline was fitted on, defaults to columns
+        :type x_columns: list, optional
+        """
+        self.estimator = estimator
+        self.columns = Index(columns)
+        self.x_columns = x_columns
+        self.lookback = getattr(estimator[-1], "lookback", 1)
+
+    def _x(self, rows: np.ndarray) -> DataFrame:
+        """Align (rows, columns) feature rows with the columns the pipeline was fitted on."""
+        x = DataFrame(rows, columns=self.columns)
+        return x if self.x_columns is None else x.reindex(columns=self.x_columns, fill_value=0)
+
+    def _scale(self, rows: np.ndarray) -> np.ndarray:
+        """Preprocess (..., columns) feature rows, keeping their leading shape."""
+        scaled = np.asarray(self.estimator[:-1].transform(self._x(rows.reshape(-1, rows.shape[-1]))), dtype=np.float32)
+        return scaled.reshape(*rows.shape[:-1], scaled.shape[-1])
+
+    def start(self, rows: np.ndarray, history: np.ndarray = None) -> None:
+        """Start forecasting series from their first forecast day's rows.
+
+        :param rows: (series, columns) feature rows of the first forecast day
+        :type rows: np.ndarray
+        :param history: (series, lookback - 1, columns) feature rows preceding the first forecast day,
+            only used by lookback models, defaults to copies of rows
+        :type history: np.ndarray, optional
+        """
+        if self.lookback > 1:
+            if history is None:
+                history = np.repeat(rows[:, None], self.lookback - 1, axis=1)
+            history = np.asarray(history, dtype=np.float32)
+            self.window = self._scale(history[:, history.shape[1] - self.lookback + 1 :])
+
+    def step(self, rows: np.ndarray) -> np.ndarray:
+        """Predict the next close of every series from its day's feature rows in one call.
+
+        :param rows: (series, columns) feature rows of the day
+        :type rows: np.ndarray
+        :return: (series,) forecast closes
+        :rtype: np.ndarray
+        """
+        if self.lookback == 1:
+            # preprocessed rows go to the model as an array, skipping its per call data frame checks
+            return self.estimator[-1].predict(self._scale(rows))
+        self.window = np.concatenate([self.window, self._scale(rows[:, None])], axis=1)
+        pred = self.estimator[-1].predict(self.window)
+        self.window = self.window[:, 1:]
+        return pred
+
+    def forecast(self, state: FeatureState, horizon: int, history: np.ndarray = None) -> np.ndarray:
+        """Forecast every series' next horizon closes, advancing the state past them.
+
+        :param state: feature state as of every series' last known close
+        :type state: FeatureState
+        :param horizon: days to forecast
+        :type horizon: int
+        :param history: (series, lookback - 1, columns) feature rows preceding the first forecast day,
+            only used by lookback models, defaults to copies of the first forecast day's rows
+        :type history: np.ndarray, optional
+        :return: (series, horizon) forecast closes
+        :rtype: np.ndarray
+        """
+        forecasts = np.empty((state.n_series, horizon), dtype=np.float32)
+        self.start(state.rows(), history)
+        for step in range(horizon):
+            forecasts[:, step] = self.step(state.rows())
+            state.push(forecasts[:, step])
+        return forecasts
+
+
+class ModelForecast:
+
+    """Multi-step closing price forecasts of saved models, from each symbol's latest close.
+
+    Every symbol's features are advanced day by day as O(1) feature state updates,
+    the states of all symbols being stacked into one so each day's rows are built
+    for every symbol at once. Each model predicts all of its symbols' rows of a day
+    in one call, all symbols of a panel model together. Symbols with their own
+    models have their models loaded & data built concurrently.
+    """
+
+    def __init__(
+        self,
+        model_name: str,
+        data_years: int = 10,
+        panel_name: str = None,
+        price_store: PriceStore = None,
+        feature_store: FeatureStore = None,
+        max_workers: int = 8,
+    ) -> None:
+        """Model forecast initialiser.
+
+        :param model_name: name of trained model to forecast with
+        :type model_name: str
+        :param data_years: years of data to build features from, if the saved model has no data window,
+            defaults to 10
+        :type data_years: int, optional
+        :param panel_name: name of the panel model to forecast with, defaults to None (one model per symbol)
+        :type panel_name: str, optional
+        :param price_store: local price store to read prices from, defaults to PriceStore()
+        :type price_store: PriceStore, optional
+        :param feature_store: feature store to read features from, defaults to FeatureStore()
+        :type feature_store: FeatureStore, optional
+        :param max_workers: symbols' models loaded & data built concurrently, defaults to 8
+        :type max_workers: int, optional
+        """
+        self.model_name = model_name
+        self.data_years = data_years
+        self.panel_name = panel_name
+        self.price_store = price_store or PriceStore()
+        self.feature_store = feature_store or FeatureStore()
+        self.max_workers = max_workers
+
+    def _data(self, stock_symbol: str, metadata: dict) -> StockData:
+        """Build a saved model's data, from the start of its data window to the latest prices."""
+        stock_start = date.fromisoformat(metadata["data_start"]) if "data_start" in metadata else None
+        if "symbols" in metadata:
+            data = PanelData(
+                metadata["symbols"],
+                self.data_years,
+                stock_symbol,
+                self.price_store,
+                self.feature_store,
+                stock_start=stock_start,
+            )
+        else:
+            data = StockData(
+                stock_symbol, self.data_years, self.price_store, self.feature_store, stock_start=stock_start
+            )
+        if self.model_name not in ["xgboost"]:
+            data.ohe_cat_cols()
+        return data
+
+    def _model(self, stock_symbol: str) -> tuple:
+        """Load a symbol's saved model & build its data."""
+        artifact = ModelArtifact(stock_symbol, self.model_name)
+        metadata = artifact.metadata()
+        return artifact.load(), metadata.get("x_columns"), [self._data(stock_symbol, metadata)]
+
+    @staticmethod
+    def _history(data: StockData, lookback: int) -> np.ndarray:
+        """Feature rows preceding the day after the last row, for lookback models."""
+        return data.matrix[np.clip(np.arange(len(data.index) + 1 - lookback, len(data.index)), 0, None), 1:]
+
+    @staticmethod
+    def forecast_models(models: list, horizon: int) -> DataFrame:
+        """Forecast the closes after the last row of every symbol's stock data with each symbol's model.
+
+        Symbols of the same feature columns are advanced as one feature state and
+        every model predicts its symbols' rows of a day in one call.
+
+        :param models: (fitted pipeline, feature columns it was fitted on or None, single symbol stock data
+            of the symbols it forecasts) of every model
+        :type models: list
+        :param horizon: trading days to forecast
+        :type horizon: int
+        :return: symbol, step, date & forecast closing price of every day forecast, in the models' symbol order
+        :rtype: DataFrame
+        """
+        groups = {}
+        for model in models:
+            for data in model[2]:
+                groups.setdefault(tuple(data.columns), []).append((model, data))
+
+        frames = []
+        for entries in groups.values():
+            members = [data for _, data in entries]
+            state = FeatureState.concat([FeatureState.from_data(data, [len(data.index) - 1]) for data in members])
+            dates = np.busday_offset(state.dates[:, None], np.arange(1, horizon + 1), roll="forward")
+            series = {}
+            for i, (model, _) in enumerate(entries):
+                series.setdefault(id(model), (model, []))[1].append(i)
+            rows, forecasters = state.rows(), []
+            for (estimator, x_columns, _), positions in series.values():
+                forecaster = RecursiveForecaster(estimator, members[0].columns[1:], x_columns)
+                history = np.stack([ModelForecast._history(members[i], forecaster.lookback) for i in positions])
+                forecaster.start(rows[positions], history)
+                forecasters.append((forecaster, np.array(positions)))
+
+            forecasts = np.empty((state.n_series, horizon), dtype=np.float32)
+            for step in range(horizon):
+                rows = state.rows()
+                for forecaster, positions in forecasters:
+                    forecasts[positions, step] = forecaster.step(rows[positions])
+                state.push(forecasts[:, step])
+            frames.append(
+                DataFrame(
+                    {
+                        "symbol": np.repeat([data.stock_symbol for data in members], horizon),
+                        "step": np.tile(np.arange(1, horizon + 1), len(members)),
+                        "date": dates.reshape(-1),
+                        "forecast": forecasts.reshape(-1),
+                    }
+                )
+            )
+        symbols = [data.stock_symbol for model in models for data in model[2]]
+        order = dict(zip(symbols, range(len(symbols))))
+        forecasts = concat(frames, ignore_index=True)
+        forecasts = forecasts.iloc[np.argsort(forecasts["symbol"].map(order).to_numpy(), kind="stable")]
+        return forecasts.reset_index(drop=True)
+
+    @staticmethod
+    def forecast_members(estimator: Pipeline, members: list, horizon: int, x_columns: list = None) -> DataFrame:
+        """Forecast the closes after the last row of every symbol's stock data with one model.
+
+        :param estimator: fitted preprocessing & model pipeline
+        :type estimator: Pipeline
+        :param members: single symbol stock data of every symbol, with the same columns
+        :type members: list
+        :param horizon: trading days to forecast
+        :type horizon: int
+        :param x_columns: feature columns the pipeline was fitted on, defaults to the data's columns
+        :type x_columns: list, optional
+        :return: symbol, step, date & forecast closing price of every day forecast
+        :rtype: DataFrame
+        """
+        return ModelForecast.forecast_models([(estimator, x_columns, members)], horizon)
+
+    def forecast(self, symbols: list, horizon: int) -> DataFrame:
+        """Forecast every symbol's next horizon closes.
+
+        :param symbols: symbols to forecast, all of the panel's symbols if forecasting with a panel model
+        :type symbols: list
+        :param horizon: trading days to forecast
+        :type horizon: int
+        :return: symbol, step, date & forecast closing price of every day forecast
+        :rtype: DataFrame
+        """
+        if self.panel_name:
+            artifact = ModelArtifact(self.panel_name, self.model_name)
+            metadata = artifact.metadata()
+            data = self._data(self.panel_name, metadata)
+            members = [data.member(symbol) for symbol in symbols or data.stock_symbols]
+            return self.forecast_members(artifact.load(), members, horizon, metadata.get("x_columns"))
+        with ThreadPoolExecutor(self.max_workers) as executor:
+            models = list(executor.map(self._model, dict.fromkeys(symbols)))
+        return self.forecast_models(models, horizon)
+
+if __name__ == "__main__":
+    pass
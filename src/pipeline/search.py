@@ -0,0 +1,157 @@
+from skopt import BayesSearchCV
+from skopt.utils import point_asdict
+from typing import Callable
+from common import Instrument
+import numpy as np
+
+
+class ResumableBayesSearchCV(BayesSearchCV):
+
+    """Bayesian search seeded with the observations & best points of earlier searches.
+
+    Observations are told to the optimizer before its first ask, so the surrogate
+    model starts from earlier results instead of random initial points. Seed points
+    are evaluated first (on the current data) so the best earlier configurations are
+    always candidates for best_estimator_.
+    """
+
+    def __init__(
+        self,
+        estimator,
+        search_spaces,
+        observations=None,
+        seed_points=None,
+        optimizer_kwargs=None,
+        n_iter=50,
+        scoring=None,
+        fit_params=None,
+        n_jobs=1,
+        n_points=1,
+        iid="deprecated",
+        refit=True,
+        cv=None,
+        verbose=0,
+        pre_dispatch="2*n_jobs",
+        random_state=None,
+        error_score="raise",
+        return_train_score=False,
+    ):
+        """Resumable bayesian search.
+
+        :param observations: earlier search history, a dict of "dimensions"
+            (parameter names), "x_iters" and "func_vals", defaults to None
+        :type observations: dict, optional
+        :param seed_points: parameter dicts to evaluate before asking the optimizer,
+            defaults to None
+        :type seed_points: list, optional
+
+        All other parameters are passed to BayesSearchCV.
+        """
+        self.observations = observations
+        self.seed_points = seed_points
+        super().__init__(
+            estimator=estimator,
+            search_spaces=search_spaces,
+            optimizer_kwargs=optimizer_kwargs,
+            n_iter=n_iter,
+            scoring=scoring,
+            fit_params=fit_params,
+            n_jobs=n_jobs,
+            n_points=n_points,
+            iid=iid,
+            refit=refit,
+            cv=cv,
+            verbose=verbose,
+            pre_dispatch=pre_dispatch,
+            random_state=random_state,
+            error_score=error_score,
+            return_train_score=return_train_score,
+        )
+
+    @staticmethod
+    def _dimension_names(params_space: dict) -> list:
+        """Return parameter names in optimizer dimension order."""
+        return sorted(params_space.keys())
+
+    def _make_optimizer(self, params_space: dict):
+        """Instantiate optimizer, telling it earlier observations within its space."""
+        optimizer = super()._make_optimizer(params_space)
+        names = self._dimension_names(params_space)
+        observations = self.observations or {}
+        if observations.get("dimensions") == names:
+            points = [
+                (list(x), y)
+                for x, y in zip(observations["x_iters"], observations["func_vals"])
+                if x in optimizer.space and np.isfinite(y)
+            ]
+            if points:
+                optimizer.tell([x for x, _ in points], [y for _, y in points])
+        self.n_observed_ = len(optimizer.Xi)
+        seeds = [
+            [seed[name] for name in names]
+            for seed in self.seed_points or []
+            if set(seed) == set(names) and [seed[name] for name in names] in optimizer.space
+        ]
+        self._pending_seeds = {id(optimizer): seeds}
+        return optimizer
+
+    def _step(self, search_space, optimizer, evaluate_candidates, n_points=1):
+        """Evaluate a batch of points, timed as a search iteration."""
+        with Instrument.span("search_iteration"):
+            return self._seeded_step(search_space, optimizer, evaluate_candidates, n_points)
+
+    def _seeded_step(self, search_space, optimizer, evaluate_candidates, n_points=1):
+        """Evaluate pending seed points, topped up with points asked of the optimizer."""
+        seeds = self._pending_seeds.get(id(optimizer), [])
+        if not seeds:
+            return super()._step(search_space, optimizer, evaluate_candidates, n_points)
+
+        params = seeds[:n_points]
+        if len(params) < n_points:
+            params += optimizer.ask(n_points=n_points - len(params))
+        params = [[np.array(v).item() for v in p] for p in params]
+        self._pending_seeds[id(optimizer)] = seeds[n_points:]
+        all_results = evaluate_candidates([point_asdict(search_space, p) for p in params])
+        local_results = all_results["mean_test_score"][-len(params) :]
+        return optimizer.tell(params, [-score for score in local_results])
+
+
+class SearchCheckpoint:
+
+    """Search callback persisting the optimizer's observations after every batch of points."""
+
+    def __init__(self, search: ResumableBayesSearchCV, save: Callable[[dict], None], n_iter: int, n_done: int = 0):
+        """Search checkpoint initialiser.
+
+        :param search: search being checkpointed
+        :type search: ResumableBayesSearchCV
+        :param save: callable writing the checkpoint dict
+        :type save: Callable[[dict], None]
+        :param n_iter: number of new points the (possibly resumed) search targets
+        :type n_iter: int
+        :param n_done: number of those points evaluated before a resume, defaults to 0
+        :type n_done: int, optional
+        """
+        self.search = search
+        self.save = save
+        self.n_iter = n_iter
+        self.n_done = n_done
+
+    def __call__(self, result) -> bool:
+        """Write observations of an optimizer result, never stopping the search."""
+        n_evaluated = self.n_done + len(result.x_iters) - self.search.n_observed_
+        self.save(
+            {
+                "dimensions": sorted(self.search.search_spaces.keys()),
+                "x_iters": [list(x) for x in result.x_iters],
+                "func_vals": [float(y) for y in result.func_vals],
+                "n_iter": self.n_iter,
+                "n_evaluated": n_evaluated,
+                "complete": n_evaluated >= self.n_iter,
+            }
+        )
+        return False
+
+
+if __name__ == "__main__":
+    pass
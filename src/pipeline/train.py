@@ -1,36 +1,82 @@
-from data import StockData
-from models import ModelRegistry
+from data import FeatureStore, PanelData, StockData
+from models import ConformalIntervals, ModelRegistry
 from skopt import BayesSearchCV
-from sklearn.model_selection import TimeSeriesSplit
+from sklearn.experimental import enable_halving_search_cv  # noqa: F401
+from sklearn.model_selection import HalvingRandomSearchCV, TimeSeriesSplit
+from sklearn.model_selection._search import BaseSearchCV
 from sklearn.pipeline import Pipeline
-from common import TarZip
-import pathlib
-import joblib
+from sklearn.base import clone
+from joblib import Parallel, delayed
+from pipeline.artifacts import ModelArtifact
+from pipeline.folds import FoldCache
+from pipeline.search import ResumableBayesSearchCV, SearchCheckpoint
+from common import Instrument, ResourcePlanner
+from dataclasses import asdict
+import numpy as np
 
 
 class ModelTrain:
 
     """Class for managing the training and hyper paramter tuning of a model"""
 
-    def __init__(self, model_name: str, data: StockData) -> None:
+    def __init__(
+        self,
+        model_name: str,
+        data: StockData,
+        n_jobs: int = -1,
+        resume: bool = True,
+        transfer_symbols: list = None,
+        search_backend: str = "bayes",
+    ) -> None:
         """Model training class
 
         :param model_name: Name of model to train
         :type model_name: str
         :param data: stock data to train model on
         :type data: StockData
+        :param n_jobs: cores to split between parallel search fits & model threads,
+            defaults to -1 (all available cores)
+        :type n_jobs: int, optional
+        :param resume: seed the search with this symbol & model's earlier searches, defaults to True
+        :type resume: bool, optional
+        :param transfer_symbols: symbols whose best earlier configurations seed the search, defaults to None
+        :type transfer_symbols: list, optional
+        :param search_backend: "bayes" search or successive "halving" search, defaults to "bayes"
+        :type search_backend: str, optional
         """
         self.model_name = model_name
         self.data = data
+        self.n_points, self.n_splits = 5, 5
+        self.resources = ResourcePlanner.plan(n_jobs, self.n_points, self.n_splits)
+        self.resources.apply()
+        self.resume = resume
+        self.transfer_symbols = transfer_symbols or []
+        self.search_backend = search_backend
+        self.intervals = ConformalIntervals()
+        self.artifact = ModelArtifact(data.stock_symbol, model_name)
         self._one_hot_encode_data()
         self.model_registry = ModelRegistry()
-        self.model = self.model_registry.get_model(model_name, data)
+        self.model = self.model_registry.get_model(model_name, data, self.resources.estimator_threads)
 
     def _one_hot_encode_data(self) -> None:
         """One hot encode data class."""
         if self.model_name not in ["xgboost"]:
             self.data.ohe_cat_cols()
 
+    def _search_estimator(self) -> Pipeline:
+        """Return model only pipeline searched over preprocessed folds.
+
+        Models over lookback windows read the windows of a test fold's first rows
+        from the training rows the fold follows, rather than padding them.
+
+        :return: Sklearn pipeline estimator
+        :rtype: Pipeline
+        """
+        model = self.model.build()
+        if "fit_context" in model.get_params():
+            model.set_params(fit_context=True)
+        return Pipeline([("model", model)])
+
     def _estimator(self) -> Pipeline:
         """Return pipeline estimator.
 
@@ -39,8 +85,41 @@ class ModelTrain:
         """
         return Pipeline([("preprocessing", self.model.preprocess()), ("model", self.model.build())])
 
-    def _pipeline(self, parameter_samples: int) -> BayesSearchCV:
-        """Build training & parameter tuning pipeline.
+    @staticmethod
+    def _best_point(history: dict) -> dict:
+        """Return best parameters observed in a search history."""
+        if not history.get("func_vals"):
+            return None
+        best = min(range(len(history["func_vals"])), key=history["func_vals"].__getitem__)
+        return dict(zip(history["dimensions"], history["x_iters"][best]))
+
+    def _seed_points(self, history: dict) -> list:
+        """Return best earlier parameters of this & any transfer symbols."""
+        histories = [history] + [
+            ModelArtifact(symbol, self.model_name).search_history() for symbol in self.transfer_symbols
+        ]
+        points = [self._best_point(history) for history in histories]
+        return [point for point in points if point is not None]
+
+    def _pipeline(self, parameter_samples: int) -> BaseSearchCV:
+        """Build training & parameter tuning pipeline for the search backend.
+
+        :param parameter_samples: Number of samples to select from paramter space
+            for parameter tuning.
+        :type parameter_samples: int
+
+        :return: parameter tunining pipeline
+        :rtype: BaseSearchCV
+        """
+        if self.search_backend == "halving":
+            return self._halving_pipeline(parameter_samples)
+        return self._bayes_pipeline(parameter_samples)
+
+    def _bayes_pipeline(self, parameter_samples: int) -> BayesSearchCV:
+        """Build bayesian training & parameter tuning pipeline.
+
+        An incomplete earlier search (e.g. one that crashed) is resumed for its
+        remaining points, otherwise parameter_samples new points are searched.
 
         :param parameter_samples: Number of samples to select from paramter space
             for parameter tuning.
@@ -49,50 +128,91 @@ class ModelTrain:
         :return: Bayesian search parameter tunining pipeline
         :rtype: BayesSearchCV
         """
-        return BayesSearchCV(
-            estimator=self._estimator(),
+        history = self.artifact.search_history() if self.resume else {}
+        n_iter, n_done = parameter_samples, 0
+        if history and not history["complete"]:
+            n_iter, n_done = history["n_iter"], history["n_evaluated"]
+
+        pipeline = ResumableBayesSearchCV(
+            estimator=self._search_estimator(),
             search_spaces=self.model.params(),
+            observations=history,
+            seed_points=self._seed_points(history),
             scoring="neg_mean_squared_error",
-            cv=TimeSeriesSplit(n_splits=5),
-            n_iter=parameter_samples,
-            n_jobs=-1,
-            n_points=5,
+            cv=self.folds.splits_,
+            refit=False,
+            n_iter=max(1, n_iter - n_done),
+            n_jobs=self.resources.search_jobs,
+            n_points=self.n_points,
             verbose=0,
         )
+        self.checkpoint = SearchCheckpoint(pipeline, self.artifact.save_search_history, n_iter, n_done)
+        return pipeline
 
-    def _write_model(self, pipeline: BayesSearchCV) -> None:
-        """Write model to artifact library.
+    def _halving_pipeline(self, parameter_samples: int) -> HalvingRandomSearchCV:
+        """Build successive halving training & parameter tuning pipeline.
 
-        :param pipeline: traineed pipeline instance to write
-        :type pipeline: BayesSearchCV
+        Candidates are trained on a growing budget (e.g. boosting rounds or epochs),
+        keeping the best third of candidates at each step.
+
+        :param parameter_samples: Number of samples to select from paramter space
+            for parameter tuning.
+        :type parameter_samples: int
+
+        :return: Successive halving parameter tunining pipeline
+        :rtype: HalvingRandomSearchCV
         """
-        tf_models = ["lstm"]
-        if self.model_name in tf_models:
-            pipeline = self._keras_save(pipeline)
-        self._joblib_save(pipeline)
+        budget = self.model.budget()
+        params = {name: values for name, values in self.model.params().items() if name != budget["resource"]}
+        return HalvingRandomSearchCV(
+            estimator=self._search_estimator(),
+            param_distributions=params,
+            n_candidates=parameter_samples,
+            factor=3,
+            resource=budget["resource"],
+            min_resources=budget["min_resources"],
+            max_resources=budget["max_resources"],
+            scoring="neg_mean_squared_error",
+            cv=self.folds.splits_,
+            refit=False,
+            n_jobs=self.resources.search_jobs,
+            return_train_score=False,
+            verbose=0,
+        )
 
-    def _joblib_save(self, pipeline: BayesSearchCV) -> None:
-        """Write model to artifact library using joblib.
+    def search_budget(self) -> dict:
+        """Return resources the search used against a full search of every candidate.
 
-        :param pipeline: traineed pipeline instance to write
-        :type pipeline: BayesSearchCV
+        :return: used & full resource units (e.g. boosting rounds or epochs per fold)
+            and the fraction saved
+        :rtype: dict
         """
-        pathlib.Path(f"artifacts/{self.data.stock_symbol}/").mkdir(parents=True, exist_ok=True)
-        model_file_name = f"artifacts/{self.data.stock_symbol}/{self.model_name}.sav"
-        joblib.dump(pipeline, model_file_name)
+        if not isinstance(self.pipeline, HalvingRandomSearchCV):
+            return {"used": None, "full": None, "saved": 0.0}
+        used = sum(n * r for n, r in zip(self.pipeline.n_candidates_, self.pipeline.n_resources_))
+        full = self.pipeline.n_candidates_[0] * self.pipeline.max_resources_
+        return {"used": int(used), "full": int(full), "saved": 1 - used / full}
 
-    def _keras_save(self, pipeline: BayesSearchCV) -> BayesSearchCV:
-        """Write keras estimator to artifact library from pipline.
+    def _write_model(self, pipeline: BayesSearchCV) -> None:
+        """Write model to artifact library.
 
         :param pipeline: traineed pipeline instance to write
         :type pipeline: BayesSearchCV
         """
-        pathlib.Path(f"artifacts/{self.data.stock_symbol}/").mkdir(parents=True, exist_ok=True)
-        model_file_name = f"artifacts/{self.data.stock_symbol}/{self.model_name}.h5"
-        pipeline.best_estimator_.named_steps["model"].model.save(model_file_name)
-        pipeline.best_estimator_.named_steps["model"].model = None
-        TarZip.compress(model_file_name)
-        return pipeline
+        metadata = {
+            "data_start": self.data.stock_start.isoformat(),
+            "data_end": self.data.stock_df.index.max().date().isoformat(),
+            "data_hash": FeatureStore.data_key(self.data.stock_symbol, self.data.stock_df),
+            "x_columns": list(self.data.get_x_cols()),
+            "feature_spec": asdict(self.data.feature_spec),
+            "feature_hash": self.data.feature_spec.hash(),
+            "params": pipeline.best_params_,
+            "best_score": pipeline.best_score_,
+            "intervals": self.intervals.to_dict(),
+        }
+        if isinstance(self.data, PanelData):
+            metadata["symbols"] = self.data.stock_symbols
+        self.artifact.save(pipeline.best_estimator_, metadata)
 
     def train(self, parameter_samples: int) -> None:
         """Train model on stock data and save to artifact library.
@@ -101,9 +221,64 @@ class ModelTrain:
             for parameter tuning.
         :type parameter_samples: int
         """
+        x, y = self.data.stock_x_train, self.data.stock_y_train
+        with Instrument.span("folds"):
+            self.folds = FoldCache(self.model.preprocess(), TimeSeriesSplit(n_splits=self.n_splits)).fit(x, y)
         self.pipeline = self._pipeline(parameter_samples)
-        self.pipeline.fit(self.data.stock_x_train, self.data.stock_y_train, **self.model.fit_params())
-        self._write_model(self.pipeline)
+        search_params = {"callback": self.checkpoint} if isinstance(self.pipeline, ResumableBayesSearchCV) else {}
+        with Instrument.span("search"):
+            self.pipeline.fit(self.folds.x_, self.folds.y_, **search_params, **self.model.fit_params())
+        self._record_search()
+        with Instrument.span("calibrate"):
+            self._calibrate()
+        with Instrument.span("refit"):
+            self._refit()
+        with Instrument.span("save"):
+            self._write_model(self.pipeline)
+
+    def _record_search(self) -> None:
+        """Count trials & folds of the search and record its fold fit times."""
+        results = self.pipeline.cv_results_
+        Instrument.count("trials", len(results["params"]))
+        Instrument.count("folds", len(results["params"]) * self.n_splits)
+        for fit_time in results["mean_fit_time"]:
+            Instrument.record("cv_fold", fit_time, count=self.n_splits, model=self.model_name)
+
+    @staticmethod
+    def _fold_predictions(estimator: Pipeline, x: np.ndarray, y: np.ndarray, train, test, fit_params: dict) -> tuple:
+        """Fit on a fold's training rows and predict its test rows, with any quantile predictions."""
+        estimator.fit(x[train], y[train], **fit_params)
+        return ConformalIntervals.predict_bounds(estimator, x[test])
+
+    def _calibrate(self) -> None:
+        """Calibrate prediction intervals on the best parameters' out of fold predictions.
+
+        The best parameters are fitted once more on every preprocessed fold, in
+        parallel, and every coverage's interval is calibrated on the folds' test rows,
+        rather than searching a model per quantile.
+        """
+        estimator = self._search_estimator().set_params(**self.pipeline.best_params_)
+        folds = Parallel(n_jobs=self.resources.search_jobs)(
+            delayed(self._fold_predictions)(
+                clone(estimator), self.folds.x_, self.folds.y_, train, test, self.model.fit_params()
+            )
+            for train, test in self.folds.splits_
+        )
+        y = np.concatenate([self.folds.y_[test] for _, test in self.folds.splits_])
+        pred = np.concatenate([fold_pred for fold_pred, _ in folds])
+        bounds = np.concatenate([fold_bounds for _, fold_bounds in folds]) if folds[0][1] is not None else None
+        self.intervals.fit(y, pred, bounds, getattr(estimator[-1], "quantiles", None))
+
+    def _refit(self) -> None:
+        """Refit preprocessing & model with the best parameters on all training data.
+
+        The search runs over preprocessed folds without refitting, so the best
+        estimator is fitted here and attached to the search.
+        """
+        estimator = self._estimator().set_params(**self.pipeline.best_params_)
+        estimator.fit(self.data.stock_x_train, self.data.stock_y_train, **self.model.fit_params())
+        self.pipeline.best_estimator_ = estimator
+        self.pipeline.refit = True
 
 
 if __name__ == "__main__":
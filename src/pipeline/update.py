@@ -0,0 +1,94 @@
+from data import StockData
+from models import ModelRegistry
+from pipeline.artifacts import ModelArtifact
+from pandas import DataFrame
+from datetime import date
+import pandas as pd
+import pathlib
+
+
+class ModelUpdate:
+
+    """Class for refreshing a trained model with newly appended price data"""
+
+    def __init__(self, model_name: str, data: StockData) -> None:
+        """Model update class
+
+        :param model_name: Name of trained model to update
+        :type model_name: str
+        :param data: stock data extending the data the model was trained on
+        :type data: StockData
+        :raises ValueError: if the model was saved without its data window, e.g. a legacy model
+        """
+        self.model_name = model_name
+        self.data = data
+        self.artifact = ModelArtifact(data.stock_symbol, model_name)
+        self.metadata = self.artifact.metadata()
+        if "data_end" not in self.metadata:
+            raise ValueError(
+                f"{model_name} for {data.stock_symbol} was saved without its data window, "
+                "so its new rows are unknown: retrain it first"
+            )
+        self._one_hot_encode_data()
+        self.model = ModelRegistry().get_model(model_name, data)
+        self.estimator = self.artifact.load()
+        self.warm_started = False
+
+    def _one_hot_encode_data(self) -> None:
+        """One hot encode data class."""
+        if self.model_name not in ["xgboost"]:
+            self.data.ohe_cat_cols()
+
+    def _x(self, x: DataFrame) -> DataFrame:
+        """Align feature columns with those the model was trained on."""
+        if "x_columns" not in self.metadata:
+            return x
+        return x.reindex(columns=self.metadata["x_columns"], fill_value=0)
+
+    def predict(self) -> DataFrame:
+        """Predict closing price for rows appended since the model was last saved.
+
+        :return: actual & predicted closing price of new rows
+        :rtype: DataFrame
+        """
+        index = self.data.stock_x.index
+        first = int(index.searchsorted(pd.Timestamp(date.fromisoformat(self.metadata["data_end"])), side="right"))
+        # models over lookback windows also predict the new rows' preceding days, whose predictions are dropped,
+        # so the windows of the first new rows hold real rows
+        dates = index[:first].unique()
+        context = dates[max(len(dates) + 1 - getattr(self.estimator[-1], "lookback", 1), 0) :]
+        start = int(index.searchsorted(context[0])) if len(context) else first
+        df = DataFrame({"y": self.data.stock_y.iloc[first:]}, index=index[first:])
+        if len(df):
+            df["pred"] = self.estimator.predict(self._x(self.data.stock_x.iloc[start:]))[first - start :]
+        else:
+            df["pred"] = []
+        return df
+
+    def warm_start(self, steps: int) -> None:
+        """Continue training the saved model on all rows, including new ones.
+
+        :param steps: boosting rounds or epochs to continue training for
+        :type steps: int
+        """
+        x, y = self._x(self.data.stock_x), self.data.stock_y
+        self.model.warm_start(self.estimator, x, y, steps)
+        self.warm_started = True
+
+    def save(self, predictions: DataFrame) -> None:
+        """Write predictions to reports & updated model or metadata to artifact library.
+
+        :param predictions: actual & predicted closing price of new rows
+        :type predictions: DataFrame
+        """
+        pathlib.Path(f"reports/{self.data.stock_symbol}/").mkdir(parents=True, exist_ok=True)
+        predictions.to_csv(f"reports/{self.data.stock_symbol}/{self.model_name}_predictions.csv")
+        metadata = {**self.metadata, "data_end": self.data.stock_df.index.max().date().isoformat()}
+        if self.warm_started or self.artifact.legacy():
+            self.artifact.save(self.estimator, metadata)
+        else:
+            self.artifact.save_metadata(metadata)
+
+
+if __name__ == "__main__":
+    pass
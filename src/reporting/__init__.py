@@ -1 +1,3 @@
 from reporting.chart import StockChart
+from reporting.panel import PanelReport
+from reporting.comparison import ComparisonReport
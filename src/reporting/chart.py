@@ -1,42 +1,78 @@
 from typing import Any
 from data import StockData
-from pandas import DataFrame
+from pandas import DataFrame, Index, Series
+from sklearn.pipeline import Pipeline
 from plotly.subplots import make_subplots
-from keras.models import load_model
-from common import TarZip
+from plotly.offline import get_plotlyjs
+from models import ConformalIntervals
+from pipeline.artifacts import ModelArtifact
+from reporting.downsample import Downsample
 import plotly.graph_objects as go
+import numpy as np
 import pathlib
-import joblib
+import sys
 import os
 
 
 class StockChart:
 
-    """Stock charting for measuring modelling performance."""
+    """Stock charting for measuring modelling performance.
 
-    def __init__(self, model_name: str, data: StockData) -> None:
-        """Stock chart initialiser"""
+    Long series are downsampled to the low & high of equal buckets before plotting as
+    WebGL traces, histograms are binned with numpy, and reports reference plotly.js
+    rather than each inlining a copy of it. Calibrated prediction intervals are drawn
+    around test predictions, with their test coverage & width.
+    """
+
+    def __init__(
+        self,
+        model_name: str,
+        data: StockData,
+        show: bool = True,
+        estimator: Pipeline = None,
+        report_name: str = None,
+        max_points: int = None,
+        plotlyjs: str = None,
+        intervals: ConformalIntervals = None,
+    ) -> None:
+        """Stock chart initialiser
+
+        :param model_name: name of model to report on
+        :type model_name: str
+        :param data: stock data the model was trained on
+        :type data: StockData
+        :param show: open the report in a browser, if there is a display, defaults to True
+        :type show: bool, optional
+        :param estimator: fitted pipeline, defaults to loading it from the artifact library
+        :type estimator: Pipeline, optional
+        :param report_name: report file name, defaults to model_name
+        :type report_name: str, optional
+        :param max_points: most points plotted per series, 0 for all, defaults to REPORT_MAX_POINTS or 2000
+        :type max_points: int, optional
+        :param plotlyjs: plotly.js reference, "cdn", "local" (one shared copy in reports/) or "inline",
+            defaults to REPORT_PLOTLYJS or "cdn"
+        :type plotlyjs: str, optional
+        :param intervals: calibrated prediction intervals of the estimator, defaults to those saved with the
+            model if it is loaded from the artifact library
+        :type intervals: ConformalIntervals, optional
+        """
         self.model_name = model_name
         self.data = data
+        self.show = show
+        self.estimator = estimator
+        self.report_name = report_name or model_name
+        self.max_points = int(os.getenv("REPORT_MAX_POINTS", 2000)) if max_points is None else max_points
+        self.plotlyjs = plotlyjs or os.getenv("REPORT_PLOTLYJS", "cdn")
+        self.intervals = intervals
 
     def _load_model(self) -> None:
-        """Load model from artifact library"""
-        self._load_joblib()
-        tf_models = ["lstm"]
-        if self.model_name in tf_models:
-            self._load_keras()
-
-    def _load_joblib(self) -> None:
-        """Load joblib model from artifact library"""
-        model_file_name = f"artifacts/{self.data.stock_symbol}/{self.model_name}.sav"
-        self.model = joblib.load(model_file_name)
-
-    def _load_keras(self) -> None:
-        """Load keras estimator from artifact library"""
-        file_directory = f"artifacts/{self.data.stock_symbol}/"
-        TarZip.extract(file_directory + f"{self.model_name}.tar.gz", ".")
-        self.model.best_estimator_.named_steps["model"].model = load_model(file_directory + f"{self.model_name}.h5")
-        os.remove(file_directory + f"{self.model_name}.h5")
+        """Load model & its prediction intervals from artifact library, unless a model was given"""
+        if self.estimator is not None:
+            self.model = self.estimator
+            return
+        artifact = ModelArtifact(self.data.stock_symbol, self.model_name)
+        self.model = artifact.load()
+        self.intervals = self.intervals or ConformalIntervals.from_dict(artifact.metadata().get("intervals"))
 
     @staticmethod
     def _prepare_df(y: DataFrame, pred: DataFrame) -> DataFrame:
@@ -47,75 +83,130 @@ class StockChart:
         df["residuals"] = df["pred"] - df["y"]
         return df
 
+    @staticmethod
+    def predict(estimator: Pipeline, data: StockData) -> np.ndarray:
+        """Predict every row of stock data in one pass over its contiguous feature matrix.
+
+        :param estimator: fitted pipeline
+        :type estimator: Pipeline
+        :param data: stock data to predict
+        :type data: StockData
+        :return: predictions, training rows first
+        :rtype: np.ndarray
+        """
+        return np.asarray(estimator.predict(data.stock_x)).reshape(-1)
+
+    @staticmethod
+    def scores(y: np.ndarray, pred: np.ndarray) -> dict:
+        """Prediction errors.
+
+        :param y: actual values
+        :type y: np.ndarray
+        :param pred: predictions
+        :type pred: np.ndarray
+        :return: rows, root mean squared, mean absolute & mean absolute percentage error
+        :rtype: dict
+        """
+        errors = pred - y
+        return {
+            "rows": len(y),
+            "rmse": float(np.sqrt(np.mean(errors**2))) if len(y) else np.nan,
+            "mae": float(np.mean(np.abs(errors))) if len(y) else np.nan,
+            "mape": float(np.mean(np.abs(errors / y))) if len(y) else np.nan,
+        }
+
     def _inference(self) -> None:
-        """create test inference data"""
-        train_pred = self.model.predict(self.data.stock_x_train)
-        test_pred = self.model.predict(self.data.stock_x_test)
-        self.train_df = self._prepare_df(self.data.stock_y_train, train_pred)
-        self.test_df = self._prepare_df(self.data.stock_y_test, test_pred)
+        """create train & test inference data, with test prediction intervals & their scores"""
+        pred, bounds = ConformalIntervals.predict_bounds(self.model, self.data.stock_x)
+        pred, split = np.asarray(pred).reshape(-1), self.data.split
+        self.train_df = self._prepare_df(self.data.stock_y_train, pred[:split])
+        self.test_df = self._prepare_df(self.data.stock_y_test, pred[split:])
+        self.interval_scores, self.test_intervals = {}, {}
+        if self.intervals is not None:
+            intervals = self.intervals.predict(pred[split:], bounds[split:] if bounds is not None else None)
+            self.test_intervals = intervals
+            self.interval_scores = ConformalIntervals.scores(self.test_df["y"].to_numpy(), intervals)
+
+    def _sample(self, series: Series) -> Series:
+        """Downsample a date indexed series to at most max_points."""
+        return series.iloc[Downsample.minmax(series.to_numpy(), self.max_points)]
+
+    def _line(self, series: Series, name: str) -> go.Scattergl:
+        """Downsampled WebGL line of a date indexed series."""
+        series = self._sample(series)
+        return go.Scattergl(x=series.index, y=series.to_numpy(), mode="lines", name=name)
+
+    @staticmethod
+    def _histogram(values: Series, name: str) -> go.Bar:
+        """Histogram binned with numpy, so only bin counts are written to the report."""
+        values = values.to_numpy()
+        counts, edges = np.histogram(values[np.isfinite(values)], bins="auto")
+        return go.Bar(x=(edges[:-1] + edges[1:]) / 2, y=counts, width=np.diff(edges), name=name)
+
+    def _band(self, index: Index, lower: np.ndarray, upper: np.ndarray, name: str) -> list:
+        """Filled WebGL band between downsampled lower & upper bounds."""
+        lower, upper = self._sample(Series(lower, index=index)), self._sample(Series(upper, index=index))
+        return [
+            go.Scattergl(x=lower.index, y=lower.to_numpy(), mode="lines", line_width=0, showlegend=False, name=name),
+            go.Scattergl(x=upper.index, y=upper.to_numpy(), mode="lines", line_width=0, fill="tonexty", name=name),
+        ]
+
+    def _fitted(self, df: DataFrame, name: str) -> go.Scattergl:
+        """Actual vs predicted WebGL markers, at the downsampled residuals' points."""
+        df = df.loc[self._sample(df["residuals"]).index]
+        return go.Scattergl(x=df["y"], y=df["pred"], mode="markers", name=name)
+
+    @staticmethod
+    def _headless() -> bool:
+        """Return True if there is no display to open a browser on."""
+        if sys.platform in ["darwin", "win32"]:
+            return False
+        return not (os.getenv("DISPLAY") or os.getenv("WAYLAND_DISPLAY"))
+
+    def _include_plotlyjs(self) -> Any:
+        """Return plotly.js reference for write_html, writing the shared local copy if needed."""
+        if self.plotlyjs == "inline":
+            return True
+        if self.plotlyjs == "local":
+            file_name = pathlib.Path("reports/plotly.min.js")
+            if not file_name.exists():
+                file_name.parent.mkdir(parents=True, exist_ok=True)
+                file_name.write_text(get_plotlyjs())
+            return "../plotly.min.js"
+        return "cdn"
 
     def _save_fig(self, fig: Any) -> None:
         """Write and show figure"""
         pathlib.Path(f"reports/{self.data.stock_symbol}/").mkdir(parents=True, exist_ok=True)
-        fig.write_html(f"reports/{self.data.stock_symbol}/{self.model_name}.html")
-        fig.show()
+        fig.write_html(
+            f"reports/{self.data.stock_symbol}/{self.report_name}.html", include_plotlyjs=self._include_plotlyjs()
+        )
+        if self.show and not self._headless():
+            fig.show()
 
     def create_report(self) -> None:
         """Create report"""
         self._load_model()
         self._inference()
 
-        # histogram residual
-        train_histogram = go.Histogram(x=self.train_df["residuals"], name="Train hist. residuals")
-        test_histogram = go.Histogram(x=self.test_df["residuals"], name="Test hist. residuals")
+        train_histogram = self._histogram(self.train_df["residuals"], "Train hist. residuals")
+        test_histogram = self._histogram(self.test_df["residuals"], "Test hist. residuals")
 
-        # scatter residual
-        train_scatter = go.Scatter(
-            x=self.train_df["y"],
-            y=self.train_df["pred"],
-            mode="markers",
-            name="Train fit residuals",
-        )
-        test_scatter = go.Scatter(
-            x=self.test_df["y"],
-            y=self.test_df["pred"],
-            mode="markers",
-            name="Test fit residuals",
-        )
+        train_scatter = self._fitted(self.train_df, "Train fit residuals")
+        test_scatter = self._fitted(self.test_df, "Test fit residuals")
 
-        # timeseries residuals
-        train_timeseries = go.Scatter(
-            x=self.train_df.index,
-            y=self.train_df["residuals"],
-            name="Train timeseries residuals",
-        )
-        test_timeseries = go.Scatter(
-            x=self.test_df.index,
-            y=self.test_df["residuals"],
-            name="Test timeseries residuals",
-        )
+        train_timeseries = self._line(self.train_df["residuals"], "Train timeseries residuals")
+        test_timeseries = self._line(self.test_df["residuals"], "Test timeseries residuals")
 
-        # performance
-        train_performance_y = go.Scatter(
-            x=self.train_df.index,
-            y=self.train_df["y"],
-            name="Train actual closing price",
-        )
-        train_performance_pred = go.Scatter(
-            x=self.train_df.index,
-            y=self.train_df["pred"],
-            name="Train predicted closing price",
-        )
-        test_performance_y = go.Scatter(
-            x=self.test_df.index,
-            y=self.test_df["y"],
-            name="Test actual closing price",
-        )
-        test_performance_pred = go.Scatter(
-            x=self.test_df.index,
-            y=self.test_df["pred"],
-            name="Test predicted closing price",
-        )
+        train_performance_y = self._line(self.train_df["y"], "Train actual closing price")
+        train_performance_pred = self._line(self.train_df["pred"], "Train predicted closing price")
+        test_performance_y = self._line(self.test_df["y"], "Test actual closing price")
+        test_performance_pred = self._line(self.test_df["pred"], "Test predicted closing price")
+
+        test_title = "Closing price: Actual vs Predicted (Test)"
+        for coverage in self.test_intervals:
+            covered, width = self.interval_scores[f"coverage_{coverage:g}"], self.interval_scores[f"width_{coverage:g}"]
+            test_title += f", {coverage:.0%} interval: {covered:.0%} coverage, {width:.2f} width"
 
         fig = make_subplots(
             rows=5,
@@ -124,7 +215,7 @@ class StockChart:
             specs=[[{"colspan": 2}, None], [{"colspan": 2}, None], [{}, {}], [{}, {}], [{}, {}]],
             subplot_titles=(
                 "Closing price: Actual vs Predicted (Train)",
-                "Closing price: Actual vs Predicted (Test)",
+                test_title,
                 "Training Residuals Histogram",
                 "Testing Residuals Histogram",
                 "Training Fitted Residuals",
@@ -137,6 +228,10 @@ class StockChart:
         fig.add_trace(train_performance_y, row=1, col=1)
         fig.add_trace(train_performance_pred, row=1, col=1)
 
+        # widest interval first, so narrower bands are filled over it
+        for coverage, (lower, upper) in sorted(self.test_intervals.items(), reverse=True):
+            for trace in self._band(self.test_df.index, lower, upper, f"Test {coverage:.0%} prediction interval"):
+                fig.add_trace(trace, row=2, col=1)
         fig.add_trace(test_performance_y, row=2, col=1)
         fig.add_trace(test_performance_pred, row=2, col=1)
 
@@ -0,0 +1,108 @@
+from data import StockData
+from pandas import DataFrame, Series
+from plotly.subplots import make_subplots
+from reporting.chart import StockChart
+import plotly.graph_objects as go
+
+
+class ComparisonReport(StockChart):
+
+    """One page comparing every model's predictions of a symbol.
+
+    The actual closing price is plotted once and shared by every model's predicted
+    price, residual & histogram traces, with a table of each model's train & test
+    errors, also written as csv.
+    """
+
+    def __init__(
+        self,
+        data: StockData,
+        predictions: dict,
+        show: bool = False,
+        report_name: str = "comparison",
+        max_points: int = None,
+        plotlyjs: str = None,
+    ) -> None:
+        """Comparison report initialiser
+
+        :param data: stock data the models were trained on, only its closing price & split are used
+        :type data: StockData
+        :param predictions: predictions of every row of data by model name
+        :type predictions: dict
+        :param show: open the report in a browser, if there is a display, defaults to False
+        :type show: bool, optional
+        :param report_name: report file name, defaults to "comparison"
+        :type report_name: str, optional
+        :param max_points: most points plotted per series, 0 for all, defaults to REPORT_MAX_POINTS or 2000
+        :type max_points: int, optional
+        :param plotlyjs: plotly.js reference, "cdn", "local" or "inline", defaults to REPORT_PLOTLYJS or "cdn"
+        :type plotlyjs: str, optional
+        """
+        super().__init__("comparison", data, show, None, report_name, max_points, plotlyjs)
+        self.predictions = predictions
+
+    def _scores(self) -> DataFrame:
+        """Train & test errors of every model."""
+        y, split = self.data.stock_y.to_numpy(), self.data.split
+        scores = {}
+        for model_name, pred in self.predictions.items():
+            train, test = self.scores(y[:split], pred[:split]), self.scores(y[split:], pred[split:])
+            scores[model_name] = {
+                **{f"train_{name}": value for name, value in train.items()},
+                **{f"test_{name}": value for name, value in test.items()},
+            }
+        return DataFrame.from_dict(scores, orient="index").rename_axis("model")
+
+    def create_report(self) -> DataFrame:
+        """Write the comparison page & the models' errors.
+
+        :return: train & test errors by model
+        :rtype: DataFrame
+        """
+        y, split = self.data.stock_y, self.data.split
+        scores = self._scores()
+
+        fig = make_subplots(
+            rows=4,
+            cols=1,
+            vertical_spacing=0.05,
+            specs=[[{}], [{}], [{}], [{"type": "table"}]],
+            subplot_titles=(
+                "Closing price: Actual vs Predicted",
+                "Residuals over Time",
+                "Testing Residuals Histogram",
+                "Errors",
+            ),
+        )
+        fig.add_trace(self._line(y, "Actual closing price"), row=1, col=1)
+        for model_name, pred in self.predictions.items():
+            pred = Series(pred, index=y.index)
+            residuals = pred - y
+            fig.add_trace(self._line(pred, f"{model_name} predicted closing price"), row=1, col=1)
+            fig.add_trace(self._line(residuals, f"{model_name} residuals"), row=2, col=1)
+            fig.add_trace(self._histogram(residuals.iloc[split:], f"{model_name} test hist. residuals"), row=3, col=1)
+        if split < len(y):
+            # start of the test period
+            for row in [1, 2]:
+                fig.add_vline(x=y.index[split], line_dash="dash", row=row, col=1)
+
+        table = scores.reset_index()
+        fig.add_trace(
+            go.Table(
+                header=dict(values=list(table.columns)),
+                cells=dict(values=[table[col].round(4) if col != "model" else table[col] for col in table.columns]),
+            ),
+            row=4,
+            col=1,
+        )
+
+        title = f"<b>{self.data.stock_symbol}: {', '.join(self.predictions)}</b>"
+        fig.update_layout(height=2000, width=1600, template="plotly_dark", title_text=title, barmode="overlay")
+        fig.update_traces(opacity=0.6, selector=dict(type="bar"))
+        self._save_fig(fig)
+        scores.to_csv(f"reports/{self.data.stock_symbol}/{self.report_name}.csv")
+        return scores
+
+
+if __name__ == "__main__":
+    pass
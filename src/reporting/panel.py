@@ -0,0 +1,70 @@
+from data import PanelData
+from pandas import DataFrame
+from models import ConformalIntervals
+from sklearn.pipeline import Pipeline
+from pipeline.artifacts import ModelArtifact
+from reporting.chart import StockChart
+import pathlib
+
+
+class PanelReport:
+
+    """Per symbol evaluation & reports of a model trained on a panel of symbols."""
+
+    def __init__(
+        self,
+        model_name: str,
+        data: PanelData,
+        show: bool = False,
+        estimator: Pipeline = None,
+        intervals: ConformalIntervals = None,
+    ) -> None:
+        """Panel report initialiser
+
+        :param model_name: name of model trained on the panel
+        :type model_name: str
+        :param data: panel the model was trained on
+        :type data: PanelData
+        :param show: show every symbol's report, defaults to False
+        :type show: bool, optional
+        :param estimator: fitted pipeline, defaults to loading it from the artifact library
+        :type estimator: Pipeline, optional
+        :param intervals: calibrated prediction intervals of the estimator, defaults to those saved with the
+            model if it is loaded from the artifact library
+        :type intervals: ConformalIntervals, optional
+        """
+        self.model_name = model_name
+        self.data = data
+        self.show = show
+        self.estimator = estimator
+        self.intervals = intervals
+
+    def create_report(self) -> DataFrame:
+        """Write every symbol's report & the panel's per symbol test scores.
+
+        :return: test scores by symbol
+        :rtype: DataFrame
+        """
+        estimator, intervals = self.estimator, self.intervals
+        if estimator is None:
+            artifact = ModelArtifact(self.data.stock_symbol, self.model_name)
+            estimator = artifact.load()
+            intervals = intervals or ConformalIntervals.from_dict(artifact.metadata().get("intervals"))
+        scores = {}
+        for symbol in self.data.stock_symbols:
+            report_name = f"{self.model_name}_{self.data.stock_symbol}"
+            chart = StockChart(
+                self.model_name, self.data.member(symbol), self.show, estimator, report_name, intervals=intervals
+            )
+            chart.create_report()
+            test_scores = chart.scores(chart.test_df["y"].to_numpy(), chart.test_df["pred"].to_numpy())
+            scores[symbol] = {**test_scores, **chart.interval_scores}
+
+        df = DataFrame.from_dict(scores, orient="index").rename_axis("symbol")
+        pathlib.Path(f"reports/{self.data.stock_symbol}/").mkdir(parents=True, exist_ok=True)
+        df.to_csv(f"reports/{self.data.stock_symbol}/{self.model_name}_evaluation.csv")
+        return df
+
+
+if __name__ == "__main__":
+    pass
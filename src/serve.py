@@ -0,0 +1,24 @@
+from main import StockPricePrediction
+from serving import PredictionServer
+import os
+
+
+if __name__ == "__main__":
+
+    StockPricePrediction.load_env_vars()
+
+    server = PredictionServer(
+        host=os.getenv("SERVE_HOST", "127.0.0.1"),
+        port=int(os.getenv("SERVE_PORT", 8000)),
+        cache_size=int(os.getenv("SERVE_CACHE_SIZE", 32)),
+        max_batch=int(os.getenv("SERVE_MAX_BATCH", 256)),
+        max_wait=float(os.getenv("SERVE_MAX_WAIT_MS", 2)) / 1000,
+        predict_timeout=float(os.getenv("SERVE_TIMEOUT", 30)),
+    )
+    server.logger.info(f"serving predictions on {server.server_address[0]}:{server.server_address[1]}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
@@ -0,0 +1,4 @@
+from serving.server import PredictionServer
+from serving.cache import ModelCache, ServedModel
+from serving.batcher import MicroBatcher
+from serving.metrics import LatencyMetrics
@@ -0,0 +1,112 @@
+from concurrent.futures import Future
+from typing import Callable
+from pandas import DataFrame
+from queue import Empty, Queue
+from threading import Event, Lock, Thread
+from time import monotonic
+import pandas as pd
+import numpy as np
+
+
+class MicroBatcher:
+
+    """Merge concurrent prediction requests for one model into single predict calls.
+
+    Requests queue up on a worker thread, which waits at most max_wait seconds for
+    more requests after the first arrives, predicts every queued row at once and
+    hands each request its slice of the predictions. Once closed, no more requests
+    are taken.
+    """
+
+    def __init__(
+        self,
+        predict: Callable[[DataFrame], np.ndarray],
+        max_batch: int = 256,
+        max_wait: float = 0.002,
+        on_batch: Callable[[int], None] = None,
+    ) -> None:
+        """Micro batcher initialiser.
+
+        :param predict: model predict function
+        :type predict: Callable[[DataFrame], np.ndarray]
+        :param max_batch: most rows to predict in one call, defaults to 256
+        :type max_batch: int, optional
+        :param max_wait: seconds to wait for more requests once one is queued, defaults to 0.002
+        :type max_wait: float, optional
+        :param on_batch: called with the rows of every predict call, defaults to None
+        :type on_batch: Callable[[int], None], optional
+        """
+        self.predict = predict
+        self.max_batch = max_batch
+        self.max_wait = max_wait
+        self.on_batch = on_batch
+        self.queue = Queue()
+        self.lock = Lock()
+        self.closed = False
+        self.stopped = Event()
+        self.thread = Thread(target=self._run, daemon=True)
+        self.thread.start()
+
+    def submit(self, x: DataFrame) -> Future:
+        """Queue rows for prediction.
+
+        :param x: feature rows to predict
+        :type x: DataFrame
+        :raises RuntimeError: if the batcher is closed, its requests no longer being predicted
+        :return: future of the rows' predictions
+        :rtype: Future
+        """
+        future = Future()
+        with self.lock:
+            if self.closed:
+                raise RuntimeError("micro batcher is closed")
+            self.queue.put((x, future))
+        return future
+
+    def _collect(self) -> list:
+        """Block for a request, then gather more until the batch is full or max_wait passes."""
+        try:
+            batch = [self.queue.get(timeout=0.1)]
+        except Empty:
+            return []
+        rows, deadline = len(batch[0][0]), monotonic() + self.max_wait
+        while rows < self.max_batch:
+            try:
+                request = self.queue.get(timeout=max(0, deadline - monotonic()))
+            except Empty:
+                break
+            batch.append(request)
+            rows += len(request[0])
+        return batch
+
+    def _run(self) -> None:
+        """Predict queued requests until closed."""
+        while not self.stopped.is_set():
+            batch = self._collect()
+            if not batch:
+                continue
+            frames, futures = zip(*batch)
+            try:
+                predictions = np.asarray(self.predict(pd.concat(frames) if len(frames) > 1 else frames[0]))
+            except Exception as e:
+                for future in futures:
+                    future.set_exception(e)
+                continue
+            if self.on_batch:
+                self.on_batch(len(predictions))
+            splits = np.cumsum([len(frame) for frame in frames])[:-1]
+            for future, prediction in zip(futures, np.split(predictions.reshape(-1), splits)):
+                future.set_result(prediction)
+
+    def close(self) -> None:
+        """Stop taking requests & stop the worker thread once queued requests are predicted."""
+        with self.lock:
+            self.closed = True
+        while not self.queue.empty() and self.thread.is_alive():
+            self.stopped.wait(0.01)
+        self.stopped.set()
+        self.thread.join()
+
+
+if __name__ == "__main__":
+    pass
@@ -0,0 +1,199 @@
+from collections import OrderedDict
+from pandas import DataFrame
+from threading import Lock
+from pipeline.artifacts import ModelArtifact
+from serving.batcher import MicroBatcher
+from serving.metrics import LatencyMetrics
+import pandas as pd
+import numpy as np
+
+
+class ServedModel:
+
+    """Trained symbol & model pipeline loaded once and kept warm for prediction."""
+
+    def __init__(
+        self,
+        stock_symbol: str,
+        model_name: str,
+        metrics: LatencyMetrics = None,
+        max_batch: int = 256,
+        max_wait: float = 0.002,
+    ) -> None:
+        """Served model initialiser, loading the model from the artifact library.
+
+        :param stock_symbol: symbol the model was trained on
+        :type stock_symbol: str
+        :param model_name: name of trained model
+        :type model_name: str
+        :param metrics: metrics to record predict calls in, defaults to None
+        :type metrics: LatencyMetrics, optional
+        :param max_batch: most rows to predict in one call, defaults to 256
+        :type max_batch: int, optional
+        :param max_wait: seconds to wait for concurrent requests to batch, defaults to 0.002
+        :type max_wait: float, optional
+        """
+        self.stock_symbol = stock_symbol
+        self.model_name = model_name
+        # requests holding the model & whether it was evicted, kept by ModelCache
+        self.users, self.evicted = 0, False
+        artifact = ModelArtifact(stock_symbol, model_name)
+        self.x_columns = artifact.metadata().get("x_columns")
+        self.estimator = artifact.load()
+        self.lookback = getattr(self.estimator[-1], "lookback", 1)
+        self._warm_up()
+        # rows of a request are a time ordered series to models reading lookback windows, so requests aren't merged
+        if self.lookback > 1:
+            max_batch = 1
+        self.batcher = MicroBatcher(
+            self.estimator.predict, max_batch, max_wait, metrics.record_batch if metrics else None
+        )
+
+    def _warm_up(self) -> None:
+        """Predict one row so lazily built graphs are ready before the first request."""
+        if self.x_columns:
+            self.estimator.predict(DataFrame(0, index=[0], columns=self.x_columns, dtype=np.float32))
+
+    def context(self, request: dict) -> list:
+        """Return a request's context, the feature records preceding its rows, read by lookback models only.
+
+        :param request: prediction request, with rows & optional context records
+        :type request: dict
+        :return: context records to predict ahead of the rows, their predictions being dropped
+        :rtype: list
+        """
+        return list(request.get("context", [])) if self.lookback > 1 else []
+
+    def features(self, rows: list) -> DataFrame:
+        """Build model features from request rows.
+
+        :param rows: feature records, with raw or one hot encoded day columns
+        :type rows: list
+        :return: features aligned with those the model was trained on
+        :rtype: DataFrame
+        """
+        x = DataFrame.from_records(rows)
+        if self.model_name not in ["xgboost"]:
+            day_cols = [col for col in ["day_of_year", "day_of_month", "day_of_week"] if col in x]
+            x = pd.get_dummies(x.astype({col: int for col in day_cols}), columns=day_cols, prefix=day_cols)
+        if self.x_columns:
+            x = x.reindex(columns=self.x_columns, fill_value=0)
+        return x
+
+    def close(self) -> None:
+        """Stop batching requests."""
+        self.batcher.close()
+
+
+class ModelCache:
+
+    """Least recently used cache of served models.
+
+    Models are counted in use from get until release, and an evicted model still
+    in use is only closed once its last user releases it.
+    """
+
+    def __init__(
+        self, capacity: int = 32, metrics: LatencyMetrics = None, max_batch: int = 256, max_wait: float = 0.002
+    ) -> None:
+        """Model cache initialiser.
+
+        :param capacity: most models to keep loaded, defaults to 32
+        :type capacity: int, optional
+        :param metrics: metrics to record predict calls in, defaults to None
+        :type metrics: LatencyMetrics, optional
+        :param max_batch: most rows to predict in one call, defaults to 256
+        :type max_batch: int, optional
+        :param max_wait: seconds to wait for concurrent requests to batch, defaults to 0.002
+        :type max_wait: float, optional
+        """
+        self.capacity = capacity
+        self.metrics = metrics
+        self.max_batch = max_batch
+        self.max_wait = max_wait
+        self.models = OrderedDict()
+        self.loading = {}
+        self.lock = Lock()
+        self.hits, self.misses, self.evictions = 0, 0, 0
+
+    def get(self, stock_symbol: str, model_name: str) -> ServedModel:
+        """Return a served model, loading it from the artifact library on first use.
+
+        The model is in use until released with release.
+
+        :param stock_symbol: symbol the model was trained on
+        :type stock_symbol: str
+        :param model_name: name of trained model
+        :type model_name: str
+        :return: loaded model
+        :rtype: ServedModel
+        """
+        key = (stock_symbol, model_name)
+        with self.lock:
+            if key in self.models:
+                self.hits += 1
+                self.models.move_to_end(key)
+                self.models[key].users += 1
+                return self.models[key]
+            load_lock = self.loading.setdefault(key, Lock())
+
+        # concurrent first requests for a model wait on one load rather than each loading it
+        with load_lock:
+            with self.lock:
+                if key in self.models:
+                    self.hits += 1
+                    self.models[key].users += 1
+                    return self.models[key]
+                self.misses += 1
+            model = ServedModel(stock_symbol, model_name, self.metrics, self.max_batch, self.max_wait)
+            with self.lock:
+                model.users += 1
+                self.models[key] = model
+                self.loading.pop(key, None)
+                evicted = []
+                while len(self.models) > self.capacity:
+                    old_model = self.models.popitem(last=False)[1]
+                    old_model.evicted = True
+                    self.evictions += 1
+                    if not old_model.users:
+                        evicted.append(old_model)
+        for old_model in evicted:
+            old_model.close()
+        return model
+
+    def release(self, model: ServedModel) -> None:
+        """Stop using a model returned by get, closing it if it was evicted & this was its last user.
+
+        :param model: model returned by get
+        :type model: ServedModel
+        """
+        with self.lock:
+            model.users -= 1
+            closing = model.evicted and not model.users
+        if closing:
+            model.close()
+
+    def summary(self) -> dict:
+        """Summarise cache usage.
+
+        :return: loaded models, hits, misses & evictions
+        :rtype: dict
+        """
+        with self.lock:
+            return {
+                "loaded": [f"{symbol}/{model}" for symbol, model in self.models],
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+            }
+
+    def close(self) -> None:
+        """Stop batching requests for every loaded model."""
+        with self.lock:
+            models, self.models = list(self.models.values()), OrderedDict()
+        for model in models:
+            model.close()
+
+
+if __name__ == "__main__":
+    pass
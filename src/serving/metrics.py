@@ -0,0 +1,62 @@
+from collections import deque
+from threading import Lock
+import numpy as np
+
+
+class LatencyMetrics:
+
+    """Rolling request latency & batch size percentiles."""
+
+    def __init__(self, window: int = 10000) -> None:
+        """Latency metrics initialiser.
+
+        :param window: most recent observations to summarise, defaults to 10000
+        :type window: int, optional
+        """
+        self.latencies = deque(maxlen=window)
+        self.batch_sizes = deque(maxlen=window)
+        self.requests, self.batches, self.errors = 0, 0, 0
+        self.lock = Lock()
+
+    def record_request(self, seconds: float, error: bool = False) -> None:
+        """Record one request's latency.
+
+        :param seconds: time from request received to response ready
+        :type seconds: float
+        :param error: request failed, defaults to False
+        :type error: bool, optional
+        """
+        with self.lock:
+            self.latencies.append(seconds)
+            self.requests += 1
+            self.errors += error
+
+    def record_batch(self, rows: int) -> None:
+        """Record one model predict call.
+
+        :param rows: rows predicted in the call
+        :type rows: int
+        """
+        with self.lock:
+            self.batch_sizes.append(rows)
+            self.batches += 1
+
+    def summary(self) -> dict:
+        """Summarise requests, batches & latency percentiles.
+
+        :return: counts, p50 & p99 latency in milliseconds and mean batch size
+        :rtype: dict
+        """
+        with self.lock:
+            latencies, batch_sizes = np.array(self.latencies), np.array(self.batch_sizes)
+            summary = {"requests": self.requests, "errors": self.errors, "batches": self.batches}
+        if len(latencies):
+            p50, p99 = np.percentile(latencies, [50, 99]) * 1000
+            summary.update({"p50_ms": float(p50), "p99_ms": float(p99)})
+        if len(batch_sizes):
+            summary["mean_batch_rows"] = float(batch_sizes.mean())
+        return summary
+
+
+if __name__ == "__main__":
+    pass
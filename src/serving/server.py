@@ -0,0 +1,125 @@
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from concurrent.futures import TimeoutError
+from serving.cache import ModelCache
+from serving.metrics import LatencyMetrics
+from common import Log
+from time import perf_counter
+import json
+
+
+class PredictionHandler(BaseHTTPRequestHandler):
+
+    """HTTP handler for prediction, metrics & health requests.
+
+    POST /predict takes {"symbol", "model", "rows": [feature records]}, or a list of
+    them, and returns the predictions of each. Every request for one model queued at
+    the same time is predicted in a single call. Requests to models over lookback
+    windows may add "context": [feature records] preceding the rows, which their
+    windows read but which are not predicted.
+    """
+
+    server: "PredictionServer"
+
+    def _send(self, status: int, body) -> None:
+        """Write a json response."""
+        payload = json.dumps(body).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def do_GET(self) -> None:
+        if self.path == "/health":
+            self._send(200, {"status": "ok"})
+        elif self.path == "/metrics":
+            self._send(200, {**self.server.metrics.summary(), "cache": self.server.cache.summary()})
+        else:
+            self._send(404, {"error": f"unknown path {self.path}"})
+
+    def do_POST(self) -> None:
+        if self.path != "/predict":
+            self._send(404, {"error": f"unknown path {self.path}"})
+            return
+        start, status, models = perf_counter(), 200, []
+        try:
+            body = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))))
+            requests = body if isinstance(body, list) else [body]
+            # submit every request before waiting so each model batches all of them together
+            futures = []
+            for request in requests:
+                model = self.server.cache.get(request["symbol"], request["model"])
+                models.append(model)
+                context = model.context(request)
+                futures.append((len(context), model.batcher.submit(model.features(context + request["rows"]))))
+            responses = [
+                {
+                    "symbol": request["symbol"],
+                    "model": request["model"],
+                    "predictions": future.result(self.server.predict_timeout)[n_context:].tolist(),
+                }
+                for request, (n_context, future) in zip(requests, futures)
+            ]
+            response = responses if isinstance(body, list) else responses[0]
+        except TimeoutError:
+            status, response = 504, {"error": f"no prediction within {self.server.predict_timeout}s"}
+        except FileNotFoundError as e:
+            status, response = 404, {"error": f"no trained model: {e.filename}"}
+        except (KeyError, TypeError, ValueError) as e:
+            status, response = 400, {"error": repr(e)}
+        except Exception as e:
+            self.server.logger.exception("prediction failed")
+            status, response = 500, {"error": repr(e)}
+        finally:
+            for model in models:
+                self.server.cache.release(model)
+        self._send(status, response)
+        self.server.metrics.record_request(perf_counter() - start, status != 200)
+
+    def log_message(self, format: str, *args) -> None:
+        self.server.logger.debug(format % args)
+
+
+class PredictionServer(ThreadingHTTPServer):
+
+    """Long running prediction server keeping trained models loaded between requests."""
+
+    daemon_threads = True
+
+    def __init__(
+        self,
+        host: str = "127.0.0.1",
+        port: int = 8000,
+        cache_size: int = 32,
+        max_batch: int = 256,
+        max_wait: float = 0.002,
+        predict_timeout: float = 30.0,
+    ) -> None:
+        """Prediction server initialiser.
+
+        :param host: address to listen on, defaults to 127.0.0.1
+        :type host: str, optional
+        :param port: port to listen on, defaults to 8000
+        :type port: int, optional
+        :param cache_size: most models to keep loaded, defaults to 32
+        :type cache_size: int, optional
+        :param max_batch: most rows to predict in one call, defaults to 256
+        :type max_batch: int, optional
+        :param max_wait: seconds to wait for concurrent requests to batch, defaults to 0.002
+        :type max_wait: float, optional
+        :param predict_timeout: seconds to wait for a request's predictions, defaults to 30.0
+        :type predict_timeout: float, optional
+        """
+        super().__init__((host, port), PredictionHandler)
+        self.predict_timeout = predict_timeout
+        self.logger = Log.set_logger("stock prediction: server")
+        self.metrics = LatencyMetrics()
+        self.cache = ModelCache(cache_size, self.metrics, max_batch, max_wait)
+
+    def server_close(self) -> None:
+        super().server_close()
+        self.cache.close()
+
+
+if __name__ == "__main__":
+    pass
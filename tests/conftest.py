@@ -0,0 +1,5 @@
+import pathlib
+import sys
+
+# modules import each other from src, as when run with python src/<entrypoint>.py
+sys.path.insert(0, str(pathlib.Path(__file__).resolve().parents[1] / "src"))
@@ -0,0 +1,120 @@
+from concurrent.futures import ThreadPoolExecutor
+from pipeline.artifacts import ModelArtifact
+from models.transformers import StandardScalerNumericColsOnly
+from models.xgboost import XGB
+from sklearn.pipeline import Pipeline
+from xgboost import XGBRegressor
+import pandas as pd
+import numpy as np
+import pytest
+
+
+@pytest.fixture
+def data():
+    rng = np.random.default_rng(0)
+    x = pd.DataFrame(rng.normal(size=(200, 3)), columns=["close_lag_1", "close_sma_5", "day_of_week"])
+    y = pd.Series(x.sum(axis=1) + rng.normal(scale=0.1, size=200), name="close")
+    return x, y
+
+
+def test_round_trip_without_preprocessing(data, tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    x, y = data
+    estimator = Pipeline([("preprocessing", XGB.preprocess()), ("model", XGBRegressor(n_estimators=10))]).fit(x, y)
+
+    ModelArtifact("TEST", "xgboost").save(estimator, {"params": {}})
+    loaded = ModelArtifact("TEST", "xgboost").load()
+
+    assert [name for name, _ in loaded.steps] == ["preprocessing", "model"]
+    np.testing.assert_allclose(loaded.predict(x), estimator.predict(x), rtol=1e-6)
+
+
+def test_loaded_model_warm_starts(data, tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    x, y = data
+    estimator = Pipeline([("preprocessing", XGB.preprocess()), ("model", XGBRegressor(n_estimators=10))]).fit(x, y)
+    ModelArtifact("TEST", "xgboost").save(estimator, {"params": {}})
+    loaded = ModelArtifact("TEST", "xgboost").load()
+
+    XGB.warm_start(loaded, x, y, 5)
+
+    assert loaded.named_steps["model"].get_booster().num_boosted_rounds() == 15
+
+
+def test_preprocess_round_trip(data, tmp_path):
+    x, _ = data
+    preprocess = Pipeline([("scaler", StandardScalerNumericColsOnly())]).fit(x)
+
+    state = ModelArtifact._save_preprocess(preprocess, tmp_path)
+    loaded = ModelArtifact._load_preprocess(Pipeline([("scaler", StandardScalerNumericColsOnly())]), state, tmp_path)
+
+    np.testing.assert_allclose(loaded.transform(x), preprocess.transform(x))
+
+
+def test_concurrent_metadata_writes_leave_valid_manifest(data, tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    x, y = data
+    estimator = Pipeline([("preprocessing", XGB.preprocess()), ("model", XGBRegressor(n_estimators=10))]).fit(x, y)
+    ModelArtifact("TEST", "xgboost").save(estimator, {"params": {}})
+    columns = {f"column_{i}": list(range(2000)) for i in range(20)}
+
+    with ThreadPoolExecutor(8) as executor:
+        list(executor.map(lambda i: ModelArtifact("TEST", "xgboost").save_metadata({"run": i, **columns}), range(32)))
+
+    assert ModelArtifact("TEST", "xgboost").metadata()["run"] in range(32)
+    assert not list(tmp_path.glob("artifacts/**/*.tmp"))
+
+
+def test_loads_never_miss_a_model_being_replaced(data, tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    x, y = data
+    estimator = Pipeline([("preprocessing", XGB.preprocess()), ("model", XGBRegressor(n_estimators=10))]).fit(x, y)
+    ModelArtifact("TEST", "xgboost").save(estimator, {"params": {}})
+
+    def save(i):
+        ModelArtifact("TEST", "xgboost").save(estimator, {"params": {}, "run": i})
+
+    def load(i):
+        ModelArtifact("TEST", "xgboost").load().predict(x)
+
+    with ThreadPoolExecutor(8) as executor:
+        futures = [executor.submit(save if i % 4 == 0 else load, i) for i in range(64)]
+        [future.result() for future in futures]
+    save(64)
+
+    versions = list((tmp_path / "artifacts/TEST/xgboost").glob("version-*[!k]"))
+    assert len(versions) == 1
+    assert ModelArtifact("TEST", "xgboost").metadata()["run"] == 64
+
+
+def test_unversioned_model_loads_until_replaced(data, tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    x, y = data
+    estimator = Pipeline([("preprocessing", XGB.preprocess()), ("model", XGBRegressor(n_estimators=10))]).fit(x, y)
+    artifact = ModelArtifact("TEST", "xgboost")
+    artifact.save(estimator, {"params": {}})
+    model_directory = tmp_path / "artifacts/TEST/xgboost"
+    version = (model_directory / "current").read_text()
+    for path in (model_directory / version).iterdir():
+        path.rename(model_directory / path.name)
+    (model_directory / "current").unlink()
+
+    assert not artifact.legacy()
+    np.testing.assert_allclose(artifact.load().predict(x), estimator.predict(x), rtol=1e-6)
+    artifact.save(estimator, {"params": {}})
+    assert not (model_directory / "manifest.json").exists()
+    np.testing.assert_allclose(artifact.load().predict(x), estimator.predict(x), rtol=1e-6)
+
+
+def test_concurrent_search_checkpoints_leave_valid_history(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    history = {"dimensions": ["model__max_depth"], "x_iters": [[i] for i in range(5000)], "func_vals": [0.0] * 5000}
+
+    def save(i):
+        ModelArtifact("TEST", "xgboost").save_search_history({**history, "run": i})
+
+    with ThreadPoolExecutor(8) as executor:
+        list(executor.map(save, range(32)))
+
+    assert ModelArtifact("TEST", "xgboost").search_history()["run"] in range(32)
+    assert not list(tmp_path.glob("artifacts/**/*.tmp"))
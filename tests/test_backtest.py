@@ -0,0 +1,38 @@
+from data import FeatureState, FeatureStore, PriceStore, StockData
+from benchmarks.synthetic import SyntheticFetcher
+from pipeline.backtest import WalkForwardBacktest
+import numpy as np
+
+
+class LaterFetcher(SyntheticFetcher):
+
+    """Synthetic fetcher whose prices after a date are different."""
+
+    def __init__(self, after):
+        super().__init__()
+        self.after = after
+
+    def __call__(self, symbol, start, end):
+        df = super().__call__(symbol, start, end)
+        df.loc[df.index > self.after, ["Open", "High", "Low", "Close", "Adj Close"]] *= 1.5
+        return df
+
+
+def test_refit_features_ignore_later_prices(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    data = StockData("SYN", 3, PriceStore("prices", SyntheticFetcher()), FeatureStore("features"))
+    origin = 300
+    fetcher = LaterFetcher(data.index[origin])
+    later = StockData("SYN", 3, PriceStore("later_prices", fetcher), FeatureStore("later_features"))
+    assert data.ses_alphas["close_ses_None"] != later.ses_alphas["close_ses_None"]
+
+    states = []
+    for stock_data in [data, later]:
+        backtest = WalkForwardBacktest("xgboost", stock_data, params={}, min_train_rows=200, max_workers=1)
+        refit_data = backtest._refit_data(origin)
+        states.append((refit_data.matrix[: origin + 1], FeatureState.from_data(refit_data, [origin])))
+
+    (rows, state), (later_rows, later_state) = states
+    np.testing.assert_array_equal(rows, later_rows)
+    np.testing.assert_array_equal(state.levels, later_state.levels)
+    np.testing.assert_array_equal(state.alphas, later_state.alphas)
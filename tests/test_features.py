@@ -0,0 +1,19 @@
+from data.features import FeatureEngineering, FeatureSpec
+import pandas as pd
+import numpy as np
+import pathlib
+
+# closes & price features written by the pandas rolling & statsmodels SimpleExpSmoothing implementation
+# that FeatureEngineering vectorised, smoothing seeded with the first close as its default did
+REFERENCE = pathlib.Path(__file__).parent / "data" / "features_reference.csv"
+
+
+def test_price_features_match_reference():
+    reference = pd.read_csv(REFERENCE, index_col="Date", parse_dates=True)
+    columns = FeatureSpec().columns()
+
+    features = FeatureEngineering.build_features(reference[["Close"]])
+
+    assert list(reference.columns[1:]) == columns
+    assert features.index.equals(reference.dropna().index)
+    np.testing.assert_allclose(features[columns], reference.loc[features.index, columns], rtol=1e-6)
@@ -0,0 +1,28 @@
+from data import FeatureState, FeatureStore, PriceStore, StockData
+from benchmarks.synthetic import SyntheticFetcher
+from pipeline.artifacts import ModelArtifact
+from pipeline.forecast import ModelForecast, RecursiveForecaster
+from sklearn.pipeline import Pipeline
+from xgboost import XGBRegressor
+import numpy as np
+
+
+def test_symbol_models_forecast_together_as_one_at_a_time(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    price_store, feature_store = PriceStore("prices", SyntheticFetcher()), FeatureStore("features")
+    symbols, expected = ["SYN2", "SYN0", "SYN1"], {}
+    for i, symbol in enumerate(symbols):
+        data = StockData(symbol, 2, price_store, feature_store)
+        model = XGBRegressor(n_estimators=10 + i, max_depth=3)
+        estimator = Pipeline([("preprocessing", None), ("model", model)]).fit(data.stock_x, data.stock_y)
+        metadata = {"params": {}, "data_start": data.stock_start.isoformat(), "x_columns": list(data.get_x_cols())}
+        ModelArtifact(symbol, "xgboost").save(estimator, metadata)
+        state = FeatureState.from_data(data, [len(data.index) - 1])
+        expected[symbol] = RecursiveForecaster(estimator, data.columns[1:]).forecast(state, 5)[0]
+
+    forecasts = ModelForecast("xgboost", 2, price_store=price_store, feature_store=feature_store).forecast(symbols, 5)
+
+    assert list(forecasts["symbol"].unique()) == symbols
+    for symbol in symbols:
+        symbol_forecasts = forecasts.loc[forecasts["symbol"] == symbol, "forecast"]
+        np.testing.assert_allclose(symbol_forecasts, expected[symbol], rtol=1e-6)
@@ -0,0 +1,138 @@
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import parse_qs, urlparse
+from datetime import date
+from threading import Lock, Thread
+from time import monotonic
+from data import ChartFetcher, PriceIngestion, PriceStore
+import requests
+import pytest
+import json
+
+
+class StubChartHandler(BaseHTTPRequestHandler):
+
+    """Answer chart requests with each symbol's scripted statuses, then with daily bars."""
+
+    server: "StubChartAPI"
+
+    def do_GET(self) -> None:
+        url = urlparse(self.path)
+        symbol, params = url.path.rsplit("/", 1)[-1], parse_qs(url.query)
+        with self.server.lock:
+            self.server.requests.append((symbol, monotonic()))
+            script = self.server.script.get(symbol, [])
+            status, headers = script.pop(0) if script else (200, {})
+        body = self.server.chart(int(params["period1"][0]), int(params["period2"][0])) if status == 200 else {}
+        payload = json.dumps(body).encode()
+        self.send_response(status)
+        for header, value in headers.items():
+            self.send_header(header, value)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def log_message(self, format: str, *args) -> None:
+        pass
+
+
+class StubChartAPI(ThreadingHTTPServer):
+
+    """Local chart API recording the time of every request."""
+
+    daemon_threads = True
+
+    def __init__(self) -> None:
+        super().__init__(("127.0.0.1", 0), StubChartHandler)
+        self.url = f"http://127.0.0.1:{self.server_address[1]}"
+        self.script, self.requests, self.lock = {}, [], Lock()
+
+    @staticmethod
+    def chart(period1: int, period2: int) -> dict:
+        """Chart response with a bar at 3pm of every day in [period1, period2)."""
+        timestamps = list(range(period1 + 15 * 3600, period2, 86400))
+        closes = [100.0 + i for i in range(len(timestamps))]
+        quote = {"open": closes, "high": closes, "low": closes, "close": closes, "volume": [1000] * len(closes)}
+        result = {"meta": {"gmtoffset": 0}, "timestamp": timestamps, "indicators": {"quote": [quote]}}
+        return {"chart": {"result": [result]}}
+
+    def count(self, symbol: str) -> int:
+        return sum(requested == symbol for requested, _ in self.requests)
+
+
+@pytest.fixture
+def api():
+    server = StubChartAPI()
+    Thread(target=server.serve_forever, kwargs={"poll_interval": 0.05}, daemon=True).start()
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+def test_parses_bars(api):
+    df = ChartFetcher(api.url, rate_limit=0)("AAA", date(2021, 1, 4), date(2021, 1, 9))
+
+    assert list(df.index.strftime("%Y-%m-%d")) == ["2021-01-04", "2021-01-05", "2021-01-06", "2021-01-07", "2021-01-08"]
+    assert df["Close"].tolist() == [100.0, 101.0, 102.0, 103.0, 104.0]
+
+
+def test_retries_server_errors_with_backoff(api):
+    api.script["AAA"] = [(503, {}), (502, {})]
+    start = monotonic()
+
+    df = ChartFetcher(api.url, rate_limit=0, retries=3, backoff=0.1)("AAA", date(2021, 1, 4), date(2021, 1, 9))
+
+    assert len(df) == 5
+    assert api.count("AAA") == 3
+    assert monotonic() - start >= 0.1 + 0.2
+
+
+def test_waits_for_retry_after_rather_than_backoff(api):
+    api.script["AAA"] = [(429, {"Retry-After": "0"})]
+    start = monotonic()
+
+    df = ChartFetcher(api.url, rate_limit=0, retries=1, backoff=30)("AAA", date(2021, 1, 4), date(2021, 1, 9))
+
+    assert len(df) == 5
+    assert api.count("AAA") == 2
+    assert monotonic() - start < 5
+
+
+def test_gives_up_after_retries(api):
+    api.script["AAA"] = [(503, {})] * 5
+
+    with pytest.raises(requests.HTTPError):
+        ChartFetcher(api.url, rate_limit=0, retries=2, backoff=0.01)("AAA", date(2021, 1, 4), date(2021, 1, 9))
+    assert api.count("AAA") == 3
+
+
+def test_does_not_retry_client_errors(api):
+    api.script["AAA"] = [(404, {})]
+
+    with pytest.raises(requests.HTTPError):
+        ChartFetcher(api.url, rate_limit=0, backoff=0.01)("AAA", date(2021, 1, 4), date(2021, 1, 9))
+    assert api.count("AAA") == 1
+
+
+def test_rate_limits_requests_across_threads(api):
+    fetcher = ChartFetcher(api.url, rate_limit=20)
+    # timed as requests are sent, the server's receive times varying with connection setup
+    sent, acquire = [], fetcher.limiter.acquire
+    fetcher.limiter.acquire = lambda: (acquire(), sent.append(monotonic()))
+
+    with ThreadPoolExecutor(6) as executor:
+        list(executor.map(lambda symbol: fetcher(symbol, date(2021, 1, 4), date(2021, 1, 9)), "ABCDEF"))
+
+    assert len(api.requests) == 6
+    assert max(sent) - min(sent) >= 5 / 20 * 0.9
+
+
+def test_ingestion_isolates_failed_symbols(api, tmp_path):
+    api.script["BROKEN"] = [(404, {})]
+    fetcher = ChartFetcher(api.url, rate_limit=0, retries=1, backoff=0.01)
+
+    results = PriceIngestion(PriceStore(tmp_path, fetcher), max_workers=2).run(["AAA", "BROKEN"], 1)
+
+    assert [result["status"] for result in results] == ["complete", "failed"]
+    assert results[0]["rows"] > 0
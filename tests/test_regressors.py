@@ -0,0 +1,30 @@
+import numpy as np
+import pytest
+
+pytest.importorskip("keras")
+from models.regressors import LSTMRegressor  # noqa: E402
+
+
+def full_history_windows(rows: np.ndarray, start: int, lookback: int, group_column: int) -> np.ndarray:
+    """Windows of rows[start:] over every earlier row of their series, padded with the series' first row."""
+    windows = []
+    for i in range(start, len(rows)):
+        series = [row for row in rows[: i + 1] if group_column is None or row[group_column] == rows[i, group_column]]
+        window = series[-lookback:]
+        windows.append(np.stack([window[0]] * (lookback - len(window)) + window))
+    return np.stack(windows)
+
+
+@pytest.mark.parametrize("group_column", [None, 0])
+@pytest.mark.parametrize("lookback", [1, 3, 5])
+@pytest.mark.parametrize("start", [0, 2, 7, 15])
+def test_windows_read_context_rows(group_column, lookback, start):
+    rng = np.random.default_rng(start)
+    rows = rng.normal(size=(30, 3)).astype(np.float32)
+    if group_column is not None:
+        rows[:, group_column] = rng.integers(0, 3, len(rows))
+    regressor = LSTMRegressor(lookback=lookback, group_column=group_column)
+
+    windows, positions = regressor._windows(rows[start:], regressor._tail(rows[:start]))
+
+    np.testing.assert_array_equal(windows[positions], full_history_windows(rows, start, lookback, group_column))
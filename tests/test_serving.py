@@ -0,0 +1,47 @@
+from concurrent.futures import ThreadPoolExecutor
+from threading import Thread
+from pipeline.artifacts import ModelArtifact
+from serving import PredictionServer
+from serving.batcher import MicroBatcher
+from sklearn.pipeline import Pipeline
+from xgboost import XGBRegressor
+import pandas as pd
+import numpy as np
+import requests
+import pytest
+
+
+def test_submit_after_close_raises():
+    batcher = MicroBatcher(lambda x: np.zeros(len(x)))
+    future = batcher.submit(pd.DataFrame({"close_lag_1": [1.0]}))
+    batcher.close()
+
+    assert future.result(1).tolist() == [0.0]
+    with pytest.raises(RuntimeError):
+        batcher.submit(pd.DataFrame({"close_lag_1": [1.0]}))
+
+
+def test_requests_survive_evictions(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    x = pd.DataFrame({"close_lag_1": np.arange(50.0)})
+    for symbol in ["AAA", "BBB"]:
+        estimator = Pipeline([("preprocessing", None), ("model", XGBRegressor(n_estimators=5))])
+        estimator.fit(x, x["close_lag_1"])
+        ModelArtifact(symbol, "xgboost").save(estimator, {"params": {}, "x_columns": ["close_lag_1"]})
+    server = PredictionServer(port=0, cache_size=1, predict_timeout=10)
+    Thread(target=server.serve_forever, daemon=True).start()
+    url = f"http://127.0.0.1:{server.server_address[1]}/predict"
+
+    def post(i: int) -> int:
+        request = {"symbol": ["AAA", "BBB"][i % 2], "model": "xgboost", "rows": [{"close_lag_1": 1.0}]}
+        return requests.post(url, json=request, timeout=30).status_code
+
+    try:
+        with ThreadPoolExecutor(8) as executor:
+            statuses = list(executor.map(post, range(64)))
+    finally:
+        server.shutdown()
+        server.server_close()
+
+    assert statuses == [200] * 64
+    assert server.cache.summary()["evictions"] > 0
@@ -0,0 +1,55 @@
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date
+from data import FeatureSpec, FeatureStore, PriceStore
+from data.store import _locked
+from benchmarks.synthetic import SyntheticFetcher
+import numpy as np
+import time
+
+
+class SlowFetcher(SyntheticFetcher):
+
+    """Synthetic fetcher slow enough for concurrent loads to overlap."""
+
+    def __call__(self, symbol, start, end):
+        time.sleep(0.05)
+        return super().__call__(symbol, start, end)
+
+
+def test_concurrent_loads_keep_every_range(tmp_path):
+    ranges = [(date(2020, 1, 1), date(2020, 7, 1)), (date(2021, 1, 1), date(2021, 7, 1))] * 4
+
+    with ThreadPoolExecutor(len(ranges)) as executor:
+        list(executor.map(lambda r: PriceStore(tmp_path, SlowFetcher()).load("SYN", *r), ranges))
+
+    df, coverage = PriceStore(tmp_path)._read("SYN")
+    assert coverage == {"start": "2020-01-01", "end": "2021-07-01"}
+    assert df.index.min().year == 2020 and df.index.max().year == 2021
+    assert not list(tmp_path.glob("*.tmp"))
+
+
+def test_prune_skips_histories_in_use(tmp_path):
+    prices = SyntheticFetcher()("SYN", date(2020, 1, 1), date(2021, 1, 1))
+    store = FeatureStore(tmp_path)
+    store.build_features("SYN", prices.iloc[:-1], FeatureSpec())
+    in_use = store.directory / "SYN" / store.data_key("SYN", prices.iloc[:-1])
+    unused = store.directory / "SYN" / "0123456789abcdef"
+    unused.mkdir()
+
+    with _locked(store._lock_file(in_use), shared=True):
+        store.build_features("SYN", prices, FeatureSpec())
+
+    assert in_use.exists()
+    assert not unused.exists()
+
+
+def test_extended_features_match_a_fresh_build(tmp_path):
+    prices = SyntheticFetcher()("SYN", date(2018, 1, 1), date(2021, 1, 1))
+    extended = FeatureStore(tmp_path / "extended")
+    extended.build_features("SYN", prices.iloc[:-60], FeatureSpec())
+
+    features = extended.build_features("SYN", prices, FeatureSpec())
+    fresh = FeatureStore(tmp_path / "fresh").build_features("SYN", prices, FeatureSpec())
+
+    np.testing.assert_array_equal(features["close_ses_None"], fresh["close_ses_None"])
+    np.testing.assert_allclose(features.to_numpy(np.float64), fresh.to_numpy(np.float64), rtol=1e-6)
@@ -0,0 +1,27 @@
+from concurrent.futures import ThreadPoolExecutor
+from common import TarZip
+import pytest
+
+
+def test_concurrent_compression_writes_one_valid_archive(tmp_path):
+    source = tmp_path / "network"
+    source.mkdir()
+    (source / "weights.bin").write_bytes(bytes(range(256)) * 4096)
+
+    def compress(_):
+        return TarZip.compress(str(source), codec="gzip", remove=False, arcname="network")
+
+    with ThreadPoolExecutor(8) as executor:
+        archives = set(executor.map(compress, range(16)))
+
+    with TarZip.extract_temp(archives.pop()) as directory:
+        with open(f"{directory}/network/weights.bin", "rb") as f:
+            assert f.read() == (source / "weights.bin").read_bytes()
+    assert not list(tmp_path.glob("*.tmp"))
+
+
+def test_failed_compression_leaves_no_temporary_file(tmp_path):
+    with pytest.raises(FileNotFoundError):
+        TarZip.compress(str(tmp_path / "missing"), codec="gzip")
+
+    assert not list(tmp_path.iterdir())
@@ -0,0 +1,12 @@
+from data import FeatureStore, PriceStore, StockData
+from benchmarks.synthetic import SyntheticFetcher
+from pipeline.update import ModelUpdate
+import pytest
+
+
+def test_update_without_data_window_asks_for_retrain(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    data = StockData("SYN", 1, PriceStore("prices", SyntheticFetcher()), FeatureStore("features"))
+
+    with pytest.raises(ValueError, match="retrain it first"):
+        ModelUpdate("xgboost", data)
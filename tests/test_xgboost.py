@@ -0,0 +1,18 @@
+from models.xgboost import XGB
+from sklearn.pipeline import Pipeline
+from xgboost import XGBRegressor
+import pandas as pd
+import numpy as np
+
+
+def test_warm_start_keeps_n_estimators():
+    rng = np.random.default_rng(0)
+    x = pd.DataFrame(rng.normal(size=(200, 3)), columns=["close_lag_1", "close_sma_5", "day_of_week"])
+    y = pd.Series(x.sum(axis=1), name="close")
+    estimator = Pipeline([("preprocessing", XGB.preprocess()), ("model", XGBRegressor(n_estimators=10))]).fit(x, y)
+
+    XGB.warm_start(estimator, x, y, 5)
+    XGB.warm_start(estimator, x, y, 5)
+
+    assert estimator.get_params()["model__n_estimators"] == 10
+    assert estimator.named_steps["model"].get_booster().num_boosted_rounds() == 20